@@ -0,0 +1,636 @@
+"""
+Бенчмарк MyNote
+
+Генерирует синтетические базы tasks.db (1k, 100k и 1M заметок, списки до 5000
+элементов, кириллица вперемешку с латиницей, напоминания на год вперед) и
+замеряет горячие пути приложения: загрузку заметок, поиск, загрузку списков,
+сохранение списка, очистку корзины, проверку напоминаний и время до показа
+окна (с проверкой бюджета запуска).
+
+Результаты пишутся в JSON, чтобы сравнивать прогоны между коммитами:
+
+    python benchmark.py --sizes 1k,100k --output bench_main.json
+    python benchmark.py --sizes 1k,100k --compare bench_main.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import database
+import search
+
+# Предустановленные размеры баз
+SIZES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+CYRILLIC_WORDS = [
+    'отчет', 'квартальный', 'встреча', 'проект', 'задача', 'купить', 'молоко',
+    'позвонить', 'маме', 'сдать', 'домашнее', 'задание', 'прочитать', 'книгу',
+    'оплатить', 'счета', 'записаться', 'к', 'врачу', 'идея', 'для', 'приложения',
+    'список', 'покупок', 'планы', 'на', 'выходные', 'тренировка', 'бюджет',
+    'отпуск', 'билеты', 'презентация', 'клиент', 'договор', 'исправить', 'ошибку',
+    'напоминание', 'важно', 'срочно', 'заметка', 'черновик', 'статья', 'лекция',
+]
+
+LATIN_WORDS = [
+    'meeting', 'report', 'deadline', 'release', 'backend', 'frontend', 'deploy',
+    'review', 'sprint', 'bugfix', 'python', 'sqlite', 'flet', 'todo', 'draft',
+    'invoice', 'budget', 'api', 'refactor', 'benchmark', 'cache', 'index',
+    'user_id', 'getNotes', 'saveList', 'v2', 'TODO', 'FIXME', 'ASAP',
+]
+
+# Слоги для редких слов: длинный хвост словаря, как в настоящих заметках
+RARE_SYLLABLES = [
+    'ка', 'ро', 'ми', 'ле', 'то', 'на', 'ве', 'ст', 'пр', 'ло',
+    'ди', 'су', 'ра', 'ко', 'ны', 'те', 'ба', 'зо', 'ги', 'чу',
+]
+RARE_WORDS_COUNT = 20_000
+RARE_WORD_SHARE = 0.10
+
+
+def make_rare_words(count, seed=7):
+    """
+    Детерминированный набор редких слов из слогов
+    """
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(RARE_SYLLABLES) for _ in range(rng.randint(2, 5))))
+    return sorted(words)
+
+
+RARE_WORDS = make_rare_words(RARE_WORDS_COUNT)
+
+# Приоритеты в базе хранятся числами (0 - низкий, 1 - средний, 2 - высокий)
+PRIORITIES = [0, 1, 2]
+COLORS = ['Темный', 'Светлый', 'Зеленый', 'Красный', 'Фиолетовый', 'Голубой', 'Белый']
+
+# Значения фильтра приоритета, между которыми переключается повторный поиск
+REPEAT_PRIORITY_FILTERS = ["Все", "2", "0"]
+
+# Нечеткие запросы с опечатками
+FUZZY_QUERIES = ['квартльный отчт', 'meetnig', 'презинтация клиенту', 'deplyo', 'бюджте']
+
+# Запрос, который набирается по одной букве за повтор
+TYPE_AHEAD_QUERY = 'квартальный отчет за'
+
+# Правила повторения части напоминаний
+REPEAT_RULES = ['daily', 'weekly', 'monthly:15', 'every:90']
+
+# Порядки сортировки заметок, которые перебираются между повторами
+NOTE_SORT_OPTIONS = ['title', 'priority', 'reminder', 'created']
+
+# Поисковые запросы, которые перебираются между повторами
+NOTE_QUERIES = ['отчет', 'meeting', 'квартальный отчет', 'getnotes', 'несуществующее']
+LIST_QUERIES = ['покупок', 'sprint', 'планы']
+
+# Операции в порядке выполнения: сначала только чтение, затем записи
+OPERATIONS = [
+    'load_notes',
+    'search_notes',
+    'search_notes_repeat',
+    'search_type_ahead',
+    'search_fuzzy',
+    'sort_notes',
+    'load_trash',
+    'load_lists',
+    'search_lists',
+    'search_global',
+    'load_timeline',
+    'reminder_scan',
+    'snooze_reminder',
+    'save_list',
+    'trash_cleanup',
+    'startup',
+]
+
+
+class HeadlessPage:
+    """
+    Минимальная страница без окна: позволяет вызывать методы интерфейса
+    без запуска Flet-клиента
+    """
+
+    def __init__(self):
+        self.overlay = []
+        self.controls = []
+        self.snack_bar = None
+        self.window = SimpleNamespace()
+        self.updates = 0
+
+    def update(self, *controls):
+        self.updates += 1
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+    def open(self, control):
+        pass
+
+    def close(self, control):
+        pass
+
+    def launch_url(self, url):
+        pass
+
+
+def make_text(rng, min_words, max_words):
+    """
+    Случайный текст из кириллических и латинских слов
+    """
+    words = []
+    for _ in range(rng.randint(min_words, max_words)):
+        roll = rng.random()
+        if roll < RARE_WORD_SHARE:
+            # Частота редких слов убывает по их номеру
+            words.append(RARE_WORDS[int(len(RARE_WORDS) * rng.random() ** 3)])
+        else:
+            pool = CYRILLIC_WORDS if roll < 0.7 else LATIN_WORDS
+            words.append(rng.choice(pool))
+    # Слитные слова нужны для поиска подстроки внутри слова
+    if rng.random() < 0.05:
+        words.append('квартальныйотчет')
+    return ' '.join(words)
+
+
+def make_content(rng):
+    """
+    Содержимое заметки: в основном короткое, иногда очень длинное
+    """
+    roll = rng.random()
+    if roll < 0.80:
+        return make_text(rng, 5, 60)
+    if roll < 0.98:
+        return make_text(rng, 60, 400)
+    return make_text(rng, 1500, 3000)
+
+
+def list_sizes(rng, count):
+    """
+    Количество элементов в каждом списке: большинство маленькие,
+    несколько огромных, первый список всегда на 5000 элементов
+    """
+    sizes = []
+    for index in range(count):
+        if index == 0:
+            sizes.append(5000)
+            continue
+        roll = rng.random()
+        if roll < 0.80:
+            sizes.append(rng.randint(1, 30))
+        elif roll < 0.95:
+            sizes.append(rng.randint(30, 500))
+        else:
+            sizes.append(rng.randint(500, 5000))
+    return sizes
+
+
+def generate_db(path, notes_count, seed=42, now=None):
+    """
+    Генерация синтетической базы с заданным количеством заметок
+    """
+    import main
+
+    rng = random.Random(seed)
+    now = int((now or datetime.now()).timestamp())
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    # Схема создается самим приложением, чтобы не расходиться с init_db
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='mynote_schema_') as schema_dir:
+        os.chdir(schema_dir)
+        try:
+            main.init_db()
+        finally:
+            os.chdir(cwd)
+        shutil.move(os.path.join(schema_dir, 'tasks.db'), path)
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA journal_mode = MEMORY')
+    cursor = conn.cursor()
+
+    chunk = []
+    for _ in range(notes_count):
+        created = now - rng.randint(0, 2 * 365 * 24 * 3600)
+        completed = 0
+        deleted_at = None
+        reminder_time = None
+        reminder_rule = None
+
+        if rng.random() < 0.10:
+            # Заметки в корзине, часть старше недели
+            completed = 1
+            deleted_at = now - rng.randint(0, 14 * 24 * 3600)
+        elif rng.random() < 0.20:
+            # Напоминания распределены на год вперед
+            reminder_time = now + rng.randint(3600, 365 * 24 * 3600)
+            if rng.random() < 0.25:
+                reminder_rule = rng.choice(REPEAT_RULES)
+
+        chunk.append((
+            make_text(rng, 1, 6),
+            make_content(rng),
+            rng.choice(PRIORITIES),
+            rng.choice(COLORS),
+            created,
+            completed,
+            deleted_at,
+            reminder_time,
+            reminder_rule
+        ))
+
+        if len(chunk) >= 10_000:
+            cursor.executemany('''
+                INSERT INTO notes
+                (title, content, priority, color, created, completed, deleted_at, reminder_time, reminder_rule)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', chunk)
+            chunk.clear()
+
+    if chunk:
+        cursor.executemany('''
+            INSERT INTO notes
+            (title, content, priority, color, created, completed, deleted_at, reminder_time, reminder_rule)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', chunk)
+
+    lists_count = max(10, notes_count // 500)
+    for items_count in list_sizes(rng, lists_count):
+        created = now - rng.randint(0, 365 * 24 * 3600)
+        cursor.execute('''
+            INSERT INTO lists
+            (title, description, color, priority, created, completed)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            make_text(rng, 1, 4),
+            make_text(rng, 0, 12),
+            'Темный',
+            rng.choice(PRIORITIES),
+            created,
+            0
+        ))
+        list_id = cursor.lastrowid
+        cursor.executemany('''
+            INSERT INTO list_items
+            (list_id, text, is_completed)
+            VALUES (?, ?, ?)
+        ''', [
+            (list_id, make_text(rng, 1, 8), int(rng.random() < 0.3))
+            for _ in range(items_count)
+        ])
+
+    conn.commit()
+    conn.close()
+
+
+class Workload:
+    """
+    Набор операций приложения поверх одной рабочей копии базы
+    """
+
+    def __init__(self, pristine_path, workdir):
+        import main
+
+        self.main = main
+        self.pristine_path = pristine_path
+        self.workdir = workdir
+        self.db_path = os.path.join(workdir, 'tasks.db')
+        self.restore()
+
+        self.page = HeadlessPage()
+        self.notes = main.Notes(self.page)
+        self.list_manager = main.ListManager(self.page)
+        self.global_search = main.GlobalSearch(self.page, lambda hit: None)
+        self.timeline = main.ReminderTimeline(self.page, self.notes)
+        self.reminder_manager = self.notes.reminder_manager
+        self.calls = 0
+
+    def restore(self):
+        """
+        Восстановление рабочей копии базы из исходной
+        """
+        shutil.copyfile(self.pristine_path, self.db_path)
+        # Файл базы заменен целиком: кэши результатов поиска устарели
+        database.bump_generation()
+
+    def load_notes(self):
+        self.notes.load_notes()
+
+    def search_notes(self):
+        # Замеряется поиск без кэша результатов
+        search.result_cache.clear()
+        self.notes.search_input.value = NOTE_QUERIES[self.calls % len(NOTE_QUERIES)]
+        self.notes.priority_filter.value = "Все"
+        self.notes.color_filter.value = "Все"
+        self.notes.perform_search()
+
+    def search_notes_repeat(self):
+        # Переключение фильтра туда и обратно: после первого круга ответы из кэша
+        self.notes.search_input.value = NOTE_QUERIES[0]
+        self.notes.priority_filter.value = REPEAT_PRIORITY_FILTERS[self.calls % len(REPEAT_PRIORITY_FILTERS)]
+        self.notes.color_filter.value = "Все"
+        self.notes.perform_search()
+
+    def search_type_ahead(self):
+        # Каждый повтор добавляет к запросу одну букву; кэш не помогает, работает сужение
+        length = self.calls % len(TYPE_AHEAD_QUERY) + 1
+        if length == 1:
+            search.result_cache.clear()
+        self.notes.search_input.value = TYPE_AHEAD_QUERY[:length]
+        self.notes.priority_filter.value = "Все"
+        self.notes.color_filter.value = "Все"
+        self.notes.perform_search()
+
+    def search_fuzzy(self):
+        search.result_cache.clear()
+        self.notes.fuzzy_switch.value = True
+        self.notes.search_input.value = FUZZY_QUERIES[self.calls % len(FUZZY_QUERIES)]
+        self.notes.priority_filter.value = "Все"
+        self.notes.color_filter.value = "Все"
+        try:
+            self.notes.perform_search()
+        finally:
+            self.notes.fuzzy_switch.value = False
+
+    def sort_notes(self):
+        # Смена порядка без текста запроса: строки читаются из индекса сортировки
+        search.result_cache.clear()
+        self.notes.search_input.value = ""
+        self.notes.priority_filter.value = "Все"
+        self.notes.color_filter.value = "Все"
+        self.notes.sort_dropdown.value = NOTE_SORT_OPTIONS[self.calls % len(NOTE_SORT_OPTIONS)]
+        try:
+            self.notes.perform_search()
+        finally:
+            self.notes.sort_dropdown.value = 'created'
+
+    def load_trash(self):
+        self.notes.load_trash_notes()
+
+    def load_lists(self):
+        self.list_manager.load_lists()
+
+    def search_lists(self):
+        search.result_cache.clear()
+        self.list_manager.search_input.value = LIST_QUERIES[self.calls % len(LIST_QUERIES)]
+        self.list_manager.sort_dropdown.value = "created"
+        self.list_manager.priority_filter.value = "Все"
+        self.list_manager.perform_search()
+
+    def search_global(self):
+        search.result_cache.clear()
+        queries = NOTE_QUERIES + LIST_QUERIES
+        self.global_search.search_input.value = queries[self.calls % len(queries)]
+        self.global_search.perform_search()
+
+    def load_timeline(self):
+        # Все интервалы ленты раскрыты: счетчики и первая порция каждого
+        for state in self.timeline.buckets.values():
+            state['expanded'] = True
+            state['rows'] = []
+        self.timeline.refresh()
+
+    def reminder_scan(self):
+        self.reminder_manager.check_due_reminders()
+
+    def snooze_reminder(self):
+        # Первое напоминание ленты откладывается на 5 минут
+        rows = self.timeline.buckets['today']['rows'] or self.timeline.buckets['later']['rows']
+        if rows:
+            self.reminder_manager.snooze(rows[0][0], time.time() + 300)
+
+    def save_list(self):
+        self.list_manager.current_list_id = None
+        self.list_manager.list_title_input.value = f"Бенчмарк {self.calls}"
+        self.list_manager.list_description_input.value = "Список из бенчмарка"
+        self.list_manager.list_priority_dropdown.value = "1"
+        self.list_manager.list_items[:] = [
+            {'text': f"Элемент {index}", 'is_completed': index % 3 == 0}
+            for index in range(50)
+        ]
+        self.list_manager.save_list()
+
+    def trash_cleanup(self):
+        self.notes.cleanup_old_notes()
+
+    def startup(self):
+        # Замеряется время до готовности вкладок с данными: фоновая часть запуска входит в замер
+        self.startup_page = HeadlessPage()
+        self.main.main(self.startup_page)
+        for thread in threading.enumerate():
+            if thread.name == 'mynote-startup':
+                thread.join()
+
+    def after_startup(self):
+        # Закрытие сеанса останавливает потоки напоминаний и журнала изменений
+        self.startup_page.on_disconnect(None)
+
+    # Операции, перед каждым повтором которых база восстанавливается
+    destructive = {'trash_cleanup'}
+
+
+def summarize(samples):
+    """
+    Сводная статистика по замерам в миллисекундах
+    """
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'median_ms': round(statistics.median(ordered), 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p95_ms': round(ordered[p95_index], 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def run_size(label, notes_count, args):
+    """
+    Прогон всех операций на базе одного размера
+    """
+    os.makedirs(args.data_dir, exist_ok=True)
+    pristine = os.path.abspath(os.path.join(args.data_dir, f"tasks_{label}_seed{args.seed}_v{database.SCHEMA_VERSION}.db"))
+    result = {'notes': notes_count}
+
+    if not os.path.exists(pristine) or args.regenerate:
+        print(f"[{label}] генерация базы: {notes_count} заметок")
+        started = time.perf_counter()
+        generate_db(pristine, notes_count, seed=args.seed)
+        result['generate_s'] = round(time.perf_counter() - started, 2)
+
+    result['db_bytes'] = os.path.getsize(pristine)
+
+    # Планы сортировок: ни одно сочетание фильтров не должно сортировать во временном B-дереве
+    conn = sqlite3.connect(pristine)
+    try:
+        problems = search.sort_plan_problems(conn)
+    finally:
+        conn.close()
+    result['sort_plan_problems'] = [name for name, _ in problems]
+    for name, plan in problems:
+        print(f"[{label}] сортировка без индекса: {name}: {'; '.join(plan)}")
+    operations = [op for op in OPERATIONS if not args.ops or op in args.ops]
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='mynote_bench_') as workdir:
+        # Приложение работает с tasks.db в текущей директории
+        os.chdir(workdir)
+        try:
+            workload = Workload(pristine, workdir)
+            timings = {}
+            for op in operations:
+                action = getattr(workload, op)
+                samples = []
+                for run in range(args.warmup + args.repeat):
+                    if op in workload.destructive:
+                        workload.restore()
+                    workload.calls = run
+                    started = time.perf_counter()
+                    action()
+                    elapsed = (time.perf_counter() - started) * 1000
+                    if op == 'startup':
+                        workload.after_startup()
+                    if run >= args.warmup:
+                        samples.append(elapsed)
+                timings[op] = summarize(samples)
+                print(f"[{label}] {op:<14} median {timings[op]['median_ms']:>10.2f} ms")
+            result['operations'] = timings
+        finally:
+            os.chdir(cwd)
+
+    return result
+
+
+def git_commit():
+    """
+    Текущий коммит репозитория, если он доступен
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """
+    Сравнение медиан с базовым прогоном
+    Возвращает список регрессий
+    """
+    regressions = []
+    print(f"\nСравнение с {baseline.get('meta', {}).get('commit')} (порог {threshold:.0%})")
+    for label, data in current['results'].items():
+        base_ops = baseline.get('results', {}).get(label, {}).get('operations', {})
+        for op, stats in data.get('operations', {}).items():
+            if op not in base_ops:
+                continue
+            old = base_ops[op]['median_ms']
+            new = stats['median_ms']
+            ratio = new / old if old else float('inf')
+            regressed = ratio > 1 + threshold and new - old > min_delta_ms
+            marker = 'РЕГРЕССИЯ' if regressed else ''
+            print(f"  {label:<5} {op:<14} {old:>10.2f} -> {new:>10.2f} ms ({ratio - 1:+.1%}) {marker}")
+            if regressed:
+                regressions.append({'size': label, 'op': op, 'baseline_ms': old, 'current_ms': new})
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк горячих путей MyNote")
+    parser.add_argument('--sizes', default='1k,100k,1m',
+                        help="размеры баз через запятую: " + ', '.join(SIZES))
+    parser.add_argument('--ops', default='',
+                        help="операции через запятую (по умолчанию все): " + ', '.join(OPERATIONS))
+    parser.add_argument('--repeat', type=int, default=5, help="количество замеров на операцию")
+    parser.add_argument('--warmup', type=int, default=1, help="количество прогревочных запусков")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default='.bench_data', help="каталог для сгенерированных баз")
+    parser.add_argument('--regenerate', action='store_true', help="пересоздать базы")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="JSON предыдущего прогона для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="допустимое относительное замедление медианы")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help="абсолютное замедление, которое считается шумом")
+    parser.add_argument('--startup-budget-ms', type=float, default=500,
+                        help="бюджет медианы времени до готовности вкладок с данными")
+    args = parser.parse_args(argv)
+
+    args.sizes = [size.strip().lower() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in args.sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"неизвестные размеры: {', '.join(unknown)}")
+    args.ops = [op.strip() for op in args.ops.split(',') if op.strip()]
+    unknown = [op for op in args.ops if op not in OPERATIONS]
+    if unknown:
+        parser.error(f"неизвестные операции: {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': {}
+    }
+
+    for label in args.sizes:
+        report['results'][label] = run_size(label, SIZES[label], args)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {args.output}")
+
+    failed = False
+    for label, data in report['results'].items():
+        startup = data.get('operations', {}).get('startup')
+        if startup and startup['median_ms'] > args.startup_budget_ms:
+            print(f"[{label}] превышен бюджет запуска: "
+                  f"{startup['median_ms']:.1f} мс > {args.startup_budget_ms:.0f} мс")
+            failed = True
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"Найдено регрессий: {len(regressions)}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
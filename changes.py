@@ -0,0 +1,204 @@
+"""
+Шина изменений MyNote
+
+После каждой записи в базу код, который ее сделал, публикует событие
+Change: что изменилось (заметка или список), как и какие id затронуты.
+Представления (заметки, корзина, списки, статистика, лента напоминаний)
+подписываются на шину и обновляют только затронутые карточки, не перечитывая
+все строки. Событие доставляется подписчикам синхронно в потоке, который его
+опубликовал, в том числе в потоке проверки напоминаний.
+
+Изменения других процессов (второе окно, скрипт) приходят через журнал
+change_log в базе: ChangeFeed раз в FEED_INTERVAL секунд сверяет PRAGMA
+data_version своего соединения и, только если базу кто-то изменил, читает
+строки журнала после последнего прочитанного номера и публикует их в шину.
+Строки, записанные этим процессом, пропускаются: их события уже опубликованы.
+"""
+import sqlite3
+import threading
+from collections import namedtuple
+
+import database
+
+# Что изменилось
+NOTE = 'note'
+LIST = 'list'
+
+# Как изменилось
+CREATED = 'created'
+UPDATED = 'updated'
+TRASHED = 'trashed'
+RESTORED = 'restored'
+DELETED = 'deleted'
+# Напоминание установлено, отложено или перенесено на следующее срабатывание
+REMINDER = 'reminder'
+# Напоминание сработало (уведомление отправлено)
+FIRED = 'fired'
+# Часть журнала изменений пропущена: представление сущности загружается заново
+RELOAD = 'reload'
+
+# Событие изменения: entity - NOTE или LIST, action - вид изменения, ids - кортеж id
+Change = namedtuple('Change', 'entity action ids')
+
+
+class ChangeBus:
+    """
+    Шина изменений: подписчики получают события своей сущности (или все)
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, entity=None):
+        """
+        Подписка callback(change) на события entity (None - на все)
+        Возвращает функцию отписки
+        """
+        subscriber = (entity, callback)
+        with self._lock:
+            self._subscribers.append(subscriber)
+
+        def unsubscribe():
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+        return unsubscribe
+
+    def publish(self, change):
+        """
+        Доставка события подписчикам; ошибка одного подписчика не мешает остальным
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for entity, callback in subscribers:
+            if entity is not None and entity != change.entity:
+                continue
+            try:
+                callback(change)
+            except Exception as e:
+                print(f"Ошибка обработчика изменений {change.entity}/{change.action}: {e}")
+
+
+# Шина процесса: окна одного процесса работают с одним файлом базы
+bus = ChangeBus()
+
+
+def publish(entity, action, ids):
+    """
+    Публикация события в шину процесса; пустой набор id не публикуется
+    """
+    ids = tuple(ids)
+    if ids:
+        bus.publish(Change(entity, action, ids))
+
+
+# Пауза между проверками журнала изменений, секунды
+FEED_INTERVAL = 1.0
+
+# Строк журнала за одно чтение
+FEED_BATCH = 500
+
+
+class ChangeFeed:
+    """
+    Перенос изменений других процессов из журнала change_log в шину
+    Один поток на процесс: start() повторно ничего не запускает
+    """
+
+    def __init__(self, change_bus=bus, interval=FEED_INTERVAL):
+        self.bus = change_bus
+        self.interval = interval
+        # Последний прочитанный номер журнала и data_version при последнем чтении
+        self.last_seq = None
+        self.version = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, interval=None):
+        with self._lock:
+            if interval is not None:
+                self.interval = interval
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='mynote-change-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Остановка потока; следующий start() читает журнал с его текущего конца
+        """
+        with self._lock:
+            self._stop_event.set()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+            self.last_seq = None
+            self.version = None
+
+    def _run(self):
+        # Соединение живет все время работы: data_version меняется только для него
+        conn = database.get_connection()
+        try:
+            if self.last_seq is None:
+                # Изменения до запуска уже учтены при загрузке представлений
+                self.last_seq = database.last_change_seq(conn)
+            while not self._stop_event.wait(self.interval):
+                try:
+                    self.poll(conn)
+                except sqlite3.Error as e:
+                    print(f"Ошибка при чтении журнала изменений: {e}")
+        finally:
+            conn.close()
+
+    def poll(self, conn):
+        """
+        Одна проверка: новые строки журнала публикуются в шину
+        Возвращает число опубликованных событий
+        """
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == self.version:
+            return 0
+        self.version = version
+
+        first_seq = conn.execute('SELECT min(seq) FROM change_log').fetchone()[0]
+        if first_seq is not None and first_seq > self.last_seq + 1:
+            # Читатель отстал больше чем на CHANGE_LOG_KEEP строк
+            self.last_seq = database.last_change_seq(conn)
+            database.bump_generation()
+            for entity in (NOTE, LIST):
+                self.bus.publish(Change(entity, RELOAD, ()))
+            return 2
+
+        own = database.own_change_ranges(self.last_seq)
+        # Подряд идущие строки с одной сущностью и действием - одно событие
+        groups = []
+        while True:
+            rows = conn.execute('''
+                SELECT seq, entity, action, row_id FROM change_log
+                WHERE seq > ? ORDER BY seq LIMIT ?
+            ''', (self.last_seq, FEED_BATCH)).fetchall()
+            for seq, entity, action, row_id in rows:
+                if database.is_own_change(own, seq):
+                    continue
+                if groups and groups[-1][:2] == (entity, action):
+                    groups[-1][2][row_id] = None
+                else:
+                    groups.append((entity, action, {row_id: None}))
+            if rows:
+                self.last_seq = rows[-1][0]
+            if len(rows) < FEED_BATCH:
+                break
+
+        if groups:
+            # Кэши поиска сравнивают поколение записи, которое чужие фиксации не меняют
+            database.bump_generation()
+        for entity, action, ids in groups:
+            self.bus.publish(Change(entity, action, tuple(ids)))
+        return len(groups)
+
+
+# Журнал изменений процесса
+feed = ChangeFeed()
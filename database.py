@@ -0,0 +1,643 @@
+"""
+Доступ к файлу базы данных MyNote
+
+Файл может быть открыт несколькими процессами (два окна MyNote, скрипт).
+База работает в режиме WAL: читатели не мешают писателю. Соединение ждет
+занятую базу до BUSY_TIMEOUT секунд, а записи идут короткими транзакциями
+run_write, которые сразу берут блокировку записи и повторяются с паузой и
+случайным разбросом, если база все еще занята. Планировщик напоминаний
+работает в одном процессе - в том, что держит FileLock(SCHEDULER_LOCK_PATH).
+
+Триггеры записывают каждое изменение заметок, списков и их элементов в
+журнал change_log (номер, сущность, действие, id строки). Открытые окна
+читают из него только новые строки (changes.ChangeFeed); run_write запоминает
+номера, записанные этим процессом, чтобы процесс не получал свои же изменения
+повторно.
+"""
+import bisect
+import collections
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import instrumentation
+
+# Путь к файлу базы данных
+DB_PATH = 'tasks.db'
+
+# Ожидание занятой базы внутри SQLite, секунды
+BUSY_TIMEOUT = 2.0
+
+# Повторы транзакции записи: число попыток и начальная пауза между ними, секунды
+WRITE_ATTEMPTS = 4
+WRITE_BACKOFF = 0.05
+
+# Файл блокировки, которую держит процесс с планировщиком напоминаний
+SCHEDULER_LOCK_PATH = 'tasks.db.scheduler.lock'
+
+# Строк журнала изменений, которые хранятся в базе; более старые удаляются триггером
+CHANGE_LOG_KEEP = 10000
+CHANGE_LOG_PRUNE_EVERY = 100
+
+# Диапазоны номеров журнала (первый не включается, последний включается),
+# записанных транзакциями run_write этого процесса; хранятся последние
+_own_changes = collections.deque(maxlen=1000)
+_own_changes_lock = threading.Lock()
+
+# Поколение записи: увеличивается при каждой фиксации, изменившей строки
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def write_generation():
+    """
+    Текущее поколение записи; кэши результатов сравнивают его со своим
+    """
+    return _generation
+
+
+def bump_generation():
+    """
+    Отметка изменения данных в обход соединений приложения (например, замена файла базы)
+    """
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        return _generation
+
+
+class Connection(sqlite3.Connection):
+    """
+    Соединение, фиксация изменений которого увеличивает поколение записи
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._committed_changes = 0
+
+    def commit(self):
+        super().commit()
+        self._track_changes()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Контекстный менеджер фиксирует транзакцию без вызова commit()
+        result = super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            self._track_changes()
+        return result
+
+    def _track_changes(self):
+        if self.total_changes != self._committed_changes:
+            self._committed_changes = self.total_changes
+            bump_generation()
+
+
+class TimedConnection(instrumentation.TimedConnection, Connection):
+    """
+    Соединение с замером запросов и учетом поколения записи
+    """
+
+
+def get_connection():
+    """
+    Открытие соединения с базой данных
+    При включенном инструментировании каждый запрос попадает в гистограммы
+    """
+    factory = TimedConnection if instrumentation.is_enabled() else Connection
+    conn = sqlite3.connect(DB_PATH, factory=factory, timeout=BUSY_TIMEOUT)
+    # В режиме WAL синхронизации при каждой фиксации не нужны
+    conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+
+def enable_wal(conn):
+    """
+    Перевод базы в режим WAL (сохраняется в файле базы)
+    """
+    return conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+
+
+def is_busy(error):
+    """
+    Ошибка "база занята другим соединением"
+    """
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def run_write(work, attempts=WRITE_ATTEMPTS):
+    """
+    Короткая транзакция записи с повтором, если база занята
+    work(conn) выполняет запросы и возвращает результат run_write. Транзакция
+    сразу берет блокировку записи (BEGIN IMMEDIATE), поэтому не упирается в
+    чужую запись посреди работы; внутри work не должно быть долгих действий.
+    Между попытками - экспоненциальная пауза со случайным разбросом, чтобы
+    процессы не сталкивались снова одновременно
+    """
+    for attempt in range(attempts):
+        conn = get_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Под блокировкой записи номера журнала между замерами - только наши
+            first_seq = last_change_seq(conn)
+            result = work(conn)
+            last_seq = last_change_seq(conn)
+            conn.commit()
+            # Отметка после фиксации: если журнал прочитан раньше нее, событие
+            # придет повторно, а повторное обновление карточки ничего не меняет
+            if last_seq > first_seq:
+                with _own_changes_lock:
+                    _own_changes.append((first_seq, last_seq))
+            return result
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if not is_busy(e) or attempt == attempts - 1:
+                raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        instrumentation.count('db.write_retries')
+        time.sleep(WRITE_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def last_change_seq(conn):
+    """
+    Номер последней записи журнала изменений (0, если журнала еще нет)
+    """
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    except sqlite3.OperationalError:
+        # В базе еще нет таблиц с AUTOINCREMENT
+        return 0
+    return row[0] if row else 0
+
+
+def own_change_ranges(after=0):
+    """
+    Диапазоны номеров журнала, записанных этим процессом, после номера after
+    Более ранние диапазоны забываются: читатель журнала их уже прошел
+    """
+    with _own_changes_lock:
+        while _own_changes and _own_changes[0][1] <= after:
+            _own_changes.popleft()
+        return sorted(_own_changes)
+
+
+def is_own_change(ranges, seq):
+    """
+    Запись журнала seq сделана этим процессом (ranges - из own_change_ranges)
+    """
+    index = bisect.bisect_left(ranges, (seq,)) - 1
+    return index >= 0 and ranges[index][0] < seq <= ranges[index][1]
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка на файле: держит ее не больше одного процесса
+    Снимается release() или операционной системой при завершении процесса
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        """
+        Попытка взять блокировку без ожидания: True, если она у этого процесса
+        """
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, 'a+b')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+def _migrate_epoch_timestamps(conn):
+    """
+    Миграция 1: created, deleted_at и reminder_time хранятся целыми секундами эпохи
+    Старые значения были строками str(datetime) и isoformat в локальном времени;
+    нераспознанные строки остаются как есть
+    """
+    for table, columns in (('notes', ('created', 'deleted_at', 'reminder_time')),
+                           ('lists', ('created', 'deleted_at'))):
+        for column in columns:
+            conn.execute(f'''
+                UPDATE {table}
+                SET {column} = COALESCE(
+                    CAST(strftime('%s', replace({column}, 'T', ' '), 'utc') AS INTEGER),
+                    {column})
+                WHERE typeof({column}) = 'text'
+            ''')
+
+    # Индексы под сортировку и диапазонные запросы по времени
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_completed_created ON notes(completed, created)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_completed_deleted ON notes(completed, deleted_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_completed_reminder ON notes(completed, reminder_time)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lists_completed_created ON lists(completed, created)')
+
+
+def _rebuild_table(conn, table, create_sql, select_sql):
+    """
+    Пересоздание таблицы с новой схемой (рекомендуемая SQLite процедура)
+    create_sql создает таблицу {table}_new, select_sql выбирает для нее строки;
+    индексы и триггеры таблицы создаются заново
+    """
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    )]
+    conn.execute(create_sql)
+    conn.execute(f'INSERT INTO {table}_new {select_sql}')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    for sql in indexes:
+        conn.execute(sql)
+
+
+def _column_type(conn, table, column):
+    for row in conn.execute(f'PRAGMA table_info({table})'):
+        if row[1] == column:
+            return row[2].upper()
+    return None
+
+
+# Старые подписи приоритета и их числовые значения
+_PRIORITY_CASE = """
+    CASE
+        WHEN typeof(priority) = 'integer' THEN priority
+        WHEN priority = 'Высокий' THEN 2
+        WHEN priority = 'Средний' THEN 1
+        ELSE 0
+    END
+"""
+
+
+def _migrate_integer_priority(conn):
+    """
+    Миграция 2: приоритет хранится числом 0-2 вместо русской подписи
+    Столбец TEXT приводил бы числа к строкам, поэтому таблицы пересоздаются
+    """
+    if _column_type(conn, 'notes', 'priority') != 'INTEGER':
+        _rebuild_table(conn, 'notes', '''
+            CREATE TABLE notes_new
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            content TEXT,
+            priority INTEGER DEFAULT 0,
+            color TEXT,
+            created DATETIME,
+            completed BOOLEAN DEFAULT 0,
+            deleted_at DATETIME,
+            reminder_time DATETIME)
+        ''', f'''
+            SELECT id, title, content, {_PRIORITY_CASE}, color, created, completed, deleted_at, reminder_time
+            FROM notes
+        ''')
+
+    if _column_type(conn, 'lists', 'priority') != 'INTEGER':
+        _rebuild_table(conn, 'lists', '''
+            CREATE TABLE lists_new
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            description TEXT,
+            color TEXT,
+            priority INTEGER DEFAULT 0,
+            created DATETIME,
+            completed BOOLEAN DEFAULT 0,
+            deleted_at DATETIME)
+        ''', f'''
+            SELECT id, title, description, color, {_PRIORITY_CASE}, created, completed, deleted_at
+            FROM lists
+        ''')
+
+    # Фильтр и сортировка по приоритету идут по индексу, а не сортировкой всех строк
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_completed_priority ON notes(completed, priority, created)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lists_completed_priority ON lists(completed, priority, created)')
+
+
+def table_exists(conn, name):
+    """
+    Проверка наличия таблицы (в том числе виртуальной)
+    """
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def _create_fts_index(conn, index, table, columns, tokenize):
+    """
+    Индекс FTS5 поверх таблицы (external content) и триггеры синхронизации
+    """
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE {index} USING fts5(
+            {column_list}, content='{table}', content_rowid='id',
+            tokenize='{tokenize}'
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {index}_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {index}({index}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {index}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+    conn.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def _create_trigram_index(conn, table, columns):
+    """
+    Индекс триграмм для поиска подстроки
+    """
+    _create_fts_index(conn, f'{table}_fts', table, columns, 'trigram case_sensitive 0')
+
+
+def _migrate_trigram_index(conn):
+    """
+    Миграция 3: индексы триграмм для поиска подстроки в заметках и списках
+    Без FTS5 в сборке SQLite поиск продолжает работать через LIKE
+    """
+    try:
+        _create_trigram_index(conn, 'notes', ('title', 'content'))
+        _create_trigram_index(conn, 'lists', ('title', 'description'))
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e) and 'trigram' not in str(e):
+            raise
+        # Ошибка возникает на первом CREATE VIRTUAL TABLE, до создания триггеров
+        print(f"Индекс триграмм недоступен, поиск будет работать без него: {e}")
+
+
+def _migrate_word_index(conn):
+    """
+    Миграция 4: словарный индекс заметок и его словарь терминов для нечеткого поиска
+    """
+    try:
+        _create_fts_index(conn, 'notes_words', 'notes', ('title', 'content'), 'unicode61 remove_diacritics 2')
+        conn.execute("CREATE VIRTUAL TABLE notes_words_vocab USING fts5vocab(notes_words, 'row')")
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+        print(f"Словарный индекс недоступен, нечеткий поиск отключен: {e}")
+
+
+# Источники общего поискового индекса: (тип, таблица, заголовок, текст);
+# rowid в индексе = id * SEARCH_KINDS + номер источника
+SEARCH_SOURCES = (
+    ('note', 'notes', 'title', 'content'),
+    ('list', 'lists', 'title', 'description'),
+    ('item', 'list_items', None, 'text'),
+)
+SEARCH_KINDS = 4
+
+
+def _search_values(prefix, number, title, body):
+    """
+    Значения строки общего индекса: rowid, заголовок и текст
+    """
+    title_value = f'{prefix}{title}' if title else 'NULL'
+    return f'{prefix}id * {SEARCH_KINDS} + {number}, {title_value}, {prefix}{body}'
+
+
+def _migrate_global_index(conn):
+    """
+    Миграция 5: общий словарный индекс заметок, списков и элементов списков
+    Индекс без собственной копии текста (contentless): строки добавляются и
+    удаляются триггерами, удаление передает прежние значения столбцов
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE search_index USING fts5(
+                title, body, content='', prefix='2 3',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+        print(f"Общий поисковый индекс недоступен, глобальный поиск отключен: {e}")
+        return
+
+    for number, (kind, table, title, body) in enumerate(SEARCH_SOURCES):
+        columns = ', '.join(column for column in (title, body) if column)
+        new_values = _search_values('new.', number, title, body)
+        old_values = _search_values('old.', number, title, body)
+        conn.execute(f'''
+            CREATE TRIGGER search_index_{kind}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO search_index(rowid, title, body) VALUES ({new_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER search_index_{kind}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO search_index(search_index, rowid, title, body) VALUES ('delete', {old_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER search_index_{kind}_update AFTER UPDATE OF {columns} ON {table} BEGIN
+                INSERT INTO search_index(search_index, rowid, title, body) VALUES ('delete', {old_values});
+                INSERT INTO search_index(rowid, title, body) VALUES ({new_values});
+            END
+        ''')
+        conn.execute(f'''
+            INSERT INTO search_index(rowid, title, body)
+            SELECT {_search_values('', number, title, body)} FROM {table}
+        ''')
+
+
+def _migrate_sort_indexes(conn):
+    """
+    Миграция 6: индексы под каждый порядок сортировки заметок и списков
+    Для каждого порядка есть индекс без фильтра и с фильтром приоритета, чтобы
+    строки читались из индекса уже упорядоченными. Напоминания сортируются
+    выражением (reminder_time IS NULL): заметки без напоминания идут последними
+    """
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_completed_title ON notes(completed, title)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_notes_completed_priority_title ON notes(completed, priority, title)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_notes_completed_reminder_order
+        ON notes(completed, reminder_time IS NULL, reminder_time)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_notes_completed_priority_reminder
+        ON notes(completed, priority, reminder_time IS NULL, reminder_time)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lists_completed_title ON lists(completed, title)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lists_completed_priority_title ON lists(completed, priority, title)')
+
+
+def _migrate_reminder_rule(conn):
+    """
+    Миграция 7: правило повторения напоминания
+    Следующее срабатывание хранится в reminder_time, который уже проиндексирован
+    вместе с completed, поэтому новый индекс не нужен
+    """
+    if _column_type(conn, 'notes', 'reminder_rule') is None:
+        conn.execute('ALTER TABLE notes ADD COLUMN reminder_rule TEXT')
+
+
+def _migrate_reminder_state(conn):
+    """
+    Миграция 8: состояние срабатывания и откладывания напоминаний
+    Отправленное напоминание отмечается reminder_fired_at, а не переносом
+    заметки в корзину; отложенное ждет reminder_snoozed_until. Ожидающие
+    напоминания читаются по частичному индексу времени срабатывания без уже
+    сработавших напоминаний. completed стоит в индексе первым столбцом, а не в
+    условии: без статистики планировщик иначе выбрал бы индекс с равенством
+    по completed
+    """
+    for column in ('reminder_fired_at', 'reminder_snoozed_until'):
+        if _column_type(conn, 'notes', column) is None:
+            conn.execute(f'ALTER TABLE notes ADD COLUMN {column} INTEGER')
+    # Заметки, которые в корзину отправило срабатывание напоминания (без
+    # deleted_at), возвращаются в список как сработавшие
+    conn.execute('''
+        UPDATE notes
+        SET completed = 0, reminder_fired_at = reminder_time
+        WHERE completed = 1 AND deleted_at IS NULL AND reminder_time IS NOT NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_notes_pending_reminder
+        ON notes(completed, coalesce(reminder_snoozed_until, reminder_time))
+        WHERE reminder_fired_at IS NULL
+    ''')
+    # Проверка и лента напоминаний читают частичный индекс, сортировка - свой
+    conn.execute('DROP INDEX IF EXISTS idx_notes_completed_reminder')
+
+
+def _log_trigger(conn, name, event, table, entity, action, row_id):
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN
+            INSERT INTO change_log(entity, action, row_id) VALUES ('{entity}', {action}, {row_id});
+        END
+    ''')
+
+
+def _migrate_change_log(conn):
+    """
+    Миграция 9: журнал изменений для других окон и процессов
+    Каждое изменение заметки, списка или элемента списка добавляет строку
+    (номер, сущность, действие, id) с теми же названиями, что события шины
+    changes. Журнал хранит последние CHANGE_LOG_KEEP строк (и не больше
+    CHANGE_LOG_PRUNE_EVERY сверх них)
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log
+        (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        action TEXT NOT NULL,
+        row_id INTEGER NOT NULL)
+    ''')
+    # Старые строки удаляются пачками, раз в CHANGE_LOG_PRUNE_EVERY записей
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS change_log_prune AFTER INSERT ON change_log
+        WHEN new.seq % {CHANGE_LOG_PRUNE_EVERY} = 0 BEGIN
+            DELETE FROM change_log WHERE seq <= new.seq - {CHANGE_LOG_KEEP};
+        END
+    ''')
+
+    # Перенос в корзину и восстановление - по completed, срабатывание - по reminder_fired_at
+    note_action = '''
+        CASE
+            WHEN new.completed != old.completed THEN CASE WHEN new.completed THEN 'trashed' ELSE 'restored' END
+            WHEN new.reminder_fired_at IS NOT NULL AND old.reminder_fired_at IS NULL THEN 'fired'
+            WHEN new.reminder_time IS NOT old.reminder_time
+                OR new.reminder_snoozed_until IS NOT old.reminder_snoozed_until THEN 'reminder'
+            ELSE 'updated'
+        END
+    '''
+    list_action = '''
+        CASE
+            WHEN new.completed != old.completed THEN CASE WHEN new.completed THEN 'trashed' ELSE 'restored' END
+            ELSE 'updated'
+        END
+    '''
+    for entity, table, update_action in (('note', 'notes', note_action), ('list', 'lists', list_action)):
+        _log_trigger(conn, f'change_log_{entity}_insert', 'INSERT', table, entity, "'created'", 'new.id')
+        _log_trigger(conn, f'change_log_{entity}_update', 'UPDATE', table, entity, update_action, 'new.id')
+        _log_trigger(conn, f'change_log_{entity}_delete', 'DELETE', table, entity, "'deleted'", 'old.id')
+    # Изменение элемента - изменение его списка
+    for event, prefix in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+        _log_trigger(conn, f'change_log_item_{event.lower()}', event, 'list_items', 'list', "'updated'",
+                     f'{prefix}.list_id')
+
+
+# Миграции схемы по порядку; номер версии хранится в PRAGMA user_version
+MIGRATIONS = [
+    _migrate_epoch_timestamps,
+    _migrate_integer_priority,
+    _migrate_trigram_index,
+    _migrate_word_index,
+    _migrate_global_index,
+    _migrate_sort_indexes,
+    _migrate_reminder_rule,
+    _migrate_reminder_state,
+    _migrate_change_log,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def apply_migrations(conn):
+    """
+    Применение недостающих миграций схемы
+    Каждая миграция выполняется в отдельной транзакции вместе с обновлением версии
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        # Блокировка записи берется сразу; версия перечитывается под ней, чтобы
+        # одновременно запущенный второй процесс не повторил ту же миграцию
+        conn.execute('BEGIN IMMEDIATE')
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= number:
+            conn.rollback()
+            continue
+        try:
+            MIGRATIONS[number - 1](conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,242 @@
+"""
+Нечеткий поиск MyNote: словарь терминов и поиск слов с опечатками
+
+Словарь терминов читается из fts5vocab над словарным индексом заметок
+(notes_words_vocab). Близкие термины ищутся как в SymSpell: для каждого
+термина заранее строятся варианты префикса длины PREFIX_LENGTH с удалением
+до MAX_DISTANCE символов. Слово запроса ищется по своим вариантам удаления,
+а найденные кандидаты проверяются точным расстоянием Дамерау-Левенштейна
+(оптимальное выравнивание строк).
+"""
+import re
+import threading
+
+import database
+import instrumentation
+
+# Наибольшее число опечаток в слове и длина префикса для вариантов удаления
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+# Наибольшее число терминов-кандидатов на одно слово запроса
+MAX_CANDIDATES = 20
+
+# Слова в том же виде, в каком их выделяет токенизатор unicode61
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """
+    Слова запроса в нижнем регистре
+    """
+    return _WORD.findall(text.lower())
+
+
+def allowed_distance(word):
+    """
+    Допустимое число опечаток: короткие слова только без ошибок
+    """
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 6:
+        return 1
+    return MAX_DISTANCE
+
+
+def _deletes(word, distance):
+    """
+    Слово и все его варианты с удалением до distance символов
+    """
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        result |= frontier
+    return result
+
+
+def edit_distance(a, b, limit):
+    """
+    Расстояние Дамерау-Левенштейна (с перестановкой соседних символов)
+    Если оно больше limit, возвращается limit + 1
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class SymSpellIndex:
+    """
+    Индекс вариантов удаления для поиска терминов по расстоянию редактирования
+    """
+
+    def __init__(self, max_distance=MAX_DISTANCE, prefix_length=PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.terms = {}
+        self.deletes = {}
+
+    def add(self, term, count):
+        """
+        Добавление термина или обновление его числа документов
+        """
+        if term in self.terms:
+            self.terms[term] = count
+            return
+        self.terms[term] = count
+        for key in _deletes(term[:self.prefix_length], self.max_distance):
+            self.deletes.setdefault(key, []).append(term)
+
+    def remove(self, term):
+        if self.terms.pop(term, None) is None:
+            return
+        for key in _deletes(term[:self.prefix_length], self.max_distance):
+            bucket = self.deletes.get(key)
+            if bucket is None:
+                continue
+            bucket.remove(term)
+            if not bucket:
+                del self.deletes[key]
+
+    def lookup(self, word, max_distance):
+        """
+        Термины на расстоянии не больше max_distance: список (термин, расстояние, документов)
+        Сначала ближайшие, при равном расстоянии - более частые
+        """
+        max_distance = min(max_distance, self.max_distance)
+        seen = set()
+        result = []
+        for key in _deletes(word[:self.prefix_length], max_distance):
+            for term in self.deletes.get(key, ()):
+                if term in seen:
+                    continue
+                seen.add(term)
+                distance = edit_distance(word, term, max_distance)
+                if distance <= max_distance:
+                    result.append((term, distance, self.terms[term]))
+        result.sort(key=lambda item: (item[1], -item[2]))
+        return result
+
+
+class TermDictionary:
+    """
+    Словарь терминов словарного индекса
+    Первое обращение загружает его синхронно; после записи в базу словарь
+    обновляется в фоне, а до окончания обновления используется прежний
+    """
+
+    def __init__(self, vocab_table):
+        self.vocab_table = vocab_table
+        self.index = SymSpellIndex()
+        self.generation = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def _load(self, conn):
+        with instrumentation.timed('search.fuzzy.load_terms'):
+            return dict(conn.execute(f'SELECT term, doc FROM {self.vocab_table}'))
+
+    def _apply(self, terms, generation):
+        with self._lock:
+            for term in [term for term in self.index.terms if term not in terms]:
+                self.index.remove(term)
+            for term, count in terms.items():
+                self.index.add(term, count)
+            self.generation = generation
+
+    def _refresh(self):
+        generation = database.write_generation()
+        conn = database.get_connection()
+        try:
+            self._apply(self._load(conn), generation)
+        except Exception as e:
+            print(f"Ошибка при обновлении словаря терминов: {e}")
+        finally:
+            conn.close()
+
+    def ensure(self, conn):
+        """
+        Словарь, соответствующий базе (или обновляемый в фоне)
+        """
+        generation = database.write_generation()
+        if self.generation is None:
+            if self._refreshing():
+                self._refresh_thread.join()
+            else:
+                self._apply(self._load(conn), generation)
+        elif generation != self.generation and not self._refreshing():
+            self._start_refresh()
+
+    def preload(self):
+        """
+        Фоновая загрузка словаря до первого нечеткого запроса
+        """
+        if self.generation is None and not self._refreshing():
+            self._start_refresh()
+
+    def _refreshing(self):
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def _start_refresh(self):
+        self._refresh_thread = threading.Thread(target=self._refresh, name='mynote-terms', daemon=True)
+        self._refresh_thread.start()
+
+    def candidates(self, word):
+        """
+        Термины словаря, близкие к слову запроса, с расстоянием
+        """
+        with self._lock:
+            found = self.index.lookup(word, allowed_distance(word))
+        return [(term, distance) for term, distance, _ in found[:MAX_CANDIDATES]]
+
+
+note_terms = TermDictionary('notes_words_vocab')
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_tiers(words, dictionary):
+    """
+    Выражения MATCH по уровням допустимых опечаток (0, 1, 2)
+    Уровень d находит документы, где каждое слово запроса встречается
+    с не более чем d опечатками; последнее слово также ищется как префикс
+    """
+    per_word = []
+    for position, word in enumerate(words):
+        candidates = {word: 0}
+        for term, distance in dictionary.candidates(word):
+            candidates.setdefault(term, distance)
+        options = [(_quote(term), distance) for term, distance in candidates.items()]
+        if position == len(words) - 1:
+            # Набираемое слово может быть недописанным
+            options.append((_quote(word) + '*', 0))
+        per_word.append(options)
+
+    tiers = []
+    for level in range(MAX_DISTANCE + 1):
+        groups = []
+        for options in per_word:
+            terms = [text for text, distance in options if distance <= level]
+            groups.append('(' + ' OR '.join(terms) + ')')
+        tiers.append(' AND '.join(groups))
+    return tiers
@@ -0,0 +1,631 @@
+"""
+Инструментирование горячих путей MyNote
+
+Гистограммы задержек для запросов к базе, полных перестроений списков и
+вызовов page.update(), а также счетчики событий (count). По умолчанию выключено и почти ничего не стоит:
+декораторы и контекстные менеджеры проверяют один флаг.
+
+Помимо гистограмм хранятся последние операции интерфейса (operation) с
+разбивкой на время SQL, число строк, число построенных элементов и время
+page.update() - их показывает отладочная панель приложения.
+
+Включение: переменная окружения MYNOTE_METRICS=1 или флаг запуска --metrics.
+Экспорт: JSON-файл (export_json) и/или локальная HTTP-точка /metrics.
+"""
+import atexit
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache, wraps
+
+# Верхние границы корзин гистограмм в миллисекундах
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_enabled = os.environ.get('MYNOTE_METRICS', '') not in ('', '0')
+_histograms = {}
+_counters = {}
+_lock = threading.Lock()
+_exporter = None
+
+# Последние операции интерфейса и стек текущих операций потока
+_operations = deque(maxlen=100)
+_operations_version = 0
+_local = threading.local()
+
+
+class Histogram:
+    """
+    Гистограмма задержек с фиксированными корзинами
+    buckets - верхние границы корзин в миллисекундах (по умолчанию BUCKETS_MS)
+    """
+
+    def __init__(self, name, buckets=BUCKETS_MS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms):
+        """
+        Добавление одного замера
+        """
+        index = 0
+        while index < len(self.buckets) and value_ms > self.buckets[index]:
+            index += 1
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_ms
+            if self.min is None or value_ms < self.min:
+                self.min = value_ms
+            if self.max is None or value_ms > self.max:
+                self.max = value_ms
+
+    def quantile(self, q):
+        """
+        Оценка квантиля по границам корзин
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        """
+        Состояние гистограммы в виде словаря
+        """
+        with self._lock:
+            return {
+                'count': self.count,
+                'sum_ms': round(self.total, 3),
+                'min_ms': round(self.min, 3) if self.min is not None else None,
+                'max_ms': round(self.max, 3) if self.max is not None else None,
+                'p50_ms': self.quantile(0.50),
+                'p95_ms': self.quantile(0.95),
+                'p99_ms': self.quantile(0.99),
+                'buckets': {
+                    str(bound): count for bound, count in zip(self.buckets + ('+Inf',), self.counts)
+                },
+            }
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def histogram(name, buckets=BUCKETS_MS):
+    """
+    Получение гистограммы по имени (создается при первом обращении)
+    Замер прямо в гистограмму записывается и при выключенном инструментировании
+    """
+    hist = _histograms.get(name)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(name, Histogram(name, buckets))
+    return hist
+
+
+def record(name, value_ms):
+    """
+    Запись замера, если инструментирование включено
+    """
+    if _enabled:
+        histogram(name).observe(value_ms)
+
+
+def count(name, value=1):
+    """
+    Увеличение счетчика, если инструментирование включено
+    """
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def reset():
+    """
+    Сброс всех накопленных гистограмм и счетчиков
+    """
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+class timed:
+    """
+    Замер времени блока или функции
+
+        with timed('startup.init_db'):
+            init_db()
+
+        @timed('view.notes.load_notes')
+        def load_notes(self): ...
+    """
+
+    __slots__ = ('name', '_start')
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter() if _enabled else None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is not None:
+            histogram(self.name).observe((time.perf_counter() - self._start) * 1000)
+        return False
+
+    def __call__(self, func):
+        name = self.name
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram(name).observe((time.perf_counter() - start) * 1000)
+
+        return wrapper
+
+
+class OperationRecord:
+    """
+    Одна операция интерфейса и ее составляющие
+    """
+
+    __slots__ = ('name', 'started_at', 'duration_ms', 'sql_ms', 'queries',
+                 'rows', 'controls', 'update_ms', 'updates')
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.sql_ms = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.controls = None
+        self.update_ms = 0.0
+        self.updates = 0
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def current_operation():
+    """
+    Текущая (самая вложенная) операция потока или None
+    """
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def recent_operations(limit=20):
+    """
+    Последние завершенные операции, новые первыми
+    """
+    return list(_operations)[-limit:][::-1]
+
+
+def operations_version():
+    """
+    Счетчик завершенных операций (для обновления панели только при изменениях)
+    """
+    return _operations_version
+
+
+def count_controls(control):
+    """
+    Размер дерева элементов управления
+    """
+    total = 0
+    pending = [control]
+    while pending:
+        item = pending.pop()
+        total += 1
+        get_children = getattr(item, '_get_children', None)
+        if get_children:
+            pending.extend(child for child in get_children() if child is not None)
+    return total
+
+
+class operation(timed):
+    """
+    Замер операции интерфейса: помимо гистограммы сохраняет запись с
+    временем SQL, числом строк, обновлений страницы и размером построенного
+    дерева (controls - функция, возвращающая корневой элемент представления)
+
+        @operation('view.notes.load_notes', controls=lambda self: self.notes_list)
+        def load_notes(self): ...
+    """
+
+    __slots__ = ('controls', '_record')
+
+    def __init__(self, name, controls=None):
+        super().__init__(name)
+        self.controls = controls
+        self._record = None
+
+    def _begin(self):
+        record = OperationRecord(self.name.split('.', 1)[-1] if self.name.startswith('view.') else self.name)
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(record)
+        return record
+
+    def _end(self, record, start, args):
+        global _operations_version
+        record.duration_ms = (time.perf_counter() - start) * 1000
+        _local.stack.pop()
+        if self.controls is not None and args:
+            try:
+                record.controls = count_controls(self.controls(args[0]))
+            except Exception:
+                record.controls = None
+        histogram(self.name).observe(record.duration_ms)
+        _operations.append(record)
+        _operations_version += 1
+
+    def __enter__(self):
+        if _enabled:
+            self._record = self._begin()
+            self._start = time.perf_counter()
+        else:
+            self._start = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is not None:
+            self._end(self._record, self._start, ())
+        return False
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            record = self._begin()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._end(record, start, args)
+
+        return wrapper
+
+
+def _account_sql(elapsed_ms, rows=0, query=False):
+    """
+    Учет запроса в текущей операции потока
+    """
+    record = current_operation()
+    if record is not None:
+        record.sql_ms += elapsed_ms
+        record.rows += rows
+        if query:
+            record.queries += 1
+
+
+def process_rss():
+    """
+    Резидентная память процесса в байтах (None, если узнать не удалось)
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # На macOS значение в байтах, на Linux - в килобайтах
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+@lru_cache(maxsize=512)
+def query_name(sql):
+    """
+    Короткое имя запроса для гистограммы: db.<операция>.<таблица>
+    """
+    words = sql.split(None, 1)
+    verb = words[0].lower() if words else 'unknown'
+    match = re.search(r'\b(?:FROM|INTO|UPDATE|TABLE(?: IF NOT EXISTS)?)\s+([A-Za-z_][A-Za-z0-9_]*)', sql, re.IGNORECASE)
+    if verb == 'update' and len(words) > 1:
+        table = words[1].split(None, 1)[0]
+    else:
+        table = match.group(1) if match else ''
+    return f"db.{verb}.{table}" if table else f"db.{verb}"
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Курсор, который замеряет выполнение запросов и выборку строк
+    Строки, прочитанные перебором курсора (for row in cursor), копятся и
+    записываются одним замером: когда строки кончились, при следующем
+    запросе этого курсора или при его закрытии
+    """
+
+    _name = 'db.unknown'
+    _iter_ms = 0.0
+    _iter_rows = 0
+
+    def _record(self, start, rows=0, query=False):
+        elapsed = (time.perf_counter() - start) * 1000
+        record(self._name, elapsed)
+        _account_sql(elapsed, rows, query)
+
+    def _flush_iteration(self):
+        if self._iter_rows or self._iter_ms:
+            record(self._name, self._iter_ms)
+            _account_sql(self._iter_ms, self._iter_rows)
+            self._iter_ms = 0.0
+            self._iter_rows = 0
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._iter_ms += (time.perf_counter() - start) * 1000
+            self._flush_iteration()
+            raise
+        self._iter_ms += (time.perf_counter() - start) * 1000
+        self._iter_rows += 1
+        return row
+
+    def close(self):
+        self._flush_iteration()
+        return super().close()
+
+    def execute(self, sql, parameters=()):
+        self._flush_iteration()
+        self._name = query_name(sql)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(start, query=True)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._flush_iteration()
+        self._name = query_name(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(start, query=True)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = None
+        try:
+            row = super().fetchone()
+            return row
+        finally:
+            self._record(start, rows=int(row is not None))
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = []
+        try:
+            rows = super().fetchall()
+            return rows
+        finally:
+            self._record(start, rows=len(rows))
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = []
+        try:
+            rows = super().fetchmany(self.arraysize if size is None else size)
+            return rows
+        finally:
+            self._record(start, rows=len(rows))
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    Соединение, все курсоры которого замеряют запросы
+    """
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def instrument_page(page):
+    """
+    Замер каждого page.update() (включая Control.update(), который его вызывает)
+    """
+    original_update = page.update
+
+    def update(*controls):
+        if not _enabled:
+            return original_update(*controls)
+        start = time.perf_counter()
+        try:
+            return original_update(*controls)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            histogram('ui.page_update').observe(elapsed)
+            current = current_operation()
+            if current is not None:
+                current.update_ms += elapsed
+                current.updates += 1
+
+    page.update = update
+    return page
+
+
+def snapshot():
+    """
+    Снимок всех гистограмм и счетчиков
+    """
+    with _lock:
+        items = list(_histograms.items())
+        counters = dict(sorted(_counters.items()))
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'pid': os.getpid(),
+        'histograms': {name: hist.snapshot() for name, hist in sorted(items)},
+        'counters': counters,
+    }
+
+
+def export_json(path):
+    """
+    Запись метрик в JSON-файл (атомарно через временный файл)
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_prometheus():
+    """
+    Метрики в текстовом формате Prometheus
+    """
+    lines = []
+    data_snapshot = snapshot()
+    for name, value in data_snapshot['counters'].items():
+        metric = 'mynote_' + re.sub(r'[^A-Za-z0-9_]', '_', name) + '_total'
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, data in data_snapshot['histograms'].items():
+        metric = 'mynote_' + re.sub(r'[^A-Za-z0-9_]', '_', name) + '_ms'
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in data['buckets'].items():
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_sum {data['sum_ms']}")
+        lines.append(f"{metric}_count {data['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def _make_handler():
+    """
+    Класс обработчика HTTP-точки с метриками (http.server импортируется только здесь)
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """
+        Обработчик локальной HTTP-точки с метриками
+        """
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = export_prometheus().encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/metrics.json':
+                body = json.dumps(snapshot(), ensure_ascii=False).encode('utf-8')
+                content_type = 'application/json; charset=utf-8'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+class MetricsExporter:
+    """
+    Периодическая выгрузка метрик в файл и/или HTTP-точка на localhost
+    """
+
+    def __init__(self, path=None, port=None, interval=30):
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.server = None
+
+    def start(self):
+        if self.path:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+        if self.port:
+            from http.server import ThreadingHTTPServer
+            self.server = ThreadingHTTPServer(('127.0.0.1', self.port), _make_handler())
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        if self.path:
+            try:
+                export_json(self.path)
+            except OSError as e:
+                print(f"Ошибка при выгрузке метрик: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server:
+            self.server.shutdown()
+        self.flush()
+
+
+def start_export(path=None, port=None, interval=30):
+    """
+    Запуск экспорта метрик (повторный вызов возвращает уже запущенный экспорт)
+    """
+    global _exporter
+    if _exporter is None:
+        _exporter = MetricsExporter(path, port, interval)
+        _exporter.start()
+    return _exporter
@@ -1,10 +1,296 @@
+import time
+
+# Момент запуска процесса (до импорта Flet) для замера времени до интерактивности
+PROCESS_STARTED = time.perf_counter()
+
+import argparse
+import atexit
+import heapq
+import json
 import logging
+import logging.handlers
+import queue
+import os
 import sqlite3
-import time
 from datetime import datetime, timedelta
+from functools import lru_cache
 from flet import *
 import threading
-import plyer
+
+import changes
+import fuzzy
+import instrumentation
+import reminders
+import search
+from database import FileLock, SCHEDULER_LOCK_PATH, apply_migrations, enable_wal, get_connection, run_write
+from instrumentation import operation, timed
+
+# Длина превью заметки в списках; полный текст загружается по требованию
+NOTE_PREVIEW_CHARS = 300
+
+# Столбцы карточки заметки (порядок используется по индексам):
+# id, title, превью, priority, color, created, deleted_at, reminder_time, reminder_rule
+NOTE_CARD_COLUMNS = f'''id, title, substr(content, 1, {NOTE_PREVIEW_CHARS + 1}), priority, color,
+                       created, deleted_at, reminder_time, reminder_rule'''
+
+# Приоритет хранится в базе числом; подписи существуют только в интерфейсе
+PRIORITY_LABELS = {
+     0: 'Низкий',
+     1: 'Средний',
+     2: 'Высокий',
+}
+DEFAULT_PRIORITY = 0
+
+
+def priority_options():
+     """
+    Варианты выпадающего списка приоритетов: ключ - число из базы, текст - подпись
+    """
+     return [dropdown.Option(key=str(level), text=label) for level, label in PRIORITY_LABELS.items()]
+
+
+def highlight_spans(marked):
+     """
+    Фрагменты для Text(spans=...): места между маркерами совпадения выделяются
+    """
+     spans = []
+     parts = marked.split(search.HIGHLIGHT_START)
+     if parts[0]:
+          spans.append(TextSpan(parts[0]))
+     for part in parts[1:]:
+          found, _, rest = part.partition(search.HIGHLIGHT_END)
+          if found:
+               spans.append(TextSpan(found, TextStyle(weight=FontWeight.BOLD, bgcolor=colors.YELLOW_200)))
+          if rest:
+               spans.append(TextSpan(rest))
+     return spans
+
+
+# Варианты повторения напоминания; 'every' - свой интервал в минутах
+REPEAT_LABELS = {
+     'none': 'Не повторять',
+     'daily': 'Каждый день',
+     'weekly': 'Каждую неделю',
+     'monthly': 'Каждый месяц',
+     'every': 'Свой интервал',
+}
+
+
+def repeat_label(rule):
+     """
+    Подпись правила повторения напоминания для карточки
+    """
+     kind, value = reminders.parse_rule(rule)
+     if kind == 'every':
+          return f"каждые {value} мин"
+     return REPEAT_LABELS.get(kind, kind).lower()
+
+
+def priority_label(value):
+     """
+    Подпись приоритета для отображения
+    """
+     return PRIORITY_LABELS.get(value, PRIORITY_LABELS[DEFAULT_PRIORITY])
+
+
+def parse_priority(value, default=None):
+     """
+    Значение приоритета из выпадающего списка; "Все" и пустое значение дают default
+    """
+     try:
+          return int(value)
+     except (TypeError, ValueError):
+          return default
+
+
+# Снимок первого экрана заметок для мгновенной отрисовки при запуске
+SNAPSHOT_PATH = 'notes_snapshot.json'
+SNAPSHOT_SIZE = 20
+SNAPSHOT_PREVIEW_CHARS = 200
+
+# Журнал напоминаний с ротацией по размеру
+REMINDER_LOG_PATH = 'reminder_log.txt'
+REMINDER_LOG_MAX_BYTES = 1024 * 1024
+REMINDER_LOG_BACKUPS = 3
+
+# Поток записи журнала напоминаний (один на процесс)
+_reminder_log_listener = None
+_reminder_log_lock = threading.Lock()
+
+
+def setup_reminder_logging():
+     """
+    Логгер напоминаний, пишущий через очередь
+    Логгер только кладет записи в очередь (QueueHandler) и никогда не ждет диска;
+    файл и консоль обслуживает отдельный поток QueueListener. Повторный вызов
+    возвращает уже настроенный логгер и обработчиков не добавляет
+    """
+     global _reminder_log_listener
+     logger = logging.getLogger('ReminderManager')
+     with _reminder_log_lock:
+          if _reminder_log_listener is not None:
+               return logger
+          logger.setLevel(logging.INFO)
+
+          # Файл с ротацией по размеру и вывод в консоль
+          file_handler = logging.handlers.RotatingFileHandler(
+               REMINDER_LOG_PATH,
+               maxBytes=REMINDER_LOG_MAX_BYTES,
+               backupCount=REMINDER_LOG_BACKUPS,
+               encoding='utf-8'
+          )
+          console_handler = logging.StreamHandler()
+          formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+          for handler in (file_handler, console_handler):
+               handler.setLevel(logging.INFO)
+               handler.setFormatter(formatter)
+
+          # Очередь без ограничения размера: запись в нее не блокирует
+          log_queue = queue.SimpleQueue()
+          logger.addHandler(logging.handlers.QueueHandler(log_queue))
+          _reminder_log_listener = logging.handlers.QueueListener(
+               log_queue, file_handler, console_handler, respect_handler_level=True
+          )
+          _reminder_log_listener.start()
+          # Остаток очереди дописывается при завершении работы
+          atexit.register(_reminder_log_listener.stop)
+     return logger
+
+
+@lru_cache(maxsize=4096)
+def _format_minute(minute):
+     return datetime.fromtimestamp(minute * 60).strftime('%d.%m.%Y %H:%M')
+
+
+def format_timestamp(value):
+     """
+    Отображаемая строка для времени в секундах эпохи
+    Строка строится один раз на каждую минуту и кэшируется
+    """
+     if value is None or value == '':
+          return ""
+     try:
+          return _format_minute(int(value) // 60)
+     except (TypeError, ValueError, OverflowError, OSError):
+          # Значение старого формата, не распознанное миграцией
+          return str(value)
+
+
+# Ключи сортировки карточек заметок, повторяющие порядок search.NOTE_SORTS
+NOTE_SORT_KEYS = {
+     'created': lambda note: (-(note[5] or 0), -note[0]),
+     'title': lambda note: (note[1] is not None, note[1] or '', note[0]),
+     'priority': lambda note: (-(note[3] or 0), -(note[5] or 0), -note[0]),
+     'reminder': lambda note: (note[7] is None, note[7] or 0, note[0]),
+}
+
+
+def trash_sort_key(note):
+     """Порядок корзины: сначала удаленные последними"""
+     return -(note[6] or 0), -note[0]
+
+
+def list_sort_key(row):
+     """Порядок списков: сначала созданные последними"""
+     return -(row[5] or 0), -row[0]
+
+
+class CardIndex:
+     """
+    Карточки представления по id строки для точечного обновления
+    Карточки стоят в column.controls в порядке ключей сортировки; по событию
+    шины изменений (changes) карточка заменяется на месте, переставляется по
+    новому ключу или убирается, а остальные строки не перечитываются.
+    В режиме поиска ключей нет: карточки обновляются и убираются, но новые
+    строки не добавляются, пока поиск не выполнен заново
+    """
+
+     def __init__(self, column):
+          self.column = column
+          self.lock = threading.RLock()
+          # None - представление еще не загружено, 'all' - все строки, 'search' - результаты поиска
+          self.mode = None
+          self.cards = {}
+          self.rows = {}
+          # id(карточки) -> (id строки, ключ сортировки)
+          self.entries = {}
+
+     def reset(self, mode):
+          """
+        Очистка перед полной загрузкой в режиме mode
+        """
+          self.mode = mode
+          self.cards.clear()
+          self.rows.clear()
+          self.entries.clear()
+          self.column.controls.clear()
+
+     def add(self, row_id, row, card, key=None):
+          """
+        Карточка в конец списка (при полной загрузке строки уже упорядочены)
+        """
+          self.cards[row_id] = card
+          self.rows[row_id] = row
+          self.entries[id(card)] = (row_id, key)
+          self.column.controls.append(card)
+
+     def remove(self, row_id):
+          card = self.cards.pop(row_id, None)
+          self.rows.pop(row_id, None)
+          if card is None:
+               return False
+          self.entries.pop(id(card), None)
+          controls = self.column.controls
+          for index, control in enumerate(controls):
+               if control is card:
+                    del controls[index]
+                    break
+          return True
+
+     def put(self, row_id, row, card, key=None):
+          """
+        Новая карточка строки: на месте прежней, если ключ не изменился, иначе
+        на месте по ключу. Без ключа новая строка не добавляется
+        Возвращает True, если карточка показана
+        """
+          controls = self.column.controls
+          old = self.cards.get(row_id)
+          if old is not None and self.entries[id(old)][1] == key:
+               for index, control in enumerate(controls):
+                    if control is old:
+                         controls[index] = card
+                         break
+               self.entries.pop(id(old))
+          else:
+               if key is None:
+                    return False
+               self.remove(row_id)
+               # Заглушки без строки (например, "Заметки не найдены") уступают место карточке
+               controls[:] = [control for control in controls if id(control) in self.entries]
+               position = len(controls)
+               for index, control in enumerate(controls):
+                    entry = self.entries.get(id(control))
+                    if entry is not None and entry[1] is not None and entry[1] > key:
+                         position = index
+                         break
+               controls.insert(position, card)
+          self.cards[row_id] = card
+          self.rows[row_id] = row
+          self.entries[id(card)] = (row_id, key)
+          return True
+
+     def ordered_rows(self, limit):
+          """
+        Первые limit строк в порядке показа
+        """
+          rows = []
+          for control in self.column.controls:
+               entry = self.entries.get(id(control))
+               if entry is not None:
+                    rows.append(self.rows[entry[0]])
+                    if len(rows) == limit:
+                         break
+          return rows
 
 
 def init_db():
@@ -12,7 +298,9 @@ def init_db():
     Инициализация базы данных
     Создание таблиц notes, lists и list_items
     """
-     conn = sqlite3.connect('tasks.db')
+     conn = get_connection()
+     # Режим WAL: другие окна и скрипты читают базу, не мешая записи
+     enable_wal(conn)
      cursor = conn.cursor()
 
      # Таблица заметок (без изменений)
@@ -20,12 +308,15 @@ def init_db():
                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
                     title TEXT, 
                     content TEXT,
-                    priority TEXT,
+                    priority INTEGER DEFAULT 0,
                     color TEXT,
                     created DATETIME,
                     completed BOOLEAN DEFAULT 0,
                     deleted_at DATETIME,
-                    reminder_time DATETIME)''')
+                    reminder_time DATETIME,
+                    reminder_rule TEXT,
+                    reminder_fired_at INTEGER,
+                    reminder_snoozed_until INTEGER)''')
 
      # Обновленная таблица списков с правильными столбцами
      cursor.execute('''CREATE TABLE IF NOT EXISTS lists 
@@ -33,7 +324,7 @@ def init_db():
                     title TEXT,
                     description TEXT,
                     color TEXT,
-                    priority TEXT,
+                    priority INTEGER DEFAULT 0,
                     created DATETIME,
                     completed BOOLEAN DEFAULT 0,
                     deleted_at DATETIME)''')
@@ -47,6 +338,9 @@ def init_db():
                     FOREIGN KEY(list_id) REFERENCES lists(id))''')
 
      conn.commit()
+
+     # Приведение существующей базы к текущей версии схемы
+     apply_migrations(conn)
      conn.close()
 
 
@@ -55,6 +349,9 @@ class ReminderManager:
     Класс для управления напоминаниями в фоновом режиме
     """
 
+     # Наибольшая пауза между проверками напоминаний, секунды
+     SCAN_INTERVAL = 60
+
      def __init__(self):
           """
         Инициализация менеджера напоминаний
@@ -64,31 +361,80 @@ class ReminderManager:
           self.reminder_thread = None
           self.logger = self._setup_logger()
 
+          # Очередь планировщика: куча ближайших времен срабатывания. Поток
+          # проверки спит до первого времени в очереди, но не дольше
+          # SCAN_INTERVAL; новое время будит его через wake_event
+          self.queue = []
+          self.queue_lock = threading.Lock()
+          self.wake_event = threading.Event()
+          self.last_check_time = 0
+
+          # Объединение уведомлений (настраивается параметрами запуска)
+          self.coalesce_threshold = reminders.COALESCE_THRESHOLD
+          self.coalesce_titles = reminders.COALESCE_TITLES
+          self.coalesce_window = reminders.COALESCE_WINDOW
+
+          # Задержка срабатывания, длительность проверки и время отправки уведомлений
+          self.stats = reminders.DeliveryStats()
+
+          # Напоминания проверяет один процесс из открывших базу
+          self.scheduler_lock = FileLock(SCHEDULER_LOCK_PATH)
+          # Отписка от шины изменений (пока работает поток проверки)
+          self.unsubscribe = None
+
      def _setup_logger(self):
           """
         Настройка логирования для менеджера напоминаний
         """
-          logger = logging.getLogger('ReminderManager')
-          logger.setLevel(logging.INFO)
-
-          # Создание обработчика для записи в файл
-          file_handler = logging.FileHandler('reminder_log.txt', encoding='utf-8')
-          file_handler.setLevel(logging.INFO)
-
-          # Создание обработчика для вывода в консоль
-          console_handler = logging.StreamHandler()
-          console_handler.setLevel(logging.INFO)
-
-          # Формат логов
-          formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-          file_handler.setFormatter(formatter)
-          console_handler.setFormatter(formatter)
+          return setup_reminder_logging()
 
-          # Добавление обработчиков
-          logger.addHandler(file_handler)
-          logger.addHandler(console_handler)
+     def schedule(self, fire_time):
+          """
+        Постановка времени срабатывания в очередь планировщика
+        Поток проверки просыпается и пересчитывает время ожидания
+        """
+          if fire_time is None:
+               return
+          with self.queue_lock:
+               heapq.heappush(self.queue, int(fire_time))
+          self.wake_event.set()
 
-          return logger
+     def snooze(self, note_id, until):
+          """
+        Откладывание напоминания до времени until (Unix)
+        Одно обновление по первичному ключу и постановка в очередь, без повторной проверки базы
+        """
+          until = int(until)
+          run_write(lambda conn: conn.execute('''
+               UPDATE notes
+               SET reminder_snoozed_until = ?, reminder_fired_at = NULL
+               WHERE id = ?
+          ''', (until, note_id)))
+          self.logger.info(f"Напоминание {note_id} отложено до {format_timestamp(until)}")
+          self.schedule(until)
+          changes.publish(changes.NOTE, changes.REMINDER, [note_id])
+
+     # События заметок, после которых может появиться более раннее время срабатывания
+     RESCHEDULE_ACTIONS = (changes.CREATED, changes.REMINDER, changes.RESTORED, changes.RELOAD)
+
+     def on_change(self, change):
+          """
+        Обработчик шины изменений: напоминание, сохраненное в другом окне или
+        процессе, ставится в очередь процесса, который проверяет напоминания
+        """
+          if change.action not in self.RESCHEDULE_ACTIONS or not self.scheduler_lock.held:
+               return
+          conn = get_connection()
+          try:
+               sql = f'SELECT min({reminders.FIRE_TIME}) FROM notes WHERE {reminders.PENDING}'
+               params = ()
+               if change.ids:
+                    sql += ' AND id IN (SELECT value FROM json_each(?))'
+                    params = (json.dumps(change.ids),)
+               fire_time = conn.execute(sql, params).fetchone()[0]
+          finally:
+               conn.close()
+          self.schedule(fire_time)
 
      def start_reminder_check(self):
           """
@@ -99,6 +445,7 @@ class ReminderManager:
                # Остановка существующего потока
                if self.reminder_thread and self.reminder_thread.is_alive():
                     self.stop_event.set()
+                    self.wake_event.set()
                     self.reminder_thread.join()
 
                # Сброс события остановки
@@ -108,76 +455,198 @@ class ReminderManager:
                self.reminder_thread = threading.Thread(target=self._check_reminders, daemon=True)
                self.reminder_thread.start()
 
+               # Напоминания других процессов приходят через журнал изменений
+               if self.unsubscribe is None:
+                    self.unsubscribe = changes.bus.subscribe(self.on_change, changes.NOTE)
+
                self.logger.info("Поток проверки напоминаний запущен")
           except Exception as e:
                self.logger.error(f"Ошибка при запуске потока проверки напоминаний: {e}")
 
-     def _check_reminders(self):
+     def check_due_reminders(self):
           """
-        Внутренний метод проверки напоминаний
-        Проверяет базу данных на наличие напоминаний и отправляет уведомления
+        Однократная проверка наступивших напоминаний
+        Отправляет уведомления и возвращает их количество; длительность
+        проверки записывается, а сводка здоровья доставки сохраняется в файл
         """
-          while not self.stop_event.is_set():
+          started = time.perf_counter()
+          try:
+               return self._scan()
+          finally:
+               self.stats.scan.observe((time.perf_counter() - started) * 1000)
                try:
-                    # Подключение к базе данных
-                    conn = sqlite3.connect('tasks.db')
-                    cursor = conn.cursor()
-
-                    # Получение текущего времени и поиск напоминаний
-                    current_time = datetime.now()
-                    cursor.execute('''
-                SELECT id, title, content, reminder_time 
+                    self.stats.write()
+               except OSError as e:
+                    self.logger.error(f"Ошибка при сохранении статистики напоминаний: {e}")
+
+     def _scan(self):
+          # Подключение к базе данных (только чтение; запись - отдельной короткой транзакцией)
+          conn = get_connection()
+          cursor = conn.cursor()
+
+          # Получение текущего времени и поиск напоминаний; наступающие в ближайшие
+          # coalesce_window секунд отправляются вместе с уже наступившими
+          current_time = int(time.time())
+          horizon = current_time + self.coalesce_window
+          cursor.execute(f'''
+                SELECT id, title, content, reminder_time, reminder_rule, {reminders.FIRE_TIME}
                 FROM notes 
-                WHERE reminder_time <= ? AND completed = 0 AND reminder_time IS NOT NULL
-            ''', (current_time,))
-
-                    due_reminders = cursor.fetchall()
+                WHERE {reminders.PENDING} AND {reminders.FIRE_TIME} <= ?
+                ORDER BY priority DESC, {reminders.FIRE_TIME}, id
+            ''', (horizon,))
+
+          due_reminders = cursor.fetchall()
+          conn.close()
+          sent = 0
+          fired = []
+          # Изменения после отправки: (новое reminder_time, id, прежнее время срабатывания)
+          # для повторяющихся и (время отправки, id, прежнее время срабатывания) для разовых
+          rescheduled = []
+          marked = []
+          # Задержки отправки относительно времени срабатывания, секунды
+          lags = []
+
+          if due_reminders:
+               # plyer импортируется только когда есть что отправлять
+               import plyer
+
+          # Отправка уведомлений: при большом числе напоминаний - одно сводное
+          notifications = reminders.coalesce(due_reminders, self.coalesce_threshold, self.coalesce_titles)
+          for title, message, delivered in notifications:
+               notify_started = time.perf_counter()
+               try:
+                    # Отправка системного уведомления
+                    plyer.notification.notify(
+                         title=title,
+                         message=message,
+                         timeout=10
+                    )
+               except Exception as notify_error:
+                    self.logger.error(f"Ошибка при отправке уведомления: {notify_error}")
+                    continue
+               finally:
+                    self.stats.notify.observe((time.perf_counter() - notify_started) * 1000)
+               delivered_at = time.time()
+
+               if len(delivered) > 1:
+                    self.logger.info(f"Отправлено сводное уведомление: {len(delivered)} напоминаний")
+                    instrumentation.count('reminders.summaries')
+                    instrumentation.count('reminders.coalesced', len(delivered))
+               for reminder in delivered:
+                    self.logger.info(f"Отправлено напоминание: {reminder[1]}")
+
+                    if reminder[4]:
+                         # Повторяющееся напоминание переносится на следующее срабатывание
+                         next_time = reminders.next_occurrence(reminder[4], reminder[3], horizon)
+                         rescheduled.append((next_time, reminder[0], reminder[5]))
+                    else:
+                         # Сработавшее напоминание отмечается отдельно: заметка остается в списке
+                         marked.append((current_time, reminder[0], reminder[5]))
+                    sent += 1
+                    fired.append(reminder[0])
+                    lags.append(delivered_at - reminder[5])
+               instrumentation.count('reminders.notifications')
+
+          def mark_delivered(conn):
+               # Строка не меняется, если напоминание успели переставить после выборки
+               conn.executemany(f'''
+                    UPDATE notes
+                    SET reminder_time = ?, reminder_snoozed_until = NULL
+                    WHERE id = ? AND {reminders.FIRE_TIME} = ?
+               ''', rescheduled)
+               conn.executemany(f'''
+                    UPDATE notes
+                    SET reminder_fired_at = ?, reminder_snoozed_until = NULL
+                    WHERE id = ? AND {reminders.FIRE_TIME} = ?
+               ''', marked)
+
+          # Уведомления уже отправлены, поэтому транзакция записи короткая
+          if rescheduled or marked:
+               run_write(mark_delivered)
+          instrumentation.count('reminders.delivered', sent)
+          alert = self.stats.observe_lags(lags)
+          if alert:
+               self.logger.warning(alert)
+
+          # Ближайшее следующее срабатывание - в очередь планировщика
+          conn = get_connection()
+          try:
+               next_fire = conn.execute(f'''
+                    SELECT min({reminders.FIRE_TIME}) FROM notes
+                    WHERE {reminders.PENDING} AND {reminders.FIRE_TIME} > ?
+               ''', (horizon,)).fetchone()[0]
+          finally:
+               conn.close()
+          self.schedule(next_fire)
 
-                    # Отправка уведомлений для просроченных напоминаний
-                    for reminder in due_reminders:
-                         try:
-                              # Отправка системного уведомления
-                              plyer.notification.notify(
-                                   title=f"Напоминание: {reminder[1]}",
-                                   message=reminder[2],
-                                   timeout=10
-                              )
+          with self.queue_lock:
+               self.last_check_time = horizon
+          # Подписчики (карточки, лента, окно откладывания) получают id сработавших
+          changes.publish(changes.NOTE, changes.FIRED, fired)
+          return sent
 
-                              self.logger.info(f"Отправлено напоминание: {reminder[1]}")
+     def next_wait(self):
+          """
+        Время ожидания до ближайшего срабатывания в очереди, не больше SCAN_INTERVAL
+        Времена, уже охваченные последней проверкой, убираются из очереди
+        """
+          with self.queue_lock:
+               while self.queue and self.queue[0] <= self.last_check_time:
+                    heapq.heappop(self.queue)
+               if not self.queue:
+                    return self.SCAN_INTERVAL
+               return min(max(self.queue[0] - time.time(), 0), self.SCAN_INTERVAL)
+
+     def wait(self, timeout):
+          """
+        Ожидание следующей проверки; прерывается остановкой или новым временем в очереди
+        """
+          self.wake_event.wait(timeout)
+          self.wake_event.clear()
 
-                              # Пометка напоминания как выполненного
-                              cursor.execute('''
-                        UPDATE notes 
-                        SET completed = 1 
-                        WHERE id = ?
-                    ''', (reminder[0],))
-                         except Exception as notify_error:
-                              self.logger.error(f"Ошибка при отправке уведомления: {notify_error}")
+     def _check_reminders(self):
+          """
+        Внутренний метод проверки напоминаний
+        Периодически проверяет базу данных на наличие напоминаний. Проверяет
+        только процесс, взявший блокировку планировщика; остальные раз в
+        SCAN_INTERVAL пробуют взять ее, чтобы заменить закрытый процесс
+        """
+          while not self.stop_event.is_set():
+               try:
+                    if not self.scheduler_lock.held:
+                         if not self.scheduler_lock.acquire():
+                              self.wait(self.SCAN_INTERVAL)
+                              continue
+                         self.logger.info("Этот процесс проверяет напоминания")
 
-                    conn.commit()
-                    conn.close()
+                    self.check_due_reminders()
 
-                    # Ожидание минуты перед следующей проверкой
-                    self.stop_event.wait(60)
+                    # Ожидание ближайшего срабатывания из очереди (не дольше минуты)
+                    self.wait(self.next_wait())
 
                except sqlite3.Error as db_error:
                     self.logger.error(f"Ошибка базы данных при проверке напоминаний: {db_error}")
                     # Ожидание перед повторной попыткой
-                    self.stop_event.wait(60)
+                    self.wait(self.SCAN_INTERVAL)
 
                except Exception as e:
                     self.logger.error(f"Неожиданная ошибка при проверке напоминаний: {e}")
                     # Ожидание перед повторной попыткой
-                    self.stop_event.wait(60)
+                    self.wait(self.SCAN_INTERVAL)
 
      def stop_reminder_check(self):
           """
         Остановка потока проверки напоминаний
         """
           try:
+               if self.unsubscribe:
+                    self.unsubscribe()
+                    self.unsubscribe = None
                if self.reminder_thread:
                     self.stop_event.set()
+                    self.wake_event.set()
                     self.reminder_thread.join()
+                    self.scheduler_lock.release()
                     self.logger.info("Поток проверки напоминаний остановлен")
           except Exception as e:
                self.logger.error(f"Ошибка при остановке потока проверки напоминаний: {e}")
@@ -191,9 +660,9 @@ class ListManager:
 
         # Приоритеты списков с серыми оттенками
         self.priority_levels = {
-            'Низкий': colors.GREY_600,
-            'Средний': colors.GREY_700,
-            'Высокий': colors.GREY_800
+            0: colors.GREY_600,
+            1: colors.GREY_700,
+            2: colors.GREY_800
         }
 
         # Основные элементы интерфейса
@@ -224,7 +693,7 @@ class ListManager:
             width=400,
             border_color=colors.GREY_700,
             focused_border_color=colors.GREY_600,
-            options=[dropdown.Option(priority) for priority in self.priority_levels.keys()],
+            options=priority_options(),
             color=colors.WHITE
         )
 
@@ -243,9 +712,9 @@ class ListManager:
             label="Сортировка",
             width=300,
             options=[
-                dropdown.Option("По дате создания"),
-                dropdown.Option("По названию"),
-                dropdown.Option("По приоритету")
+                dropdown.Option(key='created', text="По дате создания"),
+                dropdown.Option(key='title', text="По названию"),
+                dropdown.Option(key='priority', text="По приоритету")
             ],
             on_change=self.perform_search,
             border_color=colors.GREY_700,
@@ -256,12 +725,7 @@ class ListManager:
         self.priority_filter = Dropdown(
             label="Фильтр приоритета",
             width=300,
-            options=[
-                dropdown.Option("Все"),
-                dropdown.Option("Низкий"),
-                dropdown.Option("Средний"),
-                dropdown.Option("Высокий")
-            ],
+            options=[dropdown.Option("Все")] + priority_options(),
             on_change=self.perform_search,
             border_color=colors.GREY_700,
             focused_border_color=colors.GREY_600,
@@ -300,15 +764,19 @@ class ListManager:
         )
 
         # Список для хранения элементов
+        # Сами списки загружаются при открытии вкладки
         self.list_items = []
-        self.load_lists()
 
+        # Карточки показанных списков для точечного обновления (apply_change)
+        self.cards = CardIndex(self.list_items_container)
+
+    @operation('view.lists.load_lists', controls=lambda self: self.list_items_container)
     def load_lists(self, tab_name="Списки"):
          """
          Загрузка списков для конкретной вкладки
          """
          try:
-              conn = sqlite3.connect('tasks.db')
+              conn = get_connection()
               cursor = conn.cursor()
 
               # Получаем списки только для этой вкладки
@@ -316,111 +784,170 @@ class ListManager:
                  SELECT id, title, description, color, priority, created 
                  FROM lists 
                  WHERE completed = 0 
-                 ORDER BY created DESC
+                 ORDER BY created DESC, id DESC
              ''')
               lists = cursor.fetchall()
+              list_items = self.fetch_list_items(cursor, [row[0] for row in lists])
+              conn.close()
 
-              # Очистка текущего контейнера
-              self.list_items_container.controls.clear()
-
-              # Создание визуальных элементов для каждого списка
-              for list_id, title, description, color, priority, created in lists:
-                   # Получаем элементы списка
-                   cursor.execute('''
-                     SELECT text, is_completed 
-                     FROM list_items 
-                     WHERE list_id = ?
-                 ''', (list_id,))
-                   list_items = cursor.fetchall()
-
-                   # Создаем контейнер для элементов списка с чекбоксами
-                   items_column = Column()
-                   for item_text, is_completed in list_items:
-                        item_checkbox = Checkbox(
-                             label=item_text,
-                             value=bool(is_completed),
-                             on_change=lambda e, lid=list_id, text=item_text: self.toggle_list_item(e, lid, text),
-                             label_style=TextThemeStyle.BODY_SMALL if is_completed else TextThemeStyle.BODY_MEDIUM,
-                             active_color=colors.GREY_700 if is_completed else colors.GREY_600
-                        )
-                        items_column.controls.append(item_checkbox)
-
-                   # Создаем карточку списка
-                   list_card = Container(
-                        width=600,
-                        padding=10,
-                        border_radius=10,
-                        gradient=LinearGradient(
-                             begin=alignment.center_left,
-                             end=alignment.center_right,
-                             colors=[colors.GREY_900, colors.GREY_800]
-                        ),
-                        content=Column([
-                             Text(title, size=18, weight=FontWeight.BOLD, color=colors.WHITE),
-                             Text(description or "", size=12, color=colors.GREY_600),
-                             Row([
-                                  Text(f"Приоритет: {priority}",
-                                       color=self.priority_levels.get(priority, colors.GREY_600)),
-                                  Text(f"Создан: {created}", color=colors.GREY_600)
-                             ], alignment='spaceBetween'),
-                             items_column
-                        ])
-                   )
-
-                   # Добавляем действия для редактирования и удаления
-                   list_card.data = {
-                        'list_id': list_id,
-                        'title': title,
-                        'description': description,
-                        'priority': priority
-                   }
-
-                   list_card.on_click = self.edit_list_with_data
-
-                   # Добавляем кнопки действий
-                   actions_row = Row([
-                        IconButton(
-                             icon=icons.EDIT,
-                             icon_color=colors.GREY_600,
-                             on_click=self.edit_list_with_data,
-                             data={'list_id': list_id}
-                        ),
-                        IconButton(
-                             icon=icons.DELETE,
-                             icon_color=colors.GREY_600,
-                             on_click=self.delete_list_with_data,
-                             data={'list_id': list_id}
-                        )
-                   ])
-
-                   list_card.content.controls.append(actions_row)
-
-                   self.list_items_container.controls.append(list_card)
+              with self.cards.lock:
+                   # Очистка текущего контейнера и карточки для каждого списка
+                   self.cards.reset('all')
+                   for row in lists:
+                        self.cards.add(row[0], row, self.build_list_card(row, list_items.get(row[0], [])),
+                                       list_sort_key(row))
 
-              conn.close()
               self.page.update()
 
          except sqlite3.Error as e:
               print(f"Ошибка при загрузке списков: {e}")
               self.show_notification(f"Ошибка загрузки: {e}")
 
+    def fetch_list_items(self, cursor, list_ids):
+         """
+         Элементы списков одним запросом на порцию id: {id списка: [(текст, выполнен)]}
+         """
+         items = {}
+         for start in range(0, len(list_ids), 500):
+              chunk = list_ids[start:start + 500]
+              cursor.execute(f'''
+                 SELECT list_id, text, is_completed
+                 FROM list_items
+                 WHERE list_id IN ({', '.join('?' * len(chunk))})
+                 ORDER BY id
+             ''', chunk)
+              for list_id, text, is_completed in cursor.fetchall():
+                   items.setdefault(list_id, []).append((text, is_completed))
+         return items
+
+    def build_list_card(self, row, list_items=None):
+         """
+         Карточка списка; без list_items - краткая карточка результата поиска
+         """
+         list_id, title, description, color, priority, created = row[:6]
+         details = [
+              Text(title, size=18, weight=FontWeight.BOLD, color=colors.WHITE),
+              Text(description or "", size=12, color=colors.GREY_600),
+              Row([
+                   Text(f"Приоритет: {priority_label(priority)}",
+                        color=self.priority_levels.get(priority, colors.GREY_600)),
+                   Text(f"Создан: {format_timestamp(created)}", color=colors.GREY_600)
+              ], alignment='spaceBetween')
+         ]
+         list_card = Container(
+              width=600,
+              padding=10,
+              border_radius=10,
+              gradient=LinearGradient(
+                   begin=alignment.center_left,
+                   end=alignment.center_right,
+                   colors=[colors.GREY_900, colors.GREY_800]
+              ),
+              content=Column(details)
+         )
+         if list_items is None:
+              return list_card
+
+         # Создаем контейнер для элементов списка с чекбоксами
+         items_column = Column()
+         for item_text, is_completed in list_items:
+              item_checkbox = Checkbox(
+                   label=item_text,
+                   value=bool(is_completed),
+                   on_change=lambda e, lid=list_id, text=item_text: self.toggle_list_item(e, lid, text),
+                   label_style=TextThemeStyle.BODY_SMALL if is_completed else TextThemeStyle.BODY_MEDIUM,
+                   active_color=colors.GREY_700 if is_completed else colors.GREY_600
+              )
+              items_column.controls.append(item_checkbox)
+         list_card.content.controls.append(items_column)
+
+         # Добавляем действия для редактирования и удаления
+         list_card.data = {
+              'list_id': list_id,
+              'title': title,
+              'description': description,
+              'priority': priority
+         }
+
+         list_card.on_click = self.edit_list_with_data
+
+         # Добавляем кнопки действий
+         actions_row = Row([
+              IconButton(
+                   icon=icons.EDIT,
+                   icon_color=colors.GREY_600,
+                   on_click=self.edit_list_with_data,
+                   data={'list_id': list_id}
+              ),
+              IconButton(
+                   icon=icons.DELETE,
+                   icon_color=colors.GREY_600,
+                   on_click=self.delete_list_with_data,
+                   data={'list_id': list_id}
+              )
+         ])
+
+         list_card.content.controls.append(actions_row)
+         return list_card
+
+    def apply_change(self, change):
+         """
+         Точечное обновление карточек по событию шины изменений
+         Перечитываются только затронутые списки; вызывается и из других потоков
+         """
+         with self.cards.lock:
+              if self.cards.mode is None:
+                   # Вкладка еще не открывалась: списки загрузятся при открытии
+                   return
+              if change.action == changes.RELOAD:
+                   # Пропущена часть журнала изменений: показанное загружается заново
+                   if self.cards.mode == 'all':
+                        self.load_lists()
+                   else:
+                        self.perform_search()
+                   return
+              ids = list(change.ids)
+              rows = {}
+              list_items = {}
+              if change.action != changes.DELETED:
+                   try:
+                        conn = get_connection()
+                        try:
+                             rows = {
+                                  row[0]: row for row in search.fetch_rows(
+                                       conn, 'lists', 'id, title, description, color, priority, created, completed', ids
+                                  ) if not row[6]
+                             }
+                             if self.cards.mode == 'all':
+                                  list_items = self.fetch_list_items(conn.cursor(), list(rows))
+                        finally:
+                             conn.close()
+                   except sqlite3.Error as e:
+                        print(f"Ошибка при обновлении списков: {e}")
+                        return
+
+              for list_id in ids:
+                   row = rows.get(list_id)
+                   if row is None:
+                        self.cards.remove(list_id)
+                   elif self.cards.mode == 'all':
+                        self.cards.put(list_id, row, self.build_list_card(row, list_items.get(list_id, [])),
+                                       list_sort_key(row))
+                   else:
+                        self.cards.put(list_id, row, self.build_list_card(row))
+         self.page.update()
+
     def toggle_list_item(self, e, list_id, item_text):
          """
          Обновление статуса элемента списка
          """
          try:
-              conn = sqlite3.connect('tasks.db')
-              cursor = conn.cursor()
-
               # Обновляем статус элемента
-              cursor.execute('''
-                 UPDATE list_items 
-                 SET is_completed = ? 
+              run_write(lambda conn: conn.execute('''
+                 UPDATE list_items
+                 SET is_completed = ?
                  WHERE list_id = ? AND text = ?
-             ''', (e.control.value, list_id, item_text))
-
-              conn.commit()
-              conn.close()
+             ''', (e.control.value, list_id, item_text)))
 
               # Обновляем визуальное представление
               e.control.label_style = (
@@ -432,6 +959,7 @@ class ListManager:
                    else colors.GREY_600
               )
               self.page.update()
+              changes.publish(changes.LIST, changes.UPDATED, [list_id])
 
          except sqlite3.Error as e:
               print(f"Ошибка при обновлении элемента списка: {e}")
@@ -456,7 +984,7 @@ class ListManager:
          Редактирование существующего списка
          """
          try:
-              conn = sqlite3.connect('tasks.db')
+              conn = get_connection()
               cursor = conn.cursor()
 
               # Получаем данные списка
@@ -470,7 +998,7 @@ class ListManager:
               # Заполняем поля формы
               self.list_title_input.value = list_data[0]
               self.list_description_input.value = list_data[1] or ""
-              self.list_priority_dropdown.value = list_data[2]
+              self.list_priority_dropdown.value = str(list_data[2])
 
               # Очищаем текущие элементы
               self.list_items.clear()
@@ -512,20 +1040,17 @@ class ListManager:
          Удаление списка с анимацией
          """
          try:
-              conn = sqlite3.connect('tasks.db')
-              cursor = conn.cursor()
-
-              # Удаляем элементы списка
-              cursor.execute('DELETE FROM list_items WHERE list_id = ?', (list_id,))
+              def delete(conn):
+                   # Удаляем элементы списка
+                   conn.execute('DELETE FROM list_items WHERE list_id = ?', (list_id,))
 
-              # Удаляем сам список
-              cursor.execute('DELETE FROM lists WHERE id = ?', (list_id,))
+                   # Удаляем сам список
+                   conn.execute('DELETE FROM lists WHERE id = ?', (list_id,))
 
-              conn.commit()
-              conn.close()
+              run_write(delete)
 
-              # Обновляем визуальный список
-              self.load_lists()
+              # Карточка убирается из всех показанных списков
+              changes.publish(changes.LIST, changes.DELETED, [list_id])
 
               # Показываем уведомление
               self.show_notification("Список успешно удален")
@@ -650,6 +1175,7 @@ class ListManager:
                 break
         self.page.update()
 
+    @timed('lists.save_list')
     def save_list(self, e=None):
         """
         Сохранение списка в базу данных с расширенной обработкой ошибок
@@ -665,58 +1191,61 @@ class ListManager:
             return
 
         try:
-            conn = sqlite3.connect('tasks.db')
-            cursor = conn.cursor()
-
-            # Проверяем, создаем новый список или обновляем существующий
-            if self.current_list_id is None:
-                # Создание нового списка
-                cursor.execute('''
-                    INSERT INTO lists 
-                    (title, description, color, priority, created, completed) 
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    self.list_title_input.value,
-                    self.list_description_input.value or "",
-                    "Темный",  # Фиксированный серый цвет
-                    self.list_priority_dropdown.value or "Низкий",
-                    datetime.now(),
-                    0
-                ))
-                list_id = cursor.lastrowid
-            else:
-                # Обновление существующего списка
-                cursor.execute('''
-                    UPDATE lists 
-                    SET title=?, description=?, color=?, priority=? 
-                    WHERE id=?
-                ''', (
-                    self.list_title_input.value,
-                    self.list_description_input.value or "",
-                    "Темный",  # Фиксированный серый цвет
-                    self.list_priority_dropdown.value or "Низкий",
-                    self.current_list_id
-                ))
-                list_id = self.current_list_id
-
-            # Сохранение элементов списка
-            # Сначала удаляем существующие элементы
-            cursor.execute('DELETE FROM list_items WHERE list_id = ?', (list_id,))
-
-            # Добавляем новые элементы
-            for item in self.list_items:
-                cursor.execute('''
-                    INSERT INTO list_items 
-                    (list_id, text, is_completed) 
-                    VALUES (?, ?, ?)
-                ''', (
-                    list_id,
-                    item['text'],
-                    item['is_completed']
-                ))
-
-            # Явное подтверждение транзакции
-            conn.commit()
+            def save(conn):
+                cursor = conn.cursor()
+
+                # Проверяем, создаем новый список или обновляем существующий
+                if self.current_list_id is None:
+                    # Создание нового списка
+                    cursor.execute('''
+                        INSERT INTO lists 
+                        (title, description, color, priority, created, completed) 
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (
+                        self.list_title_input.value,
+                        self.list_description_input.value or "",
+                        "Темный",  # Фиксированный серый цвет
+                        parse_priority(self.list_priority_dropdown.value, DEFAULT_PRIORITY),
+                        int(time.time()),
+                        0
+                    ))
+                    list_id = cursor.lastrowid
+                else:
+                    # Обновление существующего списка
+                    cursor.execute('''
+                        UPDATE lists 
+                        SET title=?, description=?, color=?, priority=? 
+                        WHERE id=?
+                    ''', (
+                        self.list_title_input.value,
+                        self.list_description_input.value or "",
+                        "Темный",  # Фиксированный серый цвет
+                        parse_priority(self.list_priority_dropdown.value, DEFAULT_PRIORITY),
+                        self.current_list_id
+                    ))
+                    list_id = self.current_list_id
+
+                # Сохранение элементов списка
+                # Сначала удаляем существующие элементы
+                cursor.execute('DELETE FROM list_items WHERE list_id = ?', (list_id,))
+
+                # Добавляем новые элементы
+                for item in self.list_items:
+                    cursor.execute('''
+                        INSERT INTO list_items 
+                        (list_id, text, is_completed) 
+                        VALUES (?, ?, ?)
+                    ''', (
+                        list_id,
+                        item['text'],
+                        item['is_completed']
+                    ))
+                return list_id
+
+            # Список и его элементы сохраняются одной короткой транзакцией
+            action = changes.CREATED if self.current_list_id is None else changes.UPDATED
+            list_id = run_write(save)
+            changes.publish(changes.LIST, action, [list_id])
 
             # Показываем успешное уведомление
             self.show_notification("Список успешно сохранен")
@@ -745,7 +1274,7 @@ class ListManager:
         self.list_description_input.value = ""
 
         # Сброс выпадающего списка приоритетов
-        self.list_priority_dropdown.value = "Низкий"
+        self.list_priority_dropdown.value = str(DEFAULT_PRIORITY)
 
         # Очистка списка элементов
         self.list_items.clear()
@@ -770,73 +1299,32 @@ class ListManager:
         except Exception as e:
             print(f"Ошибка при показе уведомления: {e}")
 
+    @operation('view.lists.perform_search', controls=lambda self: self.list_items_container)
     def perform_search(self, e=None):
         """
         Выполнение поиска и фильтрации списков
         """
-        search_query = self.search_input.value.lower().strip()
+        search_query = (self.search_input.value or "").lower().strip()
         sort_option = self.sort_dropdown.value
-        priority_filter = self.priority_filter.value
+        priority_filter = parse_priority(self.priority_filter.value)
 
         try:
-            conn = sqlite3.connect('tasks.db')
-            cursor = conn.cursor()
-
-            # Базовый SQL-запрос с возможностью фильтрации
-            query = '''
-                SELECT id, title, description, color, priority, created 
-                FROM lists 
-                WHERE completed = 0 
-            '''
-            params = []
-
-            # Добавление поиска по названию или описанию
-            if search_query:
-                query += ' AND (LOWER(title) LIKE ? OR LOWER(description) LIKE ?)'
-                params.extend([f'%{search_query}%', f'%{search_query}%'])
-
-            # Фильтрация по приоритету
-            if priority_filter and priority_filter != "Все":
-                query += ' AND priority = ?'
-                params.append(priority_filter)
-
-            # Сортировка
-            if sort_option == "По дате создания":
-                query += ' ORDER BY created DESC'
-            elif sort_option == "По названию":
-                query += ' ORDER BY title ASC'
-            elif sort_option == "По приоритету":
-                query += ' ORDER BY CASE priority WHEN "Высокий" THEN 1 WHEN "Средний" THEN 2 ELSE 3 END'
-
-            cursor.execute(query, params)
-            lists = cursor.fetchall()
-
-            # Очистка текущего контейнера
-            self.list_items_container.controls.clear()
-
-            # Создание визуальных элементов для каждого списка
-            for list_id, title, description, color, priority, created in lists:
-                list_card = Container(
-                    width=600,
-                    padding=10,
-                    border_radius=10,
-                    gradient=LinearGradient(
-                        begin=alignment.center_left,
-                        end=alignment.center_right,
-                        colors=[colors.GREY_900, colors.GREY_800]
-                    ),
-                    content=Column([
-                        Text(title, size=18, weight=FontWeight.BOLD, color=colors.WHITE),
-                        Text(description or "", size=12, color=colors.GREY_600),
-                        Row([
-                            Text(f"Приоритет: {priority}", color=self.priority_levels.get(priority, colors.GREY_600)),
-                            Text(f"Создан: {created}", color=colors.GREY_600)
-                        ], alignment='spaceBetween')
-                    ])
-                )
-                self.list_items_container.controls.append(list_card)
+            conn = get_connection()
+
+            # Id подходящих списков (повторный поиск берется из кэша), затем их строки
+            list_ids = search.search_lists(conn, search_query, priority_filter, sort_option)
+            lists = search.fetch_rows(
+                conn, 'lists', 'id, title, description, color, priority, created', list_ids
+            )
 
             conn.close()
+
+            # Очистка текущего контейнера и карточки найденных списков
+            with self.cards.lock:
+                self.cards.reset('search')
+                for row in lists:
+                    self.cards.add(row[0], row, self.build_list_card(row))
+
             self.page.update()
 
         except sqlite3.Error as e:
@@ -928,8 +1416,13 @@ class Notes:
                'Белый': colors.WHITE
           }
 
-          # Список заметок
+          # Список заметок и корзина; карточки обновляются по событиям шины изменений
           self.notes_list = ListView(expand=True, spacing=10, padding=20)
+          self.trash_list = ListView(expand=True, spacing=10, padding=20)
+          self.notes_cards = CardIndex(self.notes_list)
+          self.trash_cards = CardIndex(self.trash_list)
+          # Сортировка, в которой показаны все заметки (для места новых карточек)
+          self.notes_sort = 'created'
 
           # Добавление выбора даты напоминания
           self.reminder_datetime = DatePicker(
@@ -943,6 +1436,21 @@ class Notes:
                on_change=self.on_time_change
           )
 
+          # Повторение напоминания и свой интервал в минутах
+          self.repeat_dropdown = Dropdown(
+               label="Повтор",
+               options=[dropdown.Option(key=kind, text=label) for kind, label in REPEAT_LABELS.items()],
+               value='none',
+               width=300,
+               on_change=self.on_repeat_change
+          )
+          self.repeat_interval_input = TextField(
+               label="Интервал, минут",
+               width=200,
+               visible=False,
+               keyboard_type=KeyboardType.NUMBER
+          )
+
           # Поле поиска
           self.search_input = TextField(
                label="Поиск заметок",
@@ -953,12 +1461,7 @@ class Notes:
           # Фильтр приоритета
           self.priority_filter = Dropdown(
                label="Приоритет",
-               options=[
-                    dropdown.Option("Все"),
-                    dropdown.Option("Низкий"),
-                    dropdown.Option("Средний"),
-                    dropdown.Option("Высокий")
-               ],
+               options=[dropdown.Option("Все")] + priority_options(),
                width=300,
                on_change=self.perform_search
           )
@@ -972,14 +1475,55 @@ class Notes:
                on_change=self.perform_search
           )
 
+          # Порядок заметок: для каждого варианта в базе есть свой индекс
+          self.sort_dropdown = Dropdown(
+               label="Сортировка",
+               options=[
+                    dropdown.Option(key='created', text="По дате создания"),
+                    dropdown.Option(key='title', text="По названию"),
+                    dropdown.Option(key='priority', text="По приоритету"),
+                    dropdown.Option(key='reminder', text="По напоминанию")
+               ],
+               value='created',
+               width=300,
+               on_change=self.perform_search
+          )
+
+          # Фильтр по датам: поле, начало и конец периода (дни включительно)
+          self.date_field = Dropdown(
+               label="Период по дате",
+               options=[
+                    dropdown.Option(key='created', text="Создания"),
+                    dropdown.Option(key='reminder', text="Напоминания")
+               ],
+               value='created',
+               width=200,
+               on_change=self.perform_search
+          )
+          self.date_from_picker = DatePicker(
+               first_date=datetime(2000, 1, 1),
+               last_date=datetime.now() + timedelta(days=3650),
+               on_change=self.on_date_range_change
+          )
+          self.date_to_picker = DatePicker(
+               first_date=datetime(2000, 1, 1),
+               last_date=datetime.now() + timedelta(days=3650),
+               on_change=self.on_date_range_change
+          )
+          self.date_from_button = TextButton("С: любой даты", on_click=lambda _: self.page.open(self.date_from_picker))
+          self.date_to_button = TextButton("По: любую дату", on_click=lambda _: self.page.open(self.date_to_picker))
+
+          # Нечеткий поиск: слова запроса могут содержать опечатки
+          self.fuzzy_switch = Switch(
+               label="Нечеткий поиск",
+               value=False,
+               on_change=self.toggle_fuzzy
+          )
+
           # Выпадающий список приоритетов для создания заметки
           self.priority_dropdown = Dropdown(
                label="Степень важности",
-               options=[
-                    dropdown.Option("Низкий"),
-                    dropdown.Option("Средний"),
-                    dropdown.Option("Высокий")
-               ],
+               options=priority_options(),
                width=300
           )
 
@@ -1011,12 +1555,13 @@ class Notes:
           # Для сохранения текущей редактируемой заметки
           self.current_note_id = None
 
+          # Первый экран заметок для снимка и признак того, что снимок уже показан
+          self.snapshot_rows = None
+          self.snapshot_painted = False
+
           # Создаем экземпляр ListManager для обычных списков
           self.list_manager = ListManager(page)
 
-          # Создаем экземпляр ListsManager для списков задач
-          self.lists_manager = ListManager(page)
-
           # Модальное окно для напоминания
           self.reminder_modal = BottomSheet(
                Container(
@@ -1026,6 +1571,7 @@ class Notes:
                          Text("Настройка напоминания", size=20, weight=FontWeight.BOLD),
                          self.reminder_datetime,
                          self.reminder_time,
+                         Row([self.repeat_dropdown, self.repeat_interval_input], alignment='center'),
                          ElevatedButton(
                               "Сохранить напоминание",
                               on_click=self.save_reminder,
@@ -1102,12 +1648,13 @@ class Notes:
           print(f"Выбранная дата: {e.control.value}")
           self.page.update()
 
+     @operation('view.notes.load_lists', controls=lambda self: self.notes_list)
      def load_lists(self):
           """Загрузка списков из базы данных"""
           self.notes_list.controls.clear()
 
           try:
-               conn = sqlite3.connect('tasks.db')
+               conn = get_connection()
                cursor = conn.cursor()
                cursor.execute('SELECT * FROM lists WHERE completed = 0 ORDER BY created DESC')
                lists = cursor.fetchall()
@@ -1121,7 +1668,7 @@ class Notes:
           for list_item in lists:
                # Загрузка элементов списка
                try:
-                    conn = sqlite3.connect('tasks.db')
+                    conn = get_connection()
                     cursor = conn.cursor()
                     cursor.execute('SELECT text, is_completed FROM list_items WHERE list_id = ?', (list_item[0],))
                     list_contents = cursor.fetchall()
@@ -1183,11 +1730,7 @@ class Notes:
                          ),
                          Dropdown(
                               label="Приоритет",
-                              options=[
-                                   dropdown.Option("Низкий"),
-                                   dropdown.Option("Средний"),
-                                   dropdown.Option("Высокий")
-                              ],
+                              options=priority_options(),
                               value=list_data[3],
                               width=300
                          ),
@@ -1208,18 +1751,14 @@ class Notes:
      def delete_list(self, list_id):
           """Удаление списка"""
           try:
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-               cursor.execute('UPDATE lists SET completed = 1, deleted_at = ? WHERE id = ?',
-                              (datetime.now().isoformat(), list_id))
-               conn.commit()
+               run_write(lambda conn: conn.execute('UPDATE lists SET completed = 1, deleted_at = ? WHERE id = ?',
+                                                   (int(time.time()), list_id)))
           except sqlite3.Error as e:
                self.page.snack_bar = SnackBar(content=Text(f"Ошибка при удалении: {e}"))
                self.page.snack_bar.open = True
-          finally:
-               conn.close()
+          else:
+               changes.publish(changes.LIST, changes.TRASHED, [list_id])
 
-          self.load_lists()
           self.page.update()
 
      def on_time_change(self, e):
@@ -1236,50 +1775,84 @@ class Notes:
           return Container(
                content=Column([
                     Row([
-                         self.search_input
+                         self.search_input,
+                         self.fuzzy_switch
                     ], alignment='center'),
                     Row([
                          self.priority_filter,
-                         self.color_filter
+                         self.color_filter,
+                         self.sort_dropdown
+                    ], alignment='center'),
+                    Row([
+                         self.date_field,
+                         self.date_from_button,
+                         self.date_to_button,
+                         IconButton(icon=icons.CLEAR, tooltip="Сбросить период", on_click=self.reset_date_range)
                     ], alignment='center')
                ]),
                padding=20
           )
 
+     def on_date_range_change(self, e=None):
+          """
+        Выбор границы периода: подписи кнопок и повторный поиск
+        """
+          start = self.date_from_picker.value
+          end = self.date_to_picker.value
+          self.date_from_button.text = f"С: {start.strftime('%d.%m.%Y')}" if start else "С: любой даты"
+          self.date_to_button.text = f"По: {end.strftime('%d.%m.%Y')}" if end else "По: любую дату"
+          self.perform_search()
+
+     def reset_date_range(self, e=None):
+          self.date_from_picker.value = None
+          self.date_to_picker.value = None
+          self.on_date_range_change()
+
+     def date_range(self):
+          """
+        Фильтр по датам для поиска: (поле, начало, конец) во времени Unix или None
+        Конечный день входит в период
+        """
+          start = self.date_from_picker.value
+          end = self.date_to_picker.value
+          if start is None and end is None:
+               return None
+          start_time = int(datetime.combine(start, datetime.min.time()).timestamp()) if start else None
+          end_time = int(datetime.combine(end + timedelta(days=1), datetime.min.time()).timestamp()) if end else None
+          return self.date_field.value or 'created', start_time, end_time
+
+     def toggle_fuzzy(self, e=None):
+          """
+        Переключение нечеткого поиска; словарь терминов загружается в фоне
+        """
+          if self.fuzzy_switch.value:
+               fuzzy.note_terms.preload()
+          self.perform_search()
+
+     @operation('view.notes.perform_search', controls=lambda self: self.notes_list)
      def perform_search(self, e=None):
           """
         Выполнение поиска заметок с фильтрацией
         """
           search_text = self.search_input.value.lower() if self.search_input.value else ""
-          priority_filter = self.priority_filter.value if self.priority_filter.value != "Все" else None
+          priority_filter = parse_priority(self.priority_filter.value)
           color_filter = self.color_filter.value if self.color_filter.value != "Все" else None
+          sort_option = self.sort_dropdown.value or 'created'
+          date_range = self.date_range()
 
           try:
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-
-               query = '''
-                SELECT * FROM notes 
-                WHERE completed = 0 
-                AND (
-                    lower(title) LIKE ? OR 
-                    lower(content) LIKE ?
-                )
-            '''
-               params = [f'%{search_text}%', f'%{search_text}%']
+               conn = get_connection()
 
-               if priority_filter:
-                    query += ' AND priority = ?'
-                    params.append(priority_filter)
-
-               if color_filter:
-                    query += ' AND color = ?'
-                    params.append(color_filter)
-
-               query += ' ORDER BY created DESC'
-
-               cursor.execute(query, params)
-               notes = cursor.fetchall()
+               # Id подходящих заметок (повторный поиск берется из кэша), затем карточки
+               if self.fuzzy_switch.value and search_text.strip():
+                    note_ids = search.search_notes_fuzzy(conn, search_text, priority_filter, color_filter, date_range)
+               else:
+                    note_ids = search.search_notes(
+                         conn, search_text, priority_filter, color_filter, sort_option, date_range
+                    )
+               notes = search.fetch_rows(conn, 'notes', NOTE_CARD_COLUMNS, note_ids)
+               # Фрагменты с найденными местами для первых результатов
+               snippets = search.note_snippets(conn, search_text, note_ids, self.fuzzy_switch.value)
           except sqlite3.Error as e:
                self.page.snack_bar = SnackBar(
                     content=Text(f"Ошибка при поиске: {e}"),
@@ -1290,63 +1863,28 @@ class Notes:
           finally:
                conn.close()
 
-          self.notes_list.controls.clear()
-
-          if not notes:
-               no_results = Container(
-                    content=Text(
-                         "Заметки не найдены",
-                         size=18,
-                         color=colors.GREY
-                    ),
-                    alignment=alignment.center,
-                    padding=20
-               )
-               self.notes_list.controls.append(no_results)
-          else:
-               for note in notes:
-                    if note[7]:  # Если время напоминания существует
-                         try:
-                              reminder_datetime = datetime.fromisoformat(str(note[7]))
-                              reminder_text = f"Напоминание: {reminder_datetime.strftime('%d.%m.%Y %H:%M')}"
-                         except (ValueError, TypeError):
-                              reminder_text = "Некорректное время напоминания"
-                    else:
-                         reminder_text = "Добавить напоминание"
-
-                    note_container = Container(
-                         width=850,
-                         padding=10,
-                         bgcolor=self.color_palette.get(note[4], colors.WHITE70),
-                         border_radius=10,
-                         content=Column([
-                              Text(f"Приоритет: {note[3]}", weight=FontWeight.BOLD),
-                              Text(note[1], size=18, weight=FontWeight.W_600),
-                              Text(note[2], size=14),
-                              Row([
-                                   Text(f"Создано: {note[5]}", size=10, color=colors.BLACK54),
-                                   Text(reminder_text, size=10, color=colors.BLACK54),
-                                   Row([
-                                        IconButton(
-                                             icon=icons.EDIT,
-                                             icon_color=colors.BLUE,
-                                             on_click=lambda e, note_data=note: self.edit_note(note_data)
-                                        ),
-                                        IconButton(
-                                             icon=icons.DELETE,
-                                             icon_color=colors.RED,
-                                             on_click=lambda e, note_id=note[0]: self.delete_note(note_id)
-                                        ),
-                                        IconButton(
-                                             icon=icons.ALARM_ADD,
-                                             icon_color=colors.GREEN,
-                                             on_click=lambda e, note_id=note[0]: self.open_reminder_modal(note_id)
-                                        )
-                                   ])
-                              ])
-                         ])
-                    )
-                    self.notes_list.controls.append(note_container)
+          # Без запроса и фильтров показываются все заметки: новые карточки встают по сортировке
+          plain = not search_text.strip() and priority_filter is None and color_filter is None and date_range is None
+          with self.notes_cards.lock:
+               self.notes_cards.reset('all' if plain else 'search')
+               self.notes_sort = sort_option
+               sort_key = NOTE_SORT_KEYS.get(sort_option) if plain else None
+
+               if not notes:
+                    no_results = Container(
+                         content=Text(
+                              "Заметки не найдены",
+                              size=18,
+                              color=colors.GREY
+                         ),
+                         alignment=alignment.center,
+                         padding=20
+                    )
+                    self.notes_list.controls.append(no_results)
+               else:
+                    for note in notes:
+                         self.notes_cards.add(note[0], note, self.build_note_card(note, snippets.get(note[0])),
+                                              sort_key(note) if sort_key else None)
 
           self.page.update()
 
@@ -1363,7 +1901,7 @@ class Notes:
                # Очищаем поля ввода
                self.title_input.value = ""
                self.content_input.value = ""
-               self.priority_dropdown.value = "Низкий"
+               self.priority_dropdown.value = str(DEFAULT_PRIORITY)
                self.color_dropdown.value = "Белый"
 
                # Открываем модальное окно
@@ -1405,28 +1943,28 @@ class Notes:
                self.reminder_time.value
           )
 
+          rule = self.repeat_rule(reminder_time)
+          if rule is False:
+               return
+
           # Сохраняем последний выбранный note_id
           if hasattr(self, 'current_note_id'):
                try:
-                    conn = sqlite3.connect('tasks.db')
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                    UPDATE notes 
-                    SET reminder_time = ?
+                    run_write(lambda conn: conn.execute('''
+                    UPDATE notes
+                    SET reminder_time = ?, reminder_rule = ?,
+                        reminder_fired_at = NULL, reminder_snoozed_until = NULL
                     WHERE id = ?
-                ''', (reminder_time.isoformat(), self.current_note_id))
-                    conn.commit()
+                ''', (int(reminder_time.timestamp()), rule, self.current_note_id)))
+                    self.reminder_manager.schedule(reminder_time.timestamp())
+                    # Обновляется только карточка этой заметки
+                    changes.publish(changes.NOTE, changes.REMINDER, [self.current_note_id])
                except sqlite3.Error as ex:
                     self.page.snack_bar = SnackBar(
                          content=Text(f"Ошибка при сохранении напоминания: {ex}"),
                          bgcolor=colors.RED
                     )
                     self.page.snack_bar.open = True
-               finally:
-                    conn.close()
-
-               # Перезагрузка заметок
-               self.load_notes()
 
                # Закрываем модальное окно
                self.reminder_modal.open = False
@@ -1475,50 +2013,33 @@ class Notes:
                     self.show_notification("Заголовок заметки не может быть пустым")
                     return
 
-               # Подключение к базе данных
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-
-               # Текущее время создания
-               current_time = datetime.now()
+               # Текущее время создания в секундах эпохи
+               current_time = int(time.time())
+               title = self.title_input.value
+               content = self.content_input.value
+               priority = parse_priority(self.priority_dropdown.value, DEFAULT_PRIORITY)
 
                # Если заметка новая
                if self.current_note_id is None:
-                    cursor.execute('''
-                      INSERT INTO notes 
-                      (title, content, priority, color, created, completed) 
+                    note_id = run_write(lambda conn: conn.execute('''
+                      INSERT INTO notes
+                      (title, content, priority, color, created, completed)
                       VALUES (?, ?, ?, ?, ?, ?)
-                  ''', (
-                         self.title_input.value,
-                         self.content_input.value,
-                         self.priority_dropdown.value or "Низкий",
-                         self.color_dropdown.value or "Белый",
-                         current_time,
-                         0
-                    ))
+                  ''', (title, content, priority, self.color_dropdown.value or "Белый", current_time, 0)).lastrowid)
+                    changes.publish(changes.NOTE, changes.CREATED, [note_id])
                     self.show_notification("Заметка успешно создана")
                else:
                     # Обновление существующей заметки
-                    cursor.execute('''
-                      UPDATE notes 
-                      SET title=?, content=?, priority=?, color=? 
+                    run_write(lambda conn: conn.execute('''
+                      UPDATE notes
+                      SET title=?, content=?, priority=?, color=?
                       WHERE id=?
-                  ''', (
-                         self.title_input.value,
-                         self.content_input.value,
-                         self.priority_dropdown.value,
-                         self.color_dropdown.value,
-                         self.current_note_id
-                    ))
+                  ''', (title, content, priority, self.color_dropdown.value, self.current_note_id)))
+                    changes.publish(changes.NOTE, changes.UPDATED, [self.current_note_id])
                     self.show_notification("Заметка обновлена")
 
-               # Сохранение изменений
-               conn.commit()
-               conn.close()
-
-               # Закрытие модального окна и обновление списка заметок
+               # Закрытие модального окна; карточка уже добавлена или обновлена
                self.note_modal.open = False
-               self.load_notes()
                self.page.update()
 
           except Exception as ex:
@@ -1564,31 +2085,52 @@ class Notes:
                     self.show_notification("Время напоминания должно быть в будущем")
                     return
 
-               # Подключение к базе данных
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
+               rule = self.repeat_rule(reminder_time)
+               if rule is False:
+                    return
 
-               # Обновление заметки с временем напоминания
-               cursor.execute('''
-                  UPDATE notes 
-                  SET reminder_time = ? 
+               # Обновление заметки с временем напоминания и правилом повторения
+               run_write(lambda conn: conn.execute('''
+                  UPDATE notes
+                  SET reminder_time = ?, reminder_rule = ?,
+                      reminder_fired_at = NULL, reminder_snoozed_until = NULL
                   WHERE id = ?
-              ''', (reminder_time, self.current_note_id))
-
-               conn.commit()
-               conn.close()
+              ''', (int(reminder_time.timestamp()), rule, self.current_note_id)))
+               self.reminder_manager.schedule(reminder_time.timestamp())
+               changes.publish(changes.NOTE, changes.REMINDER, [self.current_note_id])
 
                # Закрытие модальных окон
                self.reminder_modal.open = False
                self.note_modal.open = False
 
-               self.show_notification(f"Напоминание установлено на {reminder_time}")
-               self.load_notes()
+               self.show_notification(f"Напоминание установлено на {reminder_time.strftime('%d.%m.%Y %H:%M')}")
                self.page.update()
 
           except Exception as ex:
                self.show_notification(f"Ошибка при сохранении напоминания: {ex}")
 
+     def on_repeat_change(self, e=None):
+          """
+        Поле интервала показывается только для своего интервала повтора
+        """
+          self.repeat_interval_input.visible = self.repeat_dropdown.value == 'every'
+          self.page.update()
+
+     def repeat_rule(self, reminder_time):
+          """
+        Правило повторения из окна напоминания: None - без повтора,
+        False - интервал введен неверно (пользователь уже уведомлен)
+        """
+          kind = self.repeat_dropdown.value or 'none'
+          if kind == 'none':
+               return None
+          try:
+               interval = int(self.repeat_interval_input.value) if kind == 'every' else None
+               return reminders.make_rule(kind, int(reminder_time.timestamp()), interval)
+          except (TypeError, ValueError):
+               self.show_notification("Интервал повтора должен быть целым числом минут, не меньше одной")
+               return False
+
      def show_notification(self, message):
           """
           Показ уведомления с использованием современного API
@@ -1602,73 +2144,308 @@ class Notes:
           snack_bar.open = True
           self.page.update()
 
+     @operation('view.notes.load_notes', controls=lambda self: self.notes_list)
      def load_notes(self):
           """
         Загрузка активных заметок из базы данных
         """
-          self.notes_list.controls.clear()
+          with self.notes_cards.lock:
+               try:
+                    conn = get_connection()
+                    cursor = conn.cursor()
+                    # Порядок выбранной сортировки; строки читаются из ее индекса
+                    sort_option = self.sort_dropdown.value or 'created'
+                    order = search.NOTE_SORTS[sort_option]
+                    cursor.execute(f'SELECT {NOTE_CARD_COLUMNS} FROM notes WHERE completed = 0 ORDER BY {order}')
+                    notes = cursor.fetchall()
+               except sqlite3.Error as e:
+                    self.page.snack_bar = SnackBar(content=Text(f"Ошибка при загрузке заметок: {e}"))
+                    self.page.snack_bar.open = True
+                    return
+               finally:
+                    conn.close()
+
+               self.notes_cards.reset('all')
+               self.notes_sort = sort_option
+               sort_key = NOTE_SORT_KEYS[sort_option]
+               for note in notes:
+                    self.notes_cards.add(note[0], note, self.build_note_card(note), sort_key(note))
+
+               # Запоминаем первый экран для снимка при завершении работы
+               self.update_snapshot_rows()
+
+     def update_snapshot_rows(self):
+          """
+        Первый экран заметок для снимка при завершении работы
+        """
+          self.snapshot_rows = [
+               {
+                    'id': note[0],
+                    'title': note[1],
+                    'preview': (note[2] or '')[:SNAPSHOT_PREVIEW_CHARS],
+                    'color': note[4]
+               }
+               for note in self.notes_cards.ordered_rows(SNAPSHOT_SIZE)
+          ]
+
+     @operation('view.notes.apply_change', controls=lambda self: self.notes_list)
+     def apply_change(self, change):
+          """
+        Точечное обновление заметок и корзины по событию шины изменений
+        Перечитываются только затронутые заметки: активные попадают в заметки,
+        удаленные в корзину, отсутствующие убираются отовсюду. Вызывается и из
+        потока проверки напоминаний
+        """
+          with self.notes_cards.lock, self.trash_cards.lock:
+               if self.notes_cards.mode is None and self.trash_cards.mode is None:
+                    # Ни заметки, ни корзина еще не открывались
+                    return
+               if change.action == changes.RELOAD:
+                    # Пропущена часть журнала изменений: показанное загружается заново
+                    if self.trash_cards.mode is not None:
+                         self.load_trash_notes()
+                    if self.notes_cards.mode == 'all':
+                         self.load_notes()
+                    elif self.notes_cards.mode == 'search':
+                         self.perform_search()
+                    self.page.update()
+                    return
+               ids = list(change.ids)
+               rows = {}
+               if change.action != changes.DELETED:
+                    try:
+                         conn = get_connection()
+                         try:
+                              rows = {
+                                   row[0]: row
+                                   for row in search.fetch_rows(conn, 'notes', f'{NOTE_CARD_COLUMNS}, completed', ids)
+                              }
+                         finally:
+                              conn.close()
+                    except sqlite3.Error as e:
+                         print(f"Ошибка при обновлении заметок: {e}")
+                         return
+
+               notes_mode = self.notes_cards.mode
+               sort_key = NOTE_SORT_KEYS.get(self.notes_sort) if notes_mode == 'all' else None
+               for note_id in ids:
+                    note = rows.get(note_id)
+                    active = note is not None and not note[9]
+                    trashed = note is not None and bool(note[9])
+
+                    if notes_mode is not None:
+                         if active:
+                              self.notes_cards.put(note_id, note, self.build_note_card(note),
+                                                   sort_key(note) if sort_key else None)
+                         else:
+                              self.notes_cards.remove(note_id)
+                    if self.trash_cards.mode is not None:
+                         if trashed:
+                              self.trash_cards.put(note_id, note, self.build_trash_card(note), trash_sort_key(note))
+                         else:
+                              self.trash_cards.remove(note_id)
+
+               if notes_mode == 'all':
+                    self.update_snapshot_rows()
+          self.page.update()
+
+     def build_note_card(self, note, snippet=None):
+          """
+        Карточка активной заметки
+        Показывает превью текста (или фрагмент с найденными местами из snippet);
+        полный текст загружается кнопкой
+        """
+          # Форматирование времени напоминания
+          if note[7]:  # Если время напоминания существует
+               reminder_text = f"Напоминание: {format_timestamp(note[7])}"
+               if note[8]:
+                    reminder_text += f" ({repeat_label(note[8])})"
+          else:
+               reminder_text = "Добавить напоминание"
+
+          return Container(
+               width=850,
+               padding=10,
+               bgcolor=self.color_palette.get(note[4], colors.WHITE70),
+               border_radius=10,
+               content=Column([
+                    Text(f"Приоритет: {priority_label(note[3])}", weight=FontWeight.BOLD),
+                    Text(
+                         note[1] if snippet is None else None,
+                         spans=highlight_spans(snippet[0] or "") if snippet is not None else None,
+                         size=18,
+                         weight=FontWeight.W_600
+                    ),
+                    *self.build_note_preview(note, snippet[1] if snippet is not None else None),
+                    Row([
+                         Text(f"Создано: {format_timestamp(note[5])}", size=10, color=colors.BLACK54),
+                         Text(reminder_text, size=10, color=colors.BLACK54),
+                         Row([
+                              IconButton(
+                                   icon=icons.EDIT,
+                                   icon_color=colors.BLUE,
+                                   on_click=lambda e, note_id=note[0]: self.edit_note(note_id)
+                              ),
+                              IconButton(
+                                   icon=icons.DELETE,
+                                   icon_color=colors.RED,
+                                   on_click=lambda e, note_id=note[0]: self.delete_note(note_id)
+                              ),
+                              IconButton(
+                                   icon=icons.ALARM_ADD,
+                                   icon_color=colors.GREEN,
+                                   on_click=lambda e, note_id=note[0]: self.open_reminder_modal(note_id)
+                              )
+                         ])
+                    ])
+               ])
+          )
+
+     def build_note_preview(self, note, snippet=None):
+          """
+        Превью текста заметки и, если текст обрезан, кнопка загрузки полного текста
+        Фрагмент поиска snippet заменяет превью; он показывается с кнопкой всегда
+        """
+          content = note[2] or ""
+          if snippet:
+               preview = highlight_spans(snippet)
+               content_text = Text(spans=preview, size=14)
+          elif len(content) <= NOTE_PREVIEW_CHARS:
+               return [Text(content, size=14)]
+          else:
+               preview = content[:NOTE_PREVIEW_CHARS].rstrip() + "…"
+               content_text = Text(preview, size=14)
+          expand_button = TextButton(
+               "Показать полностью",
+               data=False,
+               on_click=lambda e: self.toggle_note_content(e, note[0], content_text, preview)
+          )
+          return [content_text, expand_button]
+
+     def toggle_note_content(self, e, note_id, content_text, preview):
+          """
+        Разворачивание полного текста заметки и сворачивание обратно к превью
+        Превью - строка или выделенный фрагмент поиска (список TextSpan)
+        """
+          button = e.control
+          if button.data:
+               if isinstance(preview, list):
+                    content_text.value = None
+                    content_text.spans = preview
+               else:
+                    content_text.value = preview
+               button.text = "Показать полностью"
+               button.data = False
+          else:
+               full_content = self.fetch_note_content(note_id)
+               if full_content is None:
+                    return
+               content_text.value = full_content
+               content_text.spans = None
+               button.text = "Свернуть"
+               button.data = True
+          self.page.update()
 
+     def fetch_note_content(self, note_id):
+          """
+        Загрузка полного текста заметки по требованию
+        """
           try:
-               conn = sqlite3.connect('tasks.db')
+               conn = get_connection()
                cursor = conn.cursor()
-               cursor.execute('SELECT * FROM notes WHERE completed = 0 ORDER BY created DESC')
-               notes = cursor.fetchall()
+               cursor.execute('SELECT content FROM notes WHERE id = ?', (note_id,))
+               row = cursor.fetchone()
           except sqlite3.Error as e:
-               self.page.snack_bar = SnackBar(content=Text(f"Ошибка при загрузке заметок: {e}"))
-               self.page.snack_bar.open = True
-               return
+               self.show_notification(f"Ошибка при загрузке заметки: {e}")
+               return None
           finally:
                conn.close()
+          return (row[0] or "") if row else ""
 
-          for note in notes:
-               # Форматирование времени напоминания
-               if note[7]:  # Если время напоминания существует
-                    try:
-                         reminder_datetime = datetime.fromisoformat(str(note[7]))
-                         reminder_text = f"Напоминание: {reminder_datetime.strftime('%d.%m.%Y %H:%M')}"
-                    except (ValueError, TypeError):
-                         reminder_text = "Некорректное время напоминания"
-               else:
-                    reminder_text = "Добавить напоминание"
+     def close(self):
+          """
+        Остановка фоновой работы менеджера: потока проверки напоминаний
+        """
+          self.reminder_manager.stop_reminder_check()
+
+     def save_snapshot(self):
+          """
+        Сохранение снимка первого экрана заметок (вызывается при завершении работы)
+        """
+          if self.snapshot_rows is None:
+               return
+          try:
+               tmp_path = f"{SNAPSHOT_PATH}.tmp"
+               with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': 1, 'notes': self.snapshot_rows}, f, ensure_ascii=False)
+               os.replace(tmp_path, SNAPSHOT_PATH)
+          except OSError as e:
+               print(f"Ошибка при сохранении снимка заметок: {e}")
+
+     def paint_snapshot(self):
+          """
+        Мгновенная отрисовка заметок из снимка прошлого сеанса
+        Возвращает True, если снимок был показан
+        """
+          if self.snapshot_painted:
+               return False
+          self.snapshot_painted = True
+
+          try:
+               with open(SNAPSHOT_PATH, encoding='utf-8') as f:
+                    snapshot = json.load(f)
+               rows = snapshot['notes'] if snapshot.get('version') == 1 else []
+          except (OSError, ValueError, KeyError):
+               return False
+          if not rows:
+               return False
 
-               note_container = Container(
+          self.notes_list.controls.clear()
+          # Индикатор того, что идет сверка с базой
+          self.notes_list.controls.append(ProgressBar(width=850, color=colors.BLUE_600))
+          for row in rows:
+               self.notes_list.controls.append(Container(
                     width=850,
                     padding=10,
-                    bgcolor=self.color_palette.get(note[4], colors.WHITE70),
+                    bgcolor=self.color_palette.get(row['color'], colors.WHITE70),
                     border_radius=10,
                     content=Column([
-                         Text(f"Приоритет: {note[3]}", weight=FontWeight.BOLD),
-                         Text(note[1], size=18, weight=FontWeight.W_600),
-                         Text(note[2], size=14),
-                         Row([
-                              Text(f"Создано: {note[5]}", size=10, color=colors.BLACK54),
-                              Text(reminder_text, size=10, color=colors.BLACK54),
-                              Row([
-                                   IconButton(
-                                        icon=icons.EDIT,
-                                        icon_color=colors.BLUE,
-                                        on_click=lambda e, note_data=note: self.edit_note(note_data)
-                                   ),
-                                   IconButton(
-                                        icon=icons.DELETE,
-                                        icon_color=colors.RED,
-                                        on_click=lambda e, note_id=note[0]: self.delete_note(note_id)
-                                   ),
-                                   IconButton(
-                                        icon=icons.ALARM_ADD,
-                                        icon_color=colors.GREEN,
-                                        on_click=lambda e, note_id=note[0]: self.open_reminder_modal(note_id)
-                                   )
-                              ])
-                         ])
+                         Text(row['title'], size=18, weight=FontWeight.W_600),
+                         Text(row['preview'], size=14, max_lines=3, overflow=TextOverflow.ELLIPSIS)
                     ])
-               )
-               self.notes_list.controls.append(note_container)
+               ))
+          return True
+
+     def reconcile_snapshot(self):
+          """
+        Сверка показанного снимка с базой: полная загрузка заметок в фоне
+        """
+          try:
+               self.load_notes()
+               self.page.update()
+          except Exception as e:
+               print(f"Ошибка при сверке снимка заметок: {e}")
 
-     def edit_note(self, note_data):
+     def edit_note(self, note_id):
           """
         Редактирование заметки
+        Полные данные заметки загружаются по id
         """
+          try:
+               conn = get_connection()
+               cursor = conn.cursor()
+               cursor.execute('SELECT id, title, content, priority, color FROM notes WHERE id = ?', (note_id,))
+               note_data = cursor.fetchone()
+          except sqlite3.Error as e:
+               self.show_notification(f"Ошибка при загрузке заметки: {e}")
+               return
+          finally:
+               conn.close()
+
+          if note_data is None:
+               self.show_notification("Заметка не найдена")
+               return
+
           # Создаем модальное окно для редактирования
           edit_modal = BottomSheet(
                Container(
@@ -1699,12 +2476,8 @@ class Notes:
                          # Выпадающий список приоритетов
                          Dropdown(
                               label="Степень важности",
-                              options=[
-                                   dropdown.Option("Низкий"),
-                                   dropdown.Option("Средний"),
-                                   dropdown.Option("Высокий")
-                              ],
-                              value=note_data[3],
+                              options=priority_options(),
+                              value=str(note_data[3]),
                               width=300,
                               ref=self.edit_priority_dropdown
                          ),
@@ -1741,21 +2514,20 @@ class Notes:
         """
           note_id = e.control.data  # Получаем ID заметки
 
+          values = (
+               self.edit_title_input.current.value,
+               self.edit_content_input.current.value,
+               parse_priority(self.edit_priority_dropdown.current.value, DEFAULT_PRIORITY),
+               self.edit_color_dropdown.current.value,
+               note_id
+          )
           try:
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-               cursor.execute('''
-                UPDATE notes 
+               run_write(lambda conn: conn.execute('''
+                UPDATE notes
                 SET title = ?, content = ?, priority = ?, color = ?
                 WHERE id = ?
-            ''', (
-                    self.edit_title_input.current.value,
-                    self.edit_content_input.current.value,
-                    self.edit_priority_dropdown.current.value,
-                    self.edit_color_dropdown.current.value,
-                    note_id
-               ))
-               conn.commit()
+            ''', values))
+               changes.publish(changes.NOTE, changes.UPDATED, [note_id])
 
                # Показываем уведомление об успешном сохранении
                self.page.snack_bar = SnackBar(
@@ -1772,11 +2544,6 @@ class Notes:
                )
                self.page.snack_bar.open = True
 
-          finally:
-               conn.close()
-
-          # Обновляем список заметок
-          self.load_notes()
           self.page.update()
 
      def delete_note(self, note_id):
@@ -1784,86 +2551,85 @@ class Notes:
         Удаление заметки (перемещение в корзину)
         """
           try:
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-               cursor.execute('UPDATE notes SET completed = 1, deleted_at = ? WHERE id = ?',
-                              (datetime.now().isoformat(), note_id))
-               conn.commit()
+               run_write(lambda conn: conn.execute('UPDATE notes SET completed = 1, deleted_at = ? WHERE id = ?',
+                                                   (int(time.time()), note_id)))
+               # Карточка переходит из заметок в корзину
+               changes.publish(changes.NOTE, changes.TRASHED, [note_id])
           except sqlite3.Error as e:
                self.page.snack_bar = SnackBar(content=Text(f"Ошибка при удалении: {e}"))
                self.page.snack_bar.open = True
-          finally:
-               conn.close()
 
-          self.load_notes()
           self.page.update()
 
+     @operation('view.notes.load_trash_notes', controls=lambda self: self.trash_list)
      def load_trash_notes(self):
           """
         Загрузка заметок из корзины
         """
-          # Очистка существующих заметок
-          self.notes_list.controls.clear()
+          with self.trash_cards.lock:
+               try:
+                    # Загрузка заметок из корзины
+                    conn = get_connection()
+                    cursor = conn.cursor()
+                    cursor.execute(
+                         f'SELECT {NOTE_CARD_COLUMNS} FROM notes WHERE completed = 1 ORDER BY deleted_at DESC, id DESC'
+                    )
+                    notes = cursor.fetchall()
+               except sqlite3.Error as e:
+                    self.page.snack_bar = SnackBar(content=Text(f"Ошибка при загрузке корзины: {e}"))
+                    self.page.snack_bar.open = True
+                    return
+               finally:
+                    conn.close()
 
-          try:
-               # Загрузка заметок из корзины
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-               cursor.execute('SELECT * FROM notes WHERE completed = 1 ORDER BY deleted_at DESC')
-               notes = cursor.fetchall()
-          except sqlite3.Error as e:
-               self.page.snack_bar = SnackBar(content=Text(f"Ошибка при загрузке корзины: {e}"))
-               self.page.snack_bar.open = True
-               return
-          finally:
-               conn.close()
+               # Заполнение списка заметок в корзине (очистка существующих)
+               self.trash_cards.reset('all')
+               for note in notes:
+                    self.trash_cards.add(note[0], note, self.build_trash_card(note), trash_sort_key(note))
 
-          # Заполнение списка заметок в корзине
-          for note in notes:
-               note_container = Container(
-                    width=850,
-                    padding=10,
-                    bgcolor=self.color_palette.get(note[4], colors.WHITE70),
-                    border_radius=10,
-                    content=Column([
-                         Text(f"Приоритет: {note[3]}", weight=FontWeight.BOLD),
-                         Text(note[1], size=18, weight=FontWeight.W_600),
-                         Text(note[2], size=14),
+     def build_trash_card(self, note):
+          """
+        Карточка заметки в корзине
+        """
+          return Container(
+               width=850,
+               padding=10,
+               bgcolor=self.color_palette.get(note[4], colors.WHITE70),
+               border_radius=10,
+               content=Column([
+                    Text(f"Приоритет: {priority_label(note[3])}", weight=FontWeight.BOLD),
+                    Text(note[1], size=18, weight=FontWeight.W_600),
+                    *self.build_note_preview(note),
+                    Row([
+                         Text(f"Удалено: {format_timestamp(note[6])}", size=10, color=colors.BLACK54),
                          Row([
-                              Text(f"Удалено: {note[6]}", size=10, color=colors.BLACK54),
-                              Row([
-                                   IconButton(
-                                        icon=icons.RESTORE,
-                                        icon_color=colors.GREEN,
-                                        on_click=lambda e, note_id=note[0]: self.restore_note(note_id)
-                                   ),
-                                   IconButton(
-                                        icon=icons.DELETE_FOREVER,
-                                        icon_color=colors.RED,
-                                        on_click=lambda e, note_id=note[0]: self.permanent_delete(note_id)
-                                   )
-                              ])
+                              IconButton(
+                                   icon=icons.RESTORE,
+                                   icon_color=colors.GREEN,
+                                   on_click=lambda e, note_id=note[0]: self.restore_note(note_id)
+                              ),
+                              IconButton(
+                                   icon=icons.DELETE_FOREVER,
+                                   icon_color=colors.RED,
+                                   on_click=lambda e, note_id=note[0]: self.permanent_delete(note_id)
+                              )
                          ])
                     ])
-               )
-               self.notes_list.controls.append(note_container)
+               ])
+          )
 
      def restore_note(self, note_id):
           """
         Восстановление заметки из корзины
         """
           try:
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-               cursor.execute('UPDATE notes SET completed = 0, deleted_at = NULL WHERE id = ?', (note_id,))
-               conn.commit()
+               run_write(lambda conn: conn.execute('UPDATE notes SET completed = 0, deleted_at = NULL WHERE id = ?',
+                                                   (note_id,)))
+               changes.publish(changes.NOTE, changes.RESTORED, [note_id])
           except sqlite3.Error as e:
                self.page.snack_bar = SnackBar(content=Text(f"Ошибка при восстановлении: {e}"))
                self.page.snack_bar.open = True
-          finally:
-               conn.close()
 
-          self.load_trash_notes()
           self.page.update()
 
      def permanent_delete(self, note_id):
@@ -1871,170 +2637,739 @@ class Notes:
         Окончательное удаление заметки
         """
           try:
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-               cursor.execute('DELETE FROM notes WHERE id = ?', (note_id,))
-               conn.commit()
+               run_write(lambda conn: conn.execute('DELETE FROM notes WHERE id = ?', (note_id,)))
+               changes.publish(changes.NOTE, changes.DELETED, [note_id])
           except sqlite3.Error as e:
                self.page.snack_bar = SnackBar(content=Text(f"Ошибка при удалении: {e}"))
                self.page.snack_bar.open = True
-          finally:
-               conn.close()
 
-          self.load_trash_notes()
           self.page.update()
 
+     @timed('notes.cleanup_old_notes')
      def cleanup_old_notes(self):
           """
         Удаление заметок старше 7 дней в корзине
         """
           try:
-               conn = sqlite3.connect('tasks.db')
-               cursor = conn.cursor()
-               seven_days_ago = datetime.now() - timedelta(days=7)
-               cursor.execute('DELETE FROM notes WHERE completed = 1 AND deleted_at < ?', (seven_days_ago,))
-               conn.commit()
+               seven_days_ago = int(time.time()) - 7 * 24 * 60 * 60
+               deleted = run_write(lambda conn: conn.execute(
+                    'DELETE FROM notes WHERE completed = 1 AND deleted_at < ? RETURNING id',
+                    (seven_days_ago,)).fetchall())
+               changes.publish(changes.NOTE, changes.DELETED, [row[0] for row in deleted])
           except sqlite3.Error as e:
                self.page.snack_bar = SnackBar(content=Text(f"Ошибка при очистке корзины: {e}"))
                self.page.snack_bar.open = True
-          finally:
-               conn.close()
 
 
-def main(page: Page):
+class ReminderTimeline:
      """
-    Основная функция приложения
-    Настройка интерфейса и логики
+    Лента предстоящих напоминаний: сегодня, на этой неделе, позже
+    Каждый интервал загружается при раскрытии, порциями по reminders.TIMELINE_PAGE;
+    при изменении напоминаний пересчитываются только счетчики и раскрытые интервалы
     """
-     try:
-          print("Начало инициализации приложения")  # Отладочное сообщение
-
-          # Инициализация базы данных
-          init_db()
-          print("База данных инициализирована")  # Отладочное сообщение
-
-          # Настройка страницы
-          page.title = "MyNote"
-          page.window.width = 1225
-          page.window.height = 940
-          page.window.resizable = False
-          page.theme_mode = ThemeMode.DARK
-          page.padding = 0
-          page.window.icon = 'Frame 5.png'
-
-          # Создание экземпляров менеджеров
-          notes_instance = Notes(page)
-          list_manager = ListManager(page)  # Добавляем менеджер списков
-          print("Экземпляры менеджеров созданы")  # Отладочное сообщение
-
-          notes_instance.reminder_manager.start_reminder_check()
-          print("Проверка напоминаний запущена")  # Отладочное сообщение
-
-          def open_tg(page):
-               page.launch_url("https://t.me/thefirstWebbApppbot")
-
-          def open_site(page):
-               page.launch_url("https://project11975037.tilda.ws/")
 
-          def get_notes_count():
-               """Получение количества заметок"""
-               try:
-                    conn = sqlite3.connect('tasks.db')
-                    cursor = conn.cursor()
-
-                    # Общее количество заметок
-                    cursor.execute('SELECT COUNT(*) FROM notes WHERE completed = 0')
-                    total_notes = cursor.fetchone()[0]
-
-                    # Количество заметок в корзине
-                    cursor.execute('SELECT COUNT(*) FROM notes WHERE completed = 1')
-                    trash_notes = cursor.fetchone()[0]
-
-                    # Количество активных напоминаний
-                    cursor.execute('SELECT COUNT(*) FROM notes WHERE completed = 0 AND reminder_time IS NOT NULL')
-                    active_reminders = cursor.fetchone()[0]
-
-                    # Количество списков
-                    cursor.execute('SELECT COUNT(*) FROM lists')
-                    total_lists = cursor.fetchone()[0]
-
-                    conn.close()
+     BUCKET_TITLES = {
+          'today': "Сегодня",
+          'week': "На этой неделе",
+          'later': "Позже",
+     }
 
-                    return total_notes, trash_notes, active_reminders, total_lists
-               except Exception as e:
-                    print(f"Ошибка при подсчете заметок: {e}")
-                    return 0, 0, 0, 0
-
-          # Контейнер для списков с новой функциональностью
-          _lists = Container(
+     def __init__(self, page: Page, notes):
+          self.page = page
+          self.notes = notes
+          self._lock = threading.Lock()
+
+          # Состояние интервала: заголовок, список строк и загруженные строки
+          self.buckets = {}
+          for bucket in reminders.TIMELINE_BUCKETS:
+               rows_column = Column(spacing=6)
+               more_button = TextButton(
+                    "Показать еще",
+                    visible=False,
+                    on_click=lambda e, bucket=bucket: self.load_more(bucket)
+               )
+               tile = ExpansionTile(
+                    title=Text(self.BUCKET_TITLES[bucket], size=18, weight=FontWeight.W_600),
+                    controls=[rows_column, more_button],
+                    on_change=lambda e, bucket=bucket: self.toggle_bucket(bucket, e.data == "true")
+               )
+               self.buckets[bucket] = {
+                    'tile': tile,
+                    'column': rows_column,
+                    'more': more_button,
+                    'rows': [],
+                    'count': 0,
+                    'expanded': False,
+               }
+
+          self.view = Container(
                width=900,
                height=950,
                bgcolor=colors.BLACK12,
                content=Column(
                     horizontal_alignment='center',
                     controls=[
-                         Text('Мои списки', size=25, color=colors.WHITE),
-                         notes_instance.search_input,
-                         notes_instance.priority_filter,
-                         notes_instance.color_filter,
-                         Container(
-                              height=750,
-                              content=list_manager.list_items_container
-                         ),
+                         Text('Напоминания', size=25, color=colors.WHITE),
                          Container(
-                              on_click=lambda e: page.open(list_modal),  # Открытие модального окна для списков
-                              bgcolor=colors.BLUE_600,
-                              height=50,
                               width=850,
-                              border_radius=15,
-                              alignment=alignment.center,
-                              content=Text("Добавить список", color=colors.WHITE, text_align='center')
+                              height=800,
+                              content=Column(
+                                   scroll='auto',
+                                   controls=[self.buckets[bucket]['tile'] for bucket in reminders.TIMELINE_BUCKETS]
+                              )
                          )
                     ]
                )
           )
 
-          # Модальное окно для создания списков
-          list_modal = BottomSheet(
-               Container(
-                    width=800,
-                    height=700,
-                    padding=20,
-                    content=Column(
-                         [
-                              Tabs(
-                                   selected_index=0,
-                                   width=760,
-                                   tabs=[
-                                        Tab(
-                                             text="Заметка",
-                                             content=Container(
-                                                  content=Column(
-                                                       [notes_instance.create_note_tab()],
-                                                       scroll='auto',
-                                                       height=600
-                                                  )
-                                             )
-                                        ),
-                                        Tab(
-                                             text="Список",
-                                             content=Container(
-                                                  content=Column(
-                                                       [list_manager.create_list_tab()],
-                                                       scroll='auto',
-                                                       height=600
-                                                  )
-                                             )
-                                        )
-                                   ]
+     @operation('view.timeline.refresh', controls=lambda self: self.view)
+     def refresh(self):
+          """
+        Счетчики интервалов и уже показанные строки раскрытых интервалов
+        """
+          with self._lock:
+               bounds = reminders.bucket_bounds()
+               try:
+                    conn = get_connection()
+                    for bucket, (start, end) in bounds.items():
+                         state = self.buckets[bucket]
+                         state['count'] = reminders.count_bucket(conn, start, end)
+                         if state['expanded']:
+                              limit = max(reminders.TIMELINE_PAGE, len(state['rows']))
+                              state['rows'] = reminders.fetch_bucket(conn, start, end, limit=limit)
+               except sqlite3.Error as e:
+                    print(f"Ошибка при загрузке ленты напоминаний: {e}")
+                    return
+               finally:
+                    conn.close()
+
+               for bucket in reminders.TIMELINE_BUCKETS:
+                    self.render_bucket(bucket)
+
+     def toggle_bucket(self, bucket, expanded):
+          """
+        Раскрытие интервала: первая порция строк загружается только сейчас
+        """
+          state = self.buckets[bucket]
+          state['expanded'] = expanded
+          if expanded and not state['rows']:
+               self.load_more(bucket)
+
+     def load_more(self, bucket):
+          """
+        Следующая порция строк интервала после последней показанной
+        """
+          with self._lock:
+               state = self.buckets[bucket]
+               start, end = reminders.bucket_bounds()[bucket]
+               after = (state['rows'][-1][2], state['rows'][-1][0]) if state['rows'] else None
+               try:
+                    conn = get_connection()
+                    state['rows'] = state['rows'] + reminders.fetch_bucket(conn, start, end, after=after)
+               except sqlite3.Error as e:
+                    print(f"Ошибка при загрузке ленты напоминаний: {e}")
+                    return
+               finally:
+                    conn.close()
+               self.render_bucket(bucket)
+          self.page.update()
+
+     def render_bucket(self, bucket):
+          state = self.buckets[bucket]
+          state['tile'].title.value = f"{self.BUCKET_TITLES[bucket]} ({state['count']})"
+          state['column'].controls = [self.build_row(row) for row in state['rows']]
+          state['more'].visible = len(state['rows']) < state['count']
+
+     def build_row(self, row):
+          note_id, title, reminder_time = row
+          return Container(
+               padding=10,
+               border_radius=10,
+               bgcolor=colors.WHITE10,
+               content=Row([
+                    Text(format_timestamp(reminder_time), size=14, color=colors.WHITE70, width=140),
+                    Text(title or "", size=16, expand=True),
+                    IconButton(
+                         icon=icons.ALARM,
+                         tooltip="Изменить напоминание",
+                         on_click=lambda e, note_id=note_id: self.open_reminder(note_id)
+                    )
+               ])
+          )
+
+     def open_reminder(self, note_id):
+          """
+        Окно напоминания для заметки из ленты
+        """
+          self.notes.current_note_id = note_id
+          self.notes.open_reminder_modal()
+
+
+class ReminderAlerts:
+     """
+    Окно сработавших напоминаний с кнопками откладывания
+    Отложенное напоминание возвращается в очередь планировщика (ReminderManager.snooze)
+    """
+
+     # Варианты откладывания: (подпись, минуты)
+     SNOOZE_OPTIONS = (("5 мин", 5), ("15 мин", 15), ("1 час", 60))
+
+     def __init__(self, page: Page, reminder_manager):
+          self.page = page
+          self.reminder_manager = reminder_manager
+          self._lock = threading.Lock()
+          # Сработавшие и еще не отложенные напоминания: id -> title
+          self.pending = {}
+          # Заметка, для которой выбирается время откладывания
+          self.picking_note_id = None
+
+          self.alerts_column = Column(spacing=10, scroll=ScrollMode.AUTO)
+          self.snooze_picker = TimePicker(on_change=self.on_snooze_time)
+          self.sheet = BottomSheet(
+               Container(
+                    padding=20,
+                    content=Column([
+                         Text("Напоминания", size=20, weight=FontWeight.BOLD),
+                         self.alerts_column,
+                         TextButton("Закрыть", on_click=lambda _: self.dismiss_all())
+                    ], tight=True)
+               )
+          )
+
+     def on_change(self, change):
+          """
+        Обработчик шины изменений: окно показывается при срабатывании напоминаний
+        """
+          if change.action == changes.FIRED:
+               self.show(change.ids)
+
+     def show(self, note_ids):
+          """
+        Показ сработавших напоминаний; вызывается из потока проверки напоминаний
+        """
+          try:
+               conn = get_connection()
+               try:
+                    fired = search.fetch_rows(conn, 'notes', 'id, title', list(note_ids))
+               finally:
+                    conn.close()
+          except sqlite3.Error as e:
+               print(f"Ошибка при загрузке сработавших напоминаний: {e}")
+               return
+          if not fired:
+               return
+          with self._lock:
+               for note_id, title in fired:
+                    self.pending[note_id] = title
+               self.render()
+          self.page.open(self.sheet)
+
+     def render(self):
+          self.alerts_column.controls = [
+               self.build_alert(note_id, title) for note_id, title in self.pending.items()
+          ]
+
+     def build_alert(self, note_id, title):
+          return Container(
+               padding=10,
+               border_radius=10,
+               bgcolor=colors.WHITE10,
+               content=Column([
+                    Text(title or "", size=16, weight=FontWeight.W_600),
+                    Row([
+                         *[
+                              TextButton(
+                                   label,
+                                   on_click=lambda e, note_id=note_id, minutes=minutes:
+                                        self.snooze_for(note_id, minutes)
                               )
+                              for label, minutes in self.SNOOZE_OPTIONS
                          ],
-                         horizontal_alignment='center',
-                         scroll='auto'
+                         TextButton(
+                              "Выбрать время",
+                              on_click=lambda e, note_id=note_id: self.pick_time(note_id)
+                         ),
+                         IconButton(
+                              icon=icons.CLOSE,
+                              tooltip="Готово",
+                              on_click=lambda e, note_id=note_id: self.dismiss(note_id)
+                         )
+                    ], wrap=True)
+               ], tight=True)
+          )
+
+     def snooze_for(self, note_id, minutes):
+          self.snooze(note_id, time.time() + minutes * 60)
+
+     def pick_time(self, note_id):
+          self.picking_note_id = note_id
+          self.page.open(self.snooze_picker)
+
+     def on_snooze_time(self, e):
+          """
+        Откладывание до выбранного времени; прошедшее время сегодня означает завтра
+        """
+          if self.picking_note_id is None or not self.snooze_picker.value:
+               return
+          until = datetime.combine(datetime.now().date(), self.snooze_picker.value)
+          if until <= datetime.now():
+               until += timedelta(days=1)
+          self.snooze(self.picking_note_id, until.timestamp())
+          self.picking_note_id = None
+
+     def snooze(self, note_id, until):
+          try:
+               self.reminder_manager.snooze(note_id, until)
+          except sqlite3.Error as ex:
+               self.page.open(SnackBar(content=Text(f"Ошибка при откладывании напоминания: {ex}"), bgcolor=colors.RED))
+               return
+          self.page.open(SnackBar(content=Text(f"Напоминание отложено до {format_timestamp(int(until))}")))
+          self.dismiss(note_id)
+
+     def dismiss(self, note_id):
+          with self._lock:
+               self.pending.pop(note_id, None)
+               self.render()
+          if self.pending:
+               self.page.update()
+          else:
+               self.page.close(self.sheet)
+
+     def dismiss_all(self):
+          with self._lock:
+               self.pending.clear()
+               self.render()
+          self.page.close(self.sheet)
+
+
+class GlobalSearch:
+     """
+    Глобальный поиск по заметкам, спискам и элементам списков
+    Результаты одного запроса показываются по типам; нажатие открывает найденное
+    """
+
+     KIND_TITLES = {
+          'note': "Заметки",
+          'list': "Списки",
+          'item': "Элементы списков",
+     }
+
+     def __init__(self, page: Page, open_hit):
+          self.page = page
+          self.open_hit = open_hit
+
+          self.search_input = TextField(
+               hint_text="Поиск везде",
+               prefix_icon=icons.SEARCH,
+               width=250,
+               border_radius=15
+          )
+          self.results_list = Column(spacing=8, width=850)
+          self.view = Container(
+               width=900,
+               height=950,
+               bgcolor=colors.BLACK12,
+               content=Column(
+                    horizontal_alignment='center',
+                    controls=[
+                         Text('Результаты поиска', size=25, color=colors.WHITE),
+                         Container(
+                              height=800,
+                              content=Column(scroll='auto', controls=[self.results_list])
+                         )
+                    ]
+               )
+          )
+
+     @operation('view.search.perform_search', controls=lambda self: self.results_list)
+     def perform_search(self, e=None):
+          """
+        Поиск по всем типам одним запросом к общему индексу
+        """
+          try:
+               conn = get_connection()
+               hits = search.search_all(conn, self.search_input.value or "")
+          except sqlite3.Error as e:
+               print(f"Ошибка глобального поиска: {e}")
+               hits = []
+          finally:
+               conn.close()
+
+          self.results_list.controls.clear()
+          if not hits:
+               self.results_list.controls.append(
+                    Container(
+                         content=Text("Ничего не найдено", size=18, color=colors.GREY),
+                         alignment=alignment.center,
+                         padding=20
                     )
                )
+               return
+
+          kind = None
+          for hit in hits:
+               if hit.kind != kind:
+                    kind = hit.kind
+                    self.results_list.controls.append(
+                         Text(self.KIND_TITLES[kind], size=18, weight=FontWeight.BOLD, color=colors.WHITE70)
+                    )
+               self.results_list.controls.append(self.build_hit_card(hit))
+
+     def build_hit_card(self, hit):
+          """
+        Карточка результата: для элемента списка подписью служит название списка
+        """
+          if hit.kind == 'item':
+               heading, caption = hit.text, f"Список: {hit.title or ''}"
+          else:
+               heading, caption = hit.title, hit.text
+          return Container(
+               padding=10,
+               border_radius=10,
+               bgcolor=colors.WHITE10,
+               on_click=lambda e, hit=hit: self.open_hit(hit),
+               content=Column([
+                    Text(spans=highlight_spans(heading or ""), size=16, weight=FontWeight.W_600),
+                    Text(spans=highlight_spans(caption or ""), size=12, color=colors.WHITE54)
+               ], spacing=4)
+          )
+
+
+def parse_args(argv=None):
+     """
+    Разбор параметров запуска приложения
+    """
+     parser = argparse.ArgumentParser(description="MyNote")
+     parser.add_argument('--metrics', action='store_true',
+                         help="включить сбор метрик производительности")
+     parser.add_argument('--metrics-file', default='mynote_metrics.json',
+                         help="файл для периодической выгрузки метрик")
+     parser.add_argument('--metrics-port', type=int, default=None,
+                         help="порт локальной HTTP-точки /metrics")
+     parser.add_argument('--perf-overlay', action='store_true',
+                         help="показать панель производительности при запуске")
+     parser.add_argument('--startup-budget-ms', type=int, default=500,
+                         help="бюджет времени до готовности вкладок с данными в миллисекундах")
+     parser.add_argument('--reminder-coalesce-threshold', type=int, default=reminders.COALESCE_THRESHOLD,
+                         help="сколько напоминаний отправлять отдельно; больше - одним сводным уведомлением")
+     parser.add_argument('--reminder-coalesce-titles', type=int, default=reminders.COALESCE_TITLES,
+                         help="число заголовков в сводном уведомлении")
+     parser.add_argument('--reminder-coalesce-window', type=int, default=reminders.COALESCE_WINDOW,
+                         help="напоминания, наступающие в ближайшие секунды, отправляются вместе")
+     parser.add_argument('--reminder-lag-alert', type=int, default=reminders.LAG_ALERT,
+                         help="допустимая задержка срабатывания напоминания в секундах")
+     parser.add_argument('--reminder-stats-file', default=reminders.STATS_PATH,
+                         help="файл сводки здоровья доставки напоминаний")
+     parser.add_argument('--change-feed-interval', type=float, default=changes.FEED_INTERVAL,
+                         help="как часто проверять изменения базы другими процессами, секунды (0 - не проверять)")
+     parser.add_argument('--memprofile', action='store_true',
+                         help="профилирование памяти через tracemalloc")
+     parser.add_argument('--memprofile-interval', type=int, default=300,
+                         help="интервал между снимками памяти в секундах")
+     parser.add_argument('--memprofile-report', default='memory_report.txt',
+                         help="файл отчета о памяти")
+     parser.add_argument('--memprofile-top', type=int, default=15,
+                         help="количество мест выделения памяти в отчете")
+     args, _ = parser.parse_known_args(argv)
+     return args
+
+
+# Параметры запуска (заполняются при запуске из командной строки)
+launch_options = None
+
+# Профилировщик памяти (создается флагом --memprofile)
+memory_profiler = None
+
+
+class PerfOverlay:
+     """
+    Отладочная панель производительности
+    Показывает последние операции интерфейса, память процесса и размер дерева элементов
+    Переключается сочетанием Ctrl+Shift+D или флагом запуска --perf-overlay
+    """
+
+     def __init__(self, page: Page, limit=15):
+          self.page = page
+          self.limit = limit
+          self.visible = False
+          self.stop_event = threading.Event()
+          self.refresh_thread = None
+
+          self.summary_text = Text("", size=12, color=colors.WHITE70)
+          self.reminders_text = Text("", size=12, color=colors.WHITE70)
+          self.operations_column = Column(spacing=2)
+          self.panel = Container(
+               visible=False,
+               right=10,
+               top=10,
+               width=620,
+               padding=10,
+               border_radius=10,
+               bgcolor=colors.with_opacity(0.92, colors.BLACK),
+               content=Column([
+                    Row([
+                         Text("Производительность", size=14, weight=FontWeight.BOLD, color=colors.WHITE),
+                         IconButton(icon=icons.CLOSE, icon_size=16, on_click=self.toggle)
+                    ], alignment='spaceBetween'),
+                    self.summary_text,
+                    self.reminders_text,
+                    Text(
+                         f"{'операция':<24}{'всего':>8}{'SQL':>8}{'строк':>8}{'элем.':>8}{'update':>8}",
+                         size=11,
+                         font_family="monospace",
+                         color=colors.WHITE54
+                    ),
+                    self.operations_column
+               ], spacing=4, tight=True)
           )
 
+     def attach(self):
+          """
+        Добавление панели в overlay страницы
+        """
+          self.page.overlay.append(self.panel)
+
+     def handle_keyboard(self, e):
+          """
+        Обработчик сочетания клавиш Ctrl+Shift+D
+        """
+          if e.ctrl and e.shift and e.key.upper() == 'D':
+               self.toggle()
+
+     def toggle(self, e=None):
+          """
+        Показ или скрытие панели
+        """
+          self.visible = not self.visible
+          self.panel.visible = self.visible
+
+          if self.visible:
+               # Для записи операций нужно включенное инструментирование
+               instrumentation.enable()
+               self.stop_event.clear()
+               self.refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+               self.refresh_thread.start()
+               self.refresh()
+          else:
+               self.stop_event.set()
+
+          self.page.update()
+
+     def _refresh_loop(self):
+          """
+        Периодическое обновление панели, пока она открыта
+        """
+          while not self.stop_event.wait(1):
+               try:
+                    self.refresh()
+                    self.panel.update()
+               except Exception as e:
+                    print(f"Ошибка при обновлении панели производительности: {e}")
+
+     def _tree_size(self):
+          """
+        Количество элементов на странице без самой панели
+        """
+          roots = list(self.page.controls) + [c for c in self.page.overlay if c is not self.panel]
+          return sum(instrumentation.count_controls(root) for root in roots)
+
+     def _reminder_health(self):
+          """
+        Строка здоровья доставки напоминаний: квантили задержки, опоздания и отправки раньше срока
+        """
+          lag = instrumentation.histogram('reminders.lag', reminders.LAG_BUCKETS_MS).snapshot()
+          early = instrumentation.histogram('reminders.early', reminders.LAG_BUCKETS_MS).snapshot()
+          scan = instrumentation.histogram('reminders.scan').snapshot()
+          sent = lag['count'] + early['count']
+          if not sent:
+               return f"Напоминания: отправленных нет, проверок {scan['count']}"
+          text = "Напоминания: "
+          if lag['count']:
+               text += (f"задержка p50 {lag['p50_ms'] / 1000:.1f} с, p95 {lag['p95_ms'] / 1000:.1f} с, "
+                        f"макс. {lag['max_ms'] / 1000:.1f} с; ")
+          if early['count']:
+               text += f"раньше срока {early['count']} (до {early['max_ms'] / 1000:.1f} с); "
+          return text + f"отправлено {sent}, проверок {scan['count']}"
+
+     def refresh(self):
+          """
+        Заполнение панели последними замерами
+        """
+          rss = instrumentation.process_rss()
+          rss_text = f"{rss / (1024 * 1024):.1f} МБ" if rss else "н/д"
+          self.summary_text.value = f"Память процесса (RSS): {rss_text}   Элементов в дереве: {self._tree_size()}"
+          self.reminders_text.value = self._reminder_health()
+
+          lines = []
+          for record in instrumentation.recent_operations(self.limit):
+               controls = record.controls if record.controls is not None else '-'
+               lines.append(
+                    f"{record.name[:23]:<24}{record.duration_ms:>8.1f}{record.sql_ms:>8.1f}"
+                    f"{record.rows:>8}{controls:>8}{record.update_ms:>8.1f}"
+               )
+          if not lines:
+               lines.append("Операций пока нет")
+
+          self.operations_column.controls = [
+               Text(line, size=11, font_family="monospace", color=colors.WHITE)
+               for line in lines
+          ]
+
+
+def main(page: Page):
+     """
+    Основная функция приложения
+    Сначала показывается оболочка окна, затем в фоне готовятся база и
+    менеджеры, а вкладки строятся при первом открытии
+    """
+     startup_started = time.perf_counter()
+     try:
+          print("Начало инициализации приложения")  # Отладочное сообщение
+
+          # Замер всех обновлений страницы
+          instrumentation.instrument_page(page)
+          options = launch_options or parse_args([])
+
+          # Настройка страницы
+          page.title = "MyNote"
+          page.window.width = 1225
+          page.window.height = 940
+          page.window.resizable = False
+          page.theme_mode = ThemeMode.DARK
+          page.padding = 0
+          page.window.icon = 'Frame 5.png'
+
+          # Менеджеры создаются в фоне после показа окна
+          managers = {}
+          app_ready = threading.Event()
+
+          def finish_startup():
+               """
+               Фоновая часть запуска: база данных, менеджеры и напоминания
+               """
+               try:
+                    with timed('startup.init_db'):
+                         init_db()
+                    print("База данных инициализирована")  # Отладочное сообщение
+
+                    with timed('startup.managers'):
+                         managers['notes'] = Notes(page)
+                         managers['lists'] = ListManager(page)  # Добавляем менеджер списков
+                         managers['timeline'] = ReminderTimeline(page, managers['notes'])
+                         managers['alerts'] = ReminderAlerts(page, managers['notes'].reminder_manager)
+                    print("Экземпляры менеджеров созданы")  # Отладочное сообщение
+
+                    # Представления обновляются точечно по событиям шины изменений
+                    subscriptions.extend([
+                         changes.bus.subscribe(managers['notes'].apply_change, changes.NOTE),
+                         changes.bus.subscribe(managers['lists'].apply_change, changes.LIST),
+                         changes.bus.subscribe(managers['alerts'].on_change, changes.NOTE),
+                         changes.bus.subscribe(refresh_timeline, changes.NOTE),
+                         changes.bus.subscribe(refresh_stats),
+                    ])
+                    # Изменения других процессов приходят в ту же шину из журнала базы
+                    if options.change_feed_interval > 0:
+                         changes.feed.start(options.change_feed_interval)
+
+                    # Представления, за размером которых следит профилировщик памяти
+                    if memory_profiler:
+                         memory_profiler.watch_view('notes_list', managers['notes'].notes_list)
+                         memory_profiler.watch_view('trash_list', managers['notes'].trash_list)
+                         memory_profiler.watch_view('list_items_container', managers['lists'].list_items_container)
+                         memory_profiler.watch_view('overlay', lambda: list(page.overlay))
+
+                    reminder_manager = managers['notes'].reminder_manager
+                    reminder_manager.coalesce_threshold = options.reminder_coalesce_threshold
+                    reminder_manager.coalesce_titles = options.reminder_coalesce_titles
+                    reminder_manager.coalesce_window = options.reminder_coalesce_window
+                    reminder_manager.stats.lag_alert = options.reminder_lag_alert
+                    reminder_manager.stats.path = options.reminder_stats_file
+                    reminder_manager.start_reminder_check()
+                    print("Проверка напоминаний запущена")  # Отладочное сообщение
+
+                    # Снимок первого экрана заметок сохраняется при завершении работы
+                    atexit.register(managers['notes'].save_snapshot)
+
+                    # Вкладки с данными больше не ждут app_ready: замер времени до интерактивности
+                    time_to_interactive = (time.perf_counter() - startup_started) * 1000
+                    instrumentation.record('startup.time_to_interactive', time_to_interactive)
+                    print(f"Приложение готово к работе через {time_to_interactive:.0f} мс")
+                    if time_to_interactive > options.startup_budget_ms:
+                         print(f"Превышен бюджет запуска: {time_to_interactive:.0f} мс > {options.startup_budget_ms} мс")
+               except Exception as ex:
+                    show_error(f"Ошибка при запуске: {ex}")
+               finally:
+                    app_ready.set()
+
+          def refresh_timeline(change=None):
+               """Обновление ленты напоминаний; вызывается и из потока напоминаний"""
+               if 'Напоминания' not in tabs:
+                    # Лента еще не открывалась: она загрузится при открытии
+                    return
+               managers['timeline'].refresh()
+               if right_content.content is tabs['Напоминания']:
+                    page.update()
+
+          def show_error(message):
+               """Показ ошибки во всплывающем уведомлении"""
+               snack_bar = SnackBar(content=Text(message), duration=3000)
+               page.overlay.append(snack_bar)
+               page.update()
+               snack_bar.open = True
+               page.update()
+
+          def open_tg(page):
+               page.launch_url("https://t.me/thefirstWebbApppbot")
+
+          def open_site(page):
+               page.launch_url("https://project11975037.tilda.ws/")
+
+          def get_notes_count(entity=None):
+               """
+               Получение количества заметок и списков: {номер строки статистики: текст}
+               С entity считаются только счетчики этой сущности (changes.NOTE или changes.LIST)
+               """
+               counts = {}
+               try:
+                    conn = get_connection()
+                    cursor = conn.cursor()
+
+                    if entity in (None, changes.NOTE):
+                         # Общее количество заметок
+                         cursor.execute('SELECT COUNT(*) FROM notes WHERE completed = 0')
+                         counts[1] = f'Всего заметок: {cursor.fetchone()[0]}'
+
+                         # Количество заметок в корзине
+                         cursor.execute('SELECT COUNT(*) FROM notes WHERE completed = 1')
+                         counts[2] = f'Заметок в корзине: {cursor.fetchone()[0]}'
+
+                         # Количество активных напоминаний
+                         cursor.execute(f'SELECT COUNT(*) FROM notes WHERE {reminders.PENDING} AND {reminders.FIRE_TIME} IS NOT NULL')
+                         counts[3] = f'Активных напоминаний: {cursor.fetchone()[0]}'
+
+                    if entity in (None, changes.LIST):
+                         # Количество списков
+                         cursor.execute('SELECT COUNT(*) FROM lists')
+                         counts[4] = f'Всего списков: {cursor.fetchone()[0]}'
+
+                    conn.close()
+               except Exception as e:
+                    print(f"Ошибка при подсчете заметок: {e}")
+               return counts
+
+          def refresh_stats(change=None):
+               """
+               Статистика аккаунта; событие шины пересчитывает только счетчики своей сущности
+               """
+               if 'Аккаунт' not in tabs:
+                    # Вкладка еще не открывалась: статистика посчитается при открытии
+                    return
+               stats_rows = tabs['Аккаунт'].content.controls[1].content.controls
+               for row, text in get_notes_count(change.entity if change else None).items():
+                    stats_rows[row].value = text
+               if change is not None and right_content.content is tabs['Аккаунт']:
+                    page.update()
+
           # Контейнер Главная страница (без изменений)
           _home = Container(
                width=880,
@@ -2117,94 +3452,203 @@ def main(page: Page):
                )
           )
 
-          # Контейнер Мои заметки (без изменений)
-          _mynotes = Container(
-               width=900,
-               height=950,
-               bgcolor=colors.BLACK12,
-               content=Column(
-                    horizontal_alignment='center',
-                    controls=[
-                         Text('Мои заметки', size=25, color=colors.WHITE),
-                         notes_instance.create_search_container(),
-                         Container(
-                              height=600,
-                              content=Column(
-                                   scroll='auto',
-                                   controls=[
-                                        notes_instance.notes_list
-                                   ]
+          def build_lists_tab():
+               """Построение вкладки списков и модального окна создания"""
+               # Контейнер для списков с новой функциональностью
+               _lists = Container(
+                    width=900,
+                    height=950,
+                    bgcolor=colors.BLACK12,
+                    content=Column(
+                         horizontal_alignment='center',
+                         controls=[
+                              Text('Мои списки', size=25, color=colors.WHITE),
+                              managers['lists'].search_input,
+                              Row(
+                                   [managers['lists'].sort_dropdown, managers['lists'].priority_filter],
+                                   alignment='center'
+                              ),
+                              Container(
+                                   height=750,
+                                   content=managers['lists'].list_items_container
+                              ),
+                              Container(
+                                   on_click=lambda e: page.open(list_modal),  # Открытие модального окна для списков
+                                   bgcolor=colors.BLUE_600,
+                                   height=50,
+                                   width=850,
+                                   border_radius=15,
+                                   alignment=alignment.center,
+                                   content=Text("Добавить список", color=colors.WHITE, text_align='center')
                               )
-                         ),
-                         Container(
-                              on_click=lambda e: notes_instance.open_note_modal(e),
-                              bgcolor=colors.BLUE_600,
-                              height=50,
-                              width=850,
-                              border_radius=15,
-                              alignment=alignment.center,
-                              content=Text("Добавить заметку", color=colors.WHITE, text_align='center')
-                         )
-                    ]
+                         ]
+                    )
                )
-          )
 
-          # Контейнер "Корзина" (без изменений)
-          _rubbish = Container(
-               width=900,
-               height=900,
-               bgcolor=colors.BLACK12,
-               content=Column(
-                    horizontal_alignment='center',
-                    controls=[
-                         Text('Корзина', size=25, color=colors.WHITE),
-                         Container(
-                              height=750,
-                              content=Column(
-                                   scroll='auto',
-                                   controls=[
-                                        notes_instance.notes_list
-                                   ]
+               # Модальное окно для создания списков
+               list_modal = BottomSheet(
+                    Container(
+                         width=800,
+                         height=700,
+                         padding=20,
+                         content=Column(
+                              [
+                                   Tabs(
+                                        selected_index=0,
+                                        width=760,
+                                        tabs=[
+                                             Tab(
+                                                  text="Заметка",
+                                                  content=Container(
+                                                       content=Column(
+                                                            [managers['notes'].create_note_tab()],
+                                                            scroll='auto',
+                                                            height=600
+                                                       )
+                                                  )
+                                             ),
+                                             Tab(
+                                                  text="Список",
+                                                  content=Container(
+                                                       content=Column(
+                                                            [managers['lists'].create_list_tab()],
+                                                            scroll='auto',
+                                                            height=600
+                                                       )
+                                                  )
+                                             )
+                                        ]
+                                   )
+                              ],
+                              horizontal_alignment='center',
+                              scroll='auto'
+                         )
+                    )
+               )
+               page.overlay.append(list_modal)
+               modals['list'] = list_modal
+               return _lists
+
+          def build_mynotes_tab():
+               """Построение вкладки заметок"""
+               # Контейнер Мои заметки (без изменений)
+               _mynotes = Container(
+                    width=900,
+                    height=950,
+                    bgcolor=colors.BLACK12,
+                    content=Column(
+                         horizontal_alignment='center',
+                         controls=[
+                              Text('Мои заметки', size=25, color=colors.WHITE),
+                              managers['notes'].create_search_container(),
+                              Container(
+                                   height=600,
+                                   content=Column(
+                                        scroll='auto',
+                                        controls=[
+                                             managers['notes'].notes_list
+                                        ]
+                                   )
+                              ),
+                              Container(
+                                   on_click=lambda e: managers['notes'].open_note_modal(e),
+                                   bgcolor=colors.BLUE_600,
+                                   height=50,
+                                   width=850,
+                                   border_radius=15,
+                                   alignment=alignment.center,
+                                   content=Text("Добавить заметку", color=colors.WHITE, text_align='center')
                               )
-                         ),
-                         Container(
-                              content=Text(
-                                   "Заметки в корзине автоматически удаляются через 7 дней",
-                                   color=colors.WHITE54,
-                                   text_align='center'
+                         ]
+                    )
+               )
+               return _mynotes
+
+          def build_rubbish_tab():
+               """Построение вкладки корзины"""
+               # Контейнер "Корзина" (без изменений)
+               _rubbish = Container(
+                    width=900,
+                    height=900,
+                    bgcolor=colors.BLACK12,
+                    content=Column(
+                         horizontal_alignment='center',
+                         controls=[
+                              Text('Корзина', size=25, color=colors.WHITE),
+                              Container(
+                                   height=750,
+                                   content=Column(
+                                        scroll='auto',
+                                        controls=[
+                                             managers['notes'].trash_list
+                                        ]
+                                   )
                               ),
-                              padding=10
-                         )
-                    ]
+                              Container(
+                                   content=Text(
+                                        "Заметки в корзине автоматически удаляются через 7 дней",
+                                        color=colors.WHITE54,
+                                        text_align='center'
+                                   ),
+                                   padding=10
+                              )
+                         ]
+                    )
                )
-          )
-
-          # Обновленный контейнер "Аккаунт" с информацией о списках
-          total_notes, trash_notes, active_reminders, total_lists = get_notes_count()
-          _account = Container(
-               width=900,
-               height=900,
-               bgcolor=colors.BLACK12,
-               content=Column(
-                    horizontal_alignment='center',
-                    controls=[
-                         Text('Ваш аккаунт', size=25, color=colors.WHITE),
-                         Container(
-                              width=800,
-                              padding=20,
-                              bgcolor=colors.WHITE10,
-                              border_radius=10,
-                              content=Column([
-                                   Text('Статистика:', size=20, weight=FontWeight.BOLD),
-                                   Text(f'Всего заметок: {total_notes}', size=16),
-                                   Text(f'Заметок в корзине: {trash_notes}', size=16),
-                                   Text(f'Активных напоминаний: {active_reminders}', size=16),
-                                   Text(f'Всего списков: {total_lists}', size=16)
-                              ])
-                         )
-                    ]
+               return _rubbish
+
+          def build_account_tab():
+               """Построение вкладки аккаунта (статистика заполняется при первом открытии)"""
+               # Обновленный контейнер "Аккаунт" с информацией о списках
+               _account = Container(
+                    width=900,
+                    height=900,
+                    bgcolor=colors.BLACK12,
+                    content=Column(
+                         horizontal_alignment='center',
+                         controls=[
+                              Text('Ваш аккаунт', size=25, color=colors.WHITE),
+                              Container(
+                                   width=800,
+                                   padding=20,
+                                   bgcolor=colors.WHITE10,
+                                   border_radius=10,
+                                   content=Column([
+                                        Text('Статистика:', size=20, weight=FontWeight.BOLD),
+                                        Text('Всего заметок: 0', size=16),
+                                        Text('Заметок в корзине: 0', size=16),
+                                        Text('Активных напоминаний: 0', size=16),
+                                        Text('Всего списков: 0', size=16)
+                                   ])
+                              )
+                         ]
+                    )
                )
-          )
+               return _account
+
+          def build_timeline_tab():
+               """Построение вкладки ленты напоминаний"""
+               return managers['timeline'].view
+
+          # Вкладки строятся при первом открытии
+          tab_builders = {
+               'Мои заметки': build_mynotes_tab,
+               'Напоминания': build_timeline_tab,
+               'Списки': build_lists_tab,
+               'Корзина': build_rubbish_tab,
+               'Аккаунт': build_account_tab
+          }
+          tabs = {'Дом': _home}
+          modals = {}
+          # Отписки от шины изменений при закрытии окна
+          subscriptions = []
+
+          def get_tab(name):
+               """Вкладка по названию; при первом обращении она строится"""
+               if name not in tabs:
+                    with timed('startup.build_tab'):
+                         tabs[name] = tab_builders[name]()
+               return tabs[name]
 
           # Контейнер для правой части содержимого
           right_content = Container(
@@ -2216,39 +3660,76 @@ def main(page: Page):
 
           # Функция для обновления правой части содержимого
           def change_content(e):
+               show_tab(e.control.text)
+
+          def show_tab(name):
+               """
+               Показ вкладки по названию
+               Данные вкладки загружаются при первом открытии, дальше ее карточки
+               обновляются по событиям шины изменений
+               """
                try:
-                    if e.control.text == 'Дом':
-                         right_content.content = _home
-                    elif e.control.text == 'Мои заметки':
-                         right_content.content = _mynotes
-                         notes_instance.load_notes()
-                    elif e.control.text == 'Корзина':
-                         right_content.content = _rubbish
-                         notes_instance.load_trash_notes()
+                    if name != 'Дом':
+                         # Вкладкам с данными нужна готовая база
+                         app_ready.wait()
+                    notes_instance = managers.get('notes')
+                    list_manager = managers.get('lists')
+
+                    if name == 'Дом':
+                         right_content.content = get_tab(name)
+                    elif name == 'Мои заметки':
+                         right_content.content = get_tab(name)
+                         if notes_instance.notes_cards.mode is None:
+                              if notes_instance.paint_snapshot():
+                                   # Сначала показываем снимок, затем сверяем его с базой в фоне
+                                   page.update()
+                                   threading.Thread(target=notes_instance.reconcile_snapshot, daemon=True).start()
+                                   return
+                              notes_instance.load_notes()
+                    elif name == 'Напоминания':
+                         right_content.content = get_tab(name)
+                         # Границы интервалов сдвигаются со временем, поэтому лента пересчитывается
+                         managers['timeline'].refresh()
+                    elif name == 'Корзина':
+                         right_content.content = get_tab(name)
+                         if notes_instance.trash_cards.mode is None:
+                              notes_instance.load_trash_notes()
                          notes_instance.cleanup_old_notes()
-                    elif e.control.text == 'Списки':
-                         right_content.content = _lists
-                         list_manager.load_lists()  # Загрузка списков
-                    elif e.control.text == 'Аккаунт':
-                         # Обновляем статистику при открытии
-                         total_notes, trash_notes, active_reminders, total_lists = get_notes_count()
-                         _account.content.controls[1].content.controls[1].value = f'Всего заметок: {total_notes}'
-                         _account.content.controls[1].content.controls[2].value = f'Заметок в корзине: {trash_notes}'
-                         _account.content.controls[1].content.controls[
-                              3].value = f'Активных напоминаний: {active_reminders}'
-                         _account.content.controls[1].content.controls[4].value = f'Всего списков: {total_lists}'
-                         right_content.content = _account
+                    elif name == 'Списки':
+                         right_content.content = get_tab(name)
+                         if list_manager.cards.mode is None:
+                              list_manager.load_lists()  # Загрузка списков
+                    elif name == 'Аккаунт':
+                         first_open = name not in tabs
+                         right_content.content = get_tab(name)
+                         if first_open:
+                              refresh_stats()
 
                     page.update()
                except Exception as e:
-                    snack_bar = SnackBar(
-                         content=Text(f"Ошибка при смене контента: {e}"),
-                         duration=3000
-                    )
-                    page.overlay.append(snack_bar)
-                    page.update()
-                    snack_bar.open = True
-                    page.update()
+                    show_error(f"Ошибка при смене контента: {e}")
+
+          def open_search_hit(hit):
+               """Переход от результата глобального поиска к заметке или списку"""
+               if hit.kind == 'note':
+                    show_tab('Мои заметки')
+                    managers['notes'].edit_note(hit.id)
+               else:
+                    show_tab('Списки')
+                    managers['lists'].edit_list(hit.list_id)
+                    # Во всплывающем окне открывается вкладка "Список"
+                    modals['list'].content.content.controls[0].selected_index = 1
+                    page.open(modals['list'])
+
+          def run_global_search(e):
+               """Результаты глобального поиска занимают правую часть окна"""
+               app_ready.wait()
+               global_search.perform_search()
+               right_content.content = global_search.view
+               page.update()
+
+          global_search = GlobalSearch(page, open_search_hit)
+          global_search.search_input.on_change = run_global_search
 
           # Главный контейнер
           _c = Container(
@@ -2270,6 +3751,10 @@ def main(page: Page):
                                                   [Image(src='Frame 5.png'),
                                                    Text('MyNote', color=colors.WHITE, size=20)])
                                         ),
+                                        Container(
+                                             margin=margin.only(left=20, bottom=10),
+                                             content=global_search.search_input
+                                        ),
                                         Container(
                                              margin=margin.only(top=10, left=20),
                                              content=CupertinoFilledButton(
@@ -2292,6 +3777,17 @@ def main(page: Page):
                                                   on_click=change_content
                                              )
                                         ),
+                                        Container(
+                                             margin=margin.only(top=5, left=20),
+                                             content=CupertinoFilledButton(
+                                                  text='Напоминания',
+                                                  icon=icons.ALARM,
+                                                  width=250,
+                                                  height=50,
+                                                  padding=padding.only(right=40),
+                                                  on_click=change_content
+                                             )
+                                        ),
                                         Container(
                                              margin=margin.only(top=5, left=20),
                                              content=CupertinoFilledButton(
@@ -2336,11 +3832,31 @@ def main(page: Page):
           # Добавление главного контейнера на страницу
           page.add(_c)
 
-          # Добавляем модальное окно в overlay
-          page.overlay.append(list_modal)
+          # Оболочка окна показана; вкладки с данными станут доступны после finish_startup
+          first_paint = (time.perf_counter() - startup_started) * 1000
+          instrumentation.record('startup.first_paint', first_paint)
+          print(f"Окно показано через {first_paint:.0f} мс "
+                f"({(time.perf_counter() - PROCESS_STARTED) * 1000:.0f} мс с запуска процесса)")
+
+          # Отладочная панель производительности
+          perf_overlay = PerfOverlay(page)
+          perf_overlay.attach()
+          page.on_keyboard_event = perf_overlay.handle_keyboard
+          if options.perf_overlay:
+               perf_overlay.toggle()
+
+          def on_disconnect(e):
+               for unsubscribe in subscriptions:
+                    unsubscribe()
+               if 'notes' in managers:
+                    managers['notes'].save_snapshot()
+                    managers['notes'].close()
+               changes.feed.stop()
 
-          # ВАЖНО: Загрузка начальных заметок
-          notes_instance.load_notes()
+          page.on_disconnect = on_disconnect
+
+          # Остальная инициализация идет в фоне
+          threading.Thread(target=finish_startup, name='mynote-startup', daemon=True).start()
 
      except Exception as ex:
           snack_bar = SnackBar(content=Text(f"Критическая ошибка: {ex}"))
@@ -2351,4 +3867,18 @@ def main(page: Page):
 
 
 if __name__ == "__main__":
+     launch_options = parse_args()
+     if launch_options.metrics:
+          instrumentation.enable()
+     if instrumentation.is_enabled():
+          instrumentation.start_export(launch_options.metrics_file, port=launch_options.metrics_port)
+     if launch_options.memprofile:
+          from memprofile import MemoryProfiler
+          memory_profiler = MemoryProfiler(
+               report_path=launch_options.memprofile_report,
+               interval=launch_options.memprofile_interval,
+               top=launch_options.memprofile_top
+          )
+          memory_profiler.start()
+          atexit.register(memory_profiler.stop)
      app(target=main)
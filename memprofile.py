@@ -0,0 +1,219 @@
+"""
+Профилирование памяти MyNote через tracemalloc
+
+Режим включается флагом запуска --memprofile. Профилировщик периодически
+снимает снимки памяти и дописывает в отчет:
+- разницу с предыдущим снимком по местам выделения памяти (топ N строк кода);
+- общий объем отслеживаемой памяти и RSS процесса;
+- число элементов управления в каждом наблюдаемом представлении по типам;
+- число живых объектов Flet в процессе.
+
+Рядом с текстовым отчетом пишется JSONL со сводными числами по каждому
+снимку, чтобы проверять, что память остается ровной после часов работы.
+"""
+import gc
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import instrumentation
+
+# Кадры, которые не интересны в отчете
+_IGNORED_FILES = (
+    tracemalloc.__file__,
+    '<frozen importlib._bootstrap>',
+    '<frozen importlib._bootstrap_external>',
+    '<unknown>',
+)
+
+
+def _walk_controls(root):
+    """
+    Обход дерева элементов управления
+    """
+    pending = [root]
+    while pending:
+        item = pending.pop()
+        yield item
+        get_children = getattr(item, '_get_children', None)
+        if get_children:
+            pending.extend(child for child in get_children() if child is not None)
+
+
+def _flet_object_counts():
+    """
+    Количество живых объектов Flet по типам
+    """
+    counts = Counter()
+    for obj in gc.get_objects():
+        module = getattr(type(obj), '__module__', '') or ''
+        if module.startswith('flet'):
+            counts[type(obj).__name__] += 1
+    return counts
+
+
+class MemoryProfiler:
+    """
+    Периодические снимки tracemalloc с отчетом о разнице
+    """
+
+    def __init__(self, report_path='memory_report.txt', interval=300, top=15, frames=10):
+        self.report_path = report_path
+        self.summary_path = os.path.splitext(report_path)[0] + '.jsonl'
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.views = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.started_at = None
+        self.baseline = None
+        self.previous = None
+        self.previous_views = {}
+        self.previous_objects = Counter()
+        self.snapshots = 0
+        self._lock = threading.Lock()
+
+    def watch_view(self, name, root):
+        """
+        Регистрация представления; root - элемент или функция, возвращающая элемент
+        """
+        self.views[name] = root
+
+    def start(self):
+        """
+        Запуск tracemalloc и потока периодических снимков
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.started_at = time.time()
+        self.baseline = self._take_snapshot()
+        self.previous = self.baseline
+        self.previous_objects = _flet_object_counts()
+
+        with open(self.report_path, 'a', encoding='utf-8') as f:
+            f.write(f"=== Профилирование памяти MyNote, pid {os.getpid()}, "
+                    f"{datetime.now().isoformat(timespec='seconds')} ===\n")
+            f.write(f"Интервал снимков: {self.interval} с, топ: {self.top}, кадров: {self.frames}\n\n")
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Финальный снимок и остановка профилирования
+        """
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        if tracemalloc.is_tracing():
+            self.report()
+            tracemalloc.stop()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.report()
+            except Exception as e:
+                print(f"Ошибка при снятии снимка памяти: {e}")
+
+    def _take_snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces([
+            tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES
+        ])
+
+    def _view_counts(self):
+        """
+        Число элементов в каждом представлении по типам
+        """
+        result = {}
+        for name, root in self.views.items():
+            control = root() if callable(root) else root
+            if control is None:
+                continue
+            if isinstance(control, list):
+                counts = Counter()
+                for item in control:
+                    counts.update(type(c).__name__ for c in _walk_controls(item))
+            else:
+                counts = Counter(type(c).__name__ for c in _walk_controls(control))
+            result[name] = counts
+        return result
+
+    def report(self):
+        """
+        Снимок памяти и запись разницы в отчет
+        """
+        with self._lock:
+            snapshot = self._take_snapshot()
+            self.snapshots += 1
+            current, peak = tracemalloc.get_traced_memory()
+            rss = instrumentation.process_rss()
+            elapsed = time.time() - self.started_at
+
+            top_stats = snapshot.compare_to(self.previous, 'lineno')[:self.top]
+            baseline_diff = sum(stat.size_diff for stat in snapshot.compare_to(self.baseline, 'filename'))
+            views = self._view_counts()
+            objects = _flet_object_counts()
+
+            lines = [
+                f"--- Снимок {self.snapshots}: {datetime.now().isoformat(timespec='seconds')}, "
+                f"прошло {elapsed / 60:.1f} мин ---",
+                f"tracemalloc: текущая {current / 1024:.1f} КБ, пик {peak / 1024:.1f} КБ, "
+                f"от начала {baseline_diff / 1024:+.1f} КБ",
+                f"RSS: {rss / (1024 * 1024):.1f} МБ" if rss else "RSS: н/д",
+                "",
+                f"Топ {self.top} мест выделения памяти относительно прошлого снимка:",
+            ]
+            for stat in top_stats:
+                frame = stat.traceback[0]
+                lines.append(
+                    f"  {stat.size_diff / 1024:+10.1f} КБ {stat.count_diff:+8} объектов  "
+                    f"{frame.filename}:{frame.lineno}"
+                )
+
+            lines.append("")
+            lines.append("Элементы в представлениях:")
+            for name, counts in views.items():
+                total = sum(counts.values())
+                previous_total = sum(self.previous_views.get(name, Counter()).values())
+                lines.append(f"  {name}: {total} ({total - previous_total:+})")
+                diff = counts.copy()
+                diff.subtract(self.previous_views.get(name, Counter()))
+                for type_name, delta in sorted(diff.items(), key=lambda item: -abs(item[1]))[:5]:
+                    if delta:
+                        lines.append(f"      {type_name}: {counts[type_name]} ({delta:+})")
+
+            lines.append("")
+            lines.append("Живые объекты Flet (изменение относительно прошлого снимка):")
+            object_diff = objects.copy()
+            object_diff.subtract(self.previous_objects)
+            changed = [(name, delta) for name, delta in object_diff.items() if delta]
+            for type_name, delta in sorted(changed, key=lambda item: -abs(item[1]))[:self.top]:
+                lines.append(f"  {type_name}: {objects[type_name]} ({delta:+})")
+            if not changed:
+                lines.append("  без изменений")
+
+            with open(self.report_path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n\n')
+
+            with open(self.summary_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    'snapshot': self.snapshots,
+                    'timestamp': datetime.now().isoformat(timespec='seconds'),
+                    'elapsed_s': round(elapsed, 1),
+                    'traced_bytes': current,
+                    'traced_peak_bytes': peak,
+                    'rss_bytes': rss,
+                    'views': {name: sum(counts.values()) for name, counts in views.items()},
+                    'flet_objects': sum(objects.values()),
+                }, ensure_ascii=False) + '\n')
+
+            self.previous = snapshot
+            self.previous_views = views
+            self.previous_objects = objects
@@ -0,0 +1,298 @@
+"""
+Напоминания MyNote: выборки заметок по времени напоминания
+
+Ожидающее напоминание срабатывает в FIRE_TIME: в reminder_time или, если
+напоминание отложено, в reminder_snoozed_until. Отправленное напоминание
+отмечается reminder_fired_at. Ожидающие напоминания (PENDING) читаются по
+частичному индексу FIRE_TIME, поэтому условия запросов должны совпадать с
+выражениями индекса дословно.
+
+Лента напоминаний делится на интервалы (сегодня, на этой неделе, позже).
+Каждый интервал читается отдельным запросом по диапазону этого индекса
+порциями по TIMELINE_PAGE строк: следующая порция начинается после последней
+показанной строки (время срабатывания, id), поэтому ни одна выборка не
+просматривает все заметки.
+
+Повторяющееся напоминание хранит правило в reminder_rule, а в reminder_time -
+заранее вычисленное следующее срабатывание. После срабатывания планировщик
+переносит reminder_time на следующее (next_occurrence), поэтому выборка
+наступивших напоминаний остается диапазоном того же индекса при любом числе
+повторяющихся напоминаний.
+
+Наступившие за одну проверку напоминания (и те, что наступят в ближайшие
+COALESCE_WINDOW секунд) отправляются вместе: если их больше
+COALESCE_THRESHOLD, вместо отдельных уведомлений отправляется одно сводное с
+их числом и первыми заголовками (coalesce). Так после выхода из сна рабочий
+стол не заваливается уведомлениями, а поток проверки не ждет каждое из них.
+
+Здоровье доставки (DeliveryStats): задержка между временем срабатывания и
+фактической отправкой, длительность проверки и время вызова системы
+уведомлений. Напоминания, отправленные раньше срока (их подтягивает
+COALESCE_WINDOW), записываются отдельно - в гистограмму опережения
+reminders.early, а не нулевой задержкой. Гистограммы собираются всегда, попадают в экспорт метрик и
+сохраняются сводкой в STATS_PATH; опоздание больше LAG_ALERT секунд
+записывается в журнал предупреждением.
+"""
+import calendar
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import instrumentation
+
+# Время срабатывания и условие ожидающего напоминания (idx_notes_pending_reminder)
+FIRE_TIME = 'coalesce(reminder_snoozed_until, reminder_time)'
+PENDING = 'completed = 0 AND reminder_fired_at IS NULL'
+
+# Объединение уведомлений: сводное уведомление, если наступило больше
+# COALESCE_THRESHOLD напоминаний; в нем COALESCE_TITLES заголовков. Напоминания,
+# наступающие в ближайшие COALESCE_WINDOW секунд, отправляются с текущими
+COALESCE_THRESHOLD = 3
+COALESCE_TITLES = 3
+COALESCE_WINDOW = 10
+
+# Строк в одной порции интервала ленты
+TIMELINE_PAGE = 50
+
+# Интервалы ленты по порядку
+TIMELINE_BUCKETS = ('today', 'week', 'later')
+
+
+def bucket_bounds(now=None):
+    """
+    Границы интервалов ленты во времени Unix: {интервал: (начало, конец)}
+    Начало включается, конец нет; None - граница не задана. В "сегодня"
+    попадают и пропущенные напоминания, неделя заканчивается в понедельник
+    """
+    now = now or datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    next_week = datetime.combine(now.date() + timedelta(days=7 - now.weekday()), datetime.min.time())
+    tomorrow_time = int(tomorrow.timestamp())
+    next_week_time = int(next_week.timestamp())
+    return {
+        'today': (None, tomorrow_time),
+        'week': (tomorrow_time, max(tomorrow_time, next_week_time)),
+        'later': (max(tomorrow_time, next_week_time), None),
+    }
+
+
+def _range_condition(start, end):
+    sql = f'{PENDING} AND {FIRE_TIME} IS NOT NULL'
+    params = []
+    if start is not None:
+        sql += f' AND {FIRE_TIME} >= ?'
+        params.append(start)
+    if end is not None:
+        sql += f' AND {FIRE_TIME} < ?'
+        params.append(end)
+    return sql, params
+
+
+def count_bucket(conn, start, end):
+    """
+    Число напоминаний в интервале (только по индексу)
+    """
+    sql, params = _range_condition(start, end)
+    with instrumentation.timed('reminders.count_bucket'):
+        return conn.execute(f'SELECT count(*) FROM notes WHERE {sql}', params).fetchone()[0]
+
+
+def fetch_bucket(conn, start, end, after=None, limit=TIMELINE_PAGE):
+    """
+    Порция напоминаний интервала по времени: строки (id, title, время срабатывания)
+    after - (время срабатывания, id) последней уже загруженной строки
+    """
+    sql, params = _range_condition(start, end)
+    if after is not None:
+        sql += f' AND ({FIRE_TIME}, id) > (?, ?)'
+        params.extend(after)
+    with instrumentation.timed('reminders.fetch_bucket'):
+        return conn.execute(f'''
+            SELECT id, title, {FIRE_TIME} FROM notes
+            WHERE {sql}
+            ORDER BY {FIRE_TIME}, id
+            LIMIT ?
+        ''', [*params, limit]).fetchall()
+
+
+# Правила повторения: 'daily', 'weekly', 'monthly:<день месяца>', 'every:<минуты>'
+REPEAT_KINDS = ('daily', 'weekly', 'monthly', 'every')
+
+
+def make_rule(kind, first_time, interval_minutes=None):
+    """
+    Правило повторения для напоминания, впервые срабатывающего в first_time
+    Ежемесячное правило запоминает день месяца: в коротких месяцах напоминание
+    срабатывает в последний день, а затем возвращается к исходному дню
+    """
+    if kind == 'monthly':
+        return f'monthly:{datetime.fromtimestamp(first_time).day}'
+    if kind == 'every':
+        if not interval_minutes or interval_minutes < 1:
+            raise ValueError("Интервал повтора должен быть не меньше минуты")
+        return f'every:{int(interval_minutes)}'
+    if kind in REPEAT_KINDS:
+        return kind
+    raise ValueError(f"Неизвестное правило повторения: {kind}")
+
+
+def parse_rule(rule):
+    """
+    Вид правила и его число (день месяца или минуты; None для остальных)
+    """
+    kind, _, value = rule.partition(':')
+    return kind, int(value) if value else None
+
+
+def _add_months(moment, months, day):
+    year, month = divmod(moment.month - 1 + months, 12)
+    year += moment.year
+    month += 1
+    return moment.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(rule, previous, now):
+    """
+    Первое срабатывание правила позже now, отсчитанное от срабатывания previous
+    Пропущенные срабатывания (приложение было закрыто) не повторяются; дни,
+    недели и месяцы считаются по местному времени
+    """
+    kind, value = parse_rule(rule)
+    if kind == 'every':
+        step = value * 60
+        if previous > now:
+            return previous
+        return previous + ((now - previous) // step + 1) * step
+
+    moment = datetime.fromtimestamp(previous)
+    current = datetime.fromtimestamp(now)
+    if kind == 'monthly':
+        months = max(0, (current.year - moment.year) * 12 + current.month - moment.month)
+        candidate = _add_months(moment, months, value)
+        while int(candidate.timestamp()) <= now:
+            months += 1
+            candidate = _add_months(moment, months, value)
+        return int(candidate.timestamp())
+
+    days = 7 if kind == 'weekly' else 1
+    skipped = max(0, (current.date() - moment.date()).days // days)
+    candidate = moment + timedelta(days=skipped * days)
+    while int(candidate.timestamp()) <= now:
+        candidate += timedelta(days=days)
+    return int(candidate.timestamp())
+
+
+def coalesce(due, threshold=COALESCE_THRESHOLD, titles=COALESCE_TITLES):
+    """
+    Уведомления для наступивших напоминаний: список (заголовок, текст, напоминания)
+    due - строки напоминаний, у которых [1] - заголовок, [2] - текст заметки,
+    в порядке важности. Если их больше threshold, получается одно сводное
+    уведомление со всеми напоминаниями; иначе по уведомлению на напоминание
+    """
+    if len(due) <= threshold:
+        return [(f"Напоминание: {row[1]}", row[2], [row]) for row in due]
+    shown = ', '.join(row[1] or "Без названия" for row in due[:titles])
+    rest = len(due) - titles
+    if rest > 0:
+        shown += f" и еще {rest}"
+    return [(f"Напоминаний: {len(due)}", shown, list(due))]
+
+
+# Границы корзин гистограммы задержки срабатывания, мс: от 0,1 секунды до часа
+LAG_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000, 900000, 3600000)
+
+# Допустимая задержка срабатывания, секунды; больше - предупреждение в журнале
+LAG_ALERT = 120
+
+# Сводка здоровья доставки напоминаний
+STATS_PATH = 'reminder_stats.json'
+
+
+class DeliveryStats:
+    """
+    Здоровье доставки напоминаний: гистограммы задержки срабатывания
+    (reminders.lag), опережения срока (reminders.early), длительности проверки
+    (reminders.scan) и вызова системы уведомлений (reminders.notify), число
+    опоздавших и отправленных раньше срока напоминаний
+    Гистограммы берутся из общего реестра instrumentation при каждом обращении,
+    поэтому instrumentation.reset() не отрывает их от экспорта метрик
+    """
+
+    def __init__(self, lag_alert=LAG_ALERT, path=STATS_PATH):
+        self.lag_alert = lag_alert
+        self.path = path
+        self.late = 0
+        self.early = 0
+        self.last_alert = None
+        self._lock = threading.Lock()
+
+    @property
+    def lag(self):
+        return instrumentation.histogram('reminders.lag', LAG_BUCKETS_MS)
+
+    @property
+    def early_by(self):
+        return instrumentation.histogram('reminders.early', LAG_BUCKETS_MS)
+
+    @property
+    def scan(self):
+        return instrumentation.histogram('reminders.scan')
+
+    @property
+    def notify(self):
+        return instrumentation.histogram('reminders.notify')
+
+    def observe_lags(self, lags):
+        """
+        Запись задержек отправленных напоминаний (секунды)
+        Отрицательная задержка - отправка раньше срока: она записывается
+        опережением в reminders.early, а не нулевой задержкой
+        Возвращает текст предупреждения, если кто-то опоздал больше lag_alert, иначе None
+        """
+        early = 0
+        for lag in lags:
+            if lag < 0:
+                self.early_by.observe(-lag * 1000)
+                early += 1
+            else:
+                self.lag.observe(lag * 1000)
+        if early:
+            instrumentation.count('reminders.early', early)
+            with self._lock:
+                self.early += early
+        late = [lag for lag in lags if lag > self.lag_alert]
+        if not late:
+            return None
+        message = (f"Напоминаний с опозданием: {len(late)}, задержка до {max(late):.0f} с "
+                   f"(допустимо {self.lag_alert} с)")
+        with self._lock:
+            self.late += len(late)
+            self.last_alert = {'time': datetime.now().isoformat(timespec='seconds'), 'message': message}
+        return message
+
+    def snapshot(self):
+        with self._lock:
+            late, early, last_alert = self.late, self.early, self.last_alert
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'lag_alert_s': self.lag_alert,
+            'late': late,
+            'early': early,
+            'last_alert': last_alert,
+            'histograms': {
+                'reminders.lag': self.lag.snapshot(),
+                'reminders.early': self.early_by.snapshot(),
+                'reminders.scan': self.scan.snapshot(),
+                'reminders.notify': self.notify.snapshot(),
+            },
+        }
+
+    def write(self):
+        """
+        Запись сводки в файл (атомарно через временный файл)
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,707 @@
+"""
+Поиск и фильтрация заметок и списков MyNote
+
+Поиск возвращает кортеж id в порядке отображения; карточки строятся по этим
+id отдельным запросом. Списки id хранятся в LRU кэше по ключу
+(query, priority, color, sort, date_range). Кэш сбрасывается, как только меняется
+поколение записи базы (database.write_generation), поэтому повторный поиск
+отвечает из памяти и никогда не возвращает устаревший результат.
+
+Без текста запроса каждое сочетание порядка и фильтров читает строки из
+индекса уже упорядоченными; фильтры по столбцам, не задающим порядок,
+проверяются по строкам. sort_plan_problems проверяет это по планам запросов.
+С текстом запроса порядок получают сортировкой отобранных кандидатов.
+
+Поиск подстроки сначала отбирает кандидатов по индексу триграмм FTS5
+(notes_fts, lists_fts), а затем проверяет их тем же условием LIKE, что и
+раньше, поэтому результат совпадает с полным просмотром таблицы. Запросы
+короче трех символов и запросы с шаблонами LIKE идут без индекса.
+
+Нечеткий поиск (sort='relevance') допускает опечатки в словах запроса и
+упорядочивает заметки по качеству совпадения, затем по дате создания.
+
+Глобальный поиск (search_all) одним запросом к общему словарному индексу
+находит заметки, списки и элементы списков и возвращает типизированные
+результаты: лучшие по релевантности (bm25) в каждом типе.
+
+Для первых результатов поиска движок строит фрагменты текста вокруг
+совпадений с отмеченными найденными местами (FTS5 snippet/highlight),
+чтобы карточка не показывала и не загружала весь текст заметки.
+
+При наборе запроса по буквам результат может только сужаться: если новый
+запрос содержит предыдущий, а фильтры не менялись, движок отбирает подходящие
+id из прошлого результата в памяти, не обращаясь к базе. Запрос к базе
+читает только id; первая добавленная буква проверяется условием LIKE по
+первичному ключу для id прошлого результата (не больше NARROW_MAX_IDS) и
+заодно читает текст совпавших строк в регистре lower(). Если этот текст
+умещается в NARROW_MAX_CHARS, следующие буквы сужают результат в памяти.
+"""
+import json
+import re
+import string
+import threading
+from collections import OrderedDict, namedtuple
+
+import database
+import fuzzy
+import instrumentation
+
+# Количество запоминаемых результатов поиска
+RESULT_CACHE_SIZE = 128
+
+# Наибольший объем текста прошлого результата (символов), который хранится для сужения в памяти
+NARROW_MAX_CHARS = 2_000_000
+
+# Наибольшее число строк прошлого результата, которые сужаются при наборе запроса;
+# больший результат сужается обычным запросом через индекс триграмм
+NARROW_MAX_IDS = 5000
+
+# Индексы триграмм по таблицам и минимальная длина запроса для них
+TRIGRAM_INDEXES = {
+    'notes': 'notes_fts',
+    'lists': 'lists_fts',
+}
+TRIGRAM_MIN_QUERY = 3
+
+# Маркеры начала и конца совпадения во фрагментах
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+# Фрагменты строятся только для первых результатов
+SNIPPET_ROWS = 200
+# Длина фрагмента: в триграммах (примерно символах) и в словах
+SNIPPET_TRIGRAMS = 64
+SNIPPET_WORDS = 16
+# Окно фрагмента без индекса: символов до совпадения и всего
+SNIPPET_BEFORE = 60
+SNIPPET_WINDOW = 160
+
+# Глобальный поиск: число результатов каждого типа и вес заголовка относительно текста
+# (bm25 предпочитает короткие строки, и без ограничения по типам элементы
+# списков вытесняли бы заметки)
+GLOBAL_RESULTS_PER_KIND = 20
+GLOBAL_TITLE_WEIGHT = 2.0
+
+# Результат глобального поиска: kind - 'note', 'list' или 'item'; list_id -
+# список, к которому относится элемент; title и text содержат маркеры совпадений
+SearchHit = namedtuple('SearchHit', 'kind id list_id title text')
+
+# Порядок выдачи по ключу сортировки; id в конце делает порядок однозначным
+# при любом плане запроса и совпадает с порядком строк внутри индекса
+# Для каждого порядка в базе есть индекс (completed, ...) и (completed, priority, ...)
+NOTE_SORTS = {
+    'created': 'created DESC, id DESC',
+    'title': 'title ASC, id ASC',
+    'priority': 'priority DESC, created DESC, id DESC',
+    'reminder': 'reminder_time IS NULL, reminder_time ASC, id ASC',
+}
+LIST_SORTS = {
+    'created': 'created DESC, id DESC',
+    'title': 'title ASC, id ASC',
+    'priority': 'priority DESC, created DESC, id DESC',
+}
+
+# Порядок напоминаний внутри диапазона дат: все строки с напоминанием, и без
+# постоянного ключа (reminder_time IS NULL) планировщик читает индекс по порядку
+REMINDER_RANGE_SORT = 'reminder_time ASC, id ASC'
+
+# Столбец первого ключа сортировки
+SORT_COLUMNS = {
+    'created': 'created',
+    'title': 'title',
+    'priority': 'priority',
+    'reminder': 'reminder_time',
+}
+
+# Поля фильтра заметок по датам
+DATE_FIELDS = {
+    'created': 'created',
+    'reminder': 'reminder_time',
+}
+
+
+class ResultCache:
+    """
+    LRU кэш списков id, действительный в пределах одного поколения записи
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.generation = database.write_generation()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _check_generation(self):
+        generation = database.write_generation()
+        if generation != self.generation:
+            self.entries.clear()
+            self.generation = generation
+
+    def get(self, key):
+        """
+        Список id по ключу или None
+        """
+        with self._lock:
+            self._check_generation()
+            ids = self.entries.get(key)
+            if ids is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return ids
+
+    def put(self, key, ids, generation):
+        """
+        Сохранение результата запроса, начатого в поколении generation
+        Если за время запроса данные изменились, результат не сохраняется
+        """
+        with self._lock:
+            self._check_generation()
+            if generation != self.generation:
+                return
+            self.entries[key] = ids
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+result_cache = ResultCache()
+
+
+def _text_condition(text_columns):
+    """
+    Условие поиска подстроки по текстовым столбцам (параметр - шаблон LIKE на каждый столбец)
+    """
+    return '(' + ' OR '.join(f'lower({column.strip()}) LIKE ?' for column in text_columns.split(',')) + ')'
+
+
+# Регистр в LIKE не различается только для латиницы, как и в lower() SQLite
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _text_columns_sql(text_columns):
+    # Текстовые столбцы в регистре, в котором их сравнивает условие поиска
+    return ', '.join(f'lower({column.strip()})' for column in text_columns.split(','))
+
+
+class NarrowingState:
+    """
+    Последний результат текстового поиска для сужения при наборе запроса
+    haystacks - текст строк результата по id (None, если он не уместился в памяти)
+    """
+
+    def __init__(self, filters, query, ids, generation, text_columns, haystacks=None):
+        self.filters = filters
+        self.query = query
+        self.ids = ids
+        self.generation = generation
+        self.text_columns = text_columns
+        self.haystacks = haystacks
+
+    def can_narrow(self, filters, query):
+        """
+        Новый запрос сужает этот результат: те же фильтры, данные не менялись,
+        а предыдущий запрос является подстрокой нового
+        """
+        return (
+            self.filters == filters
+            and self.generation == database.write_generation()
+            and self.query in query
+            and not _has_wildcards(query)
+        )
+
+    def narrow(self, conn, kind, query):
+        """
+        Прошлый результат, отфильтрованный новым запросом тем же условием LIKE
+        Текст берется из памяти; если его там нет, строки проверяются по
+        первичному ключу только для id прошлого результата, а текст совпавших
+        запоминается, пока умещается в NARROW_MAX_CHARS
+        """
+        if self.haystacks is not None:
+            needle = query.translate(_ASCII_LOWER)
+            haystacks = {
+                row_id: fields for row_id, fields in self.haystacks.items()
+                if any(field is not None and needle in field for field in fields)
+            }
+            ids = tuple(row_id for row_id in self.ids if row_id in haystacks)
+            return NarrowingState(self.filters, query, ids, self.generation, self.text_columns, haystacks)
+
+        pattern = f'%{query}%'
+        columns = self.text_columns.split(',')
+        rows = conn.execute(f'''
+            SELECT id, {_text_columns_sql(self.text_columns)} FROM {kind}
+            WHERE id IN (SELECT value FROM json_each(?)) AND {_text_condition(self.text_columns)}
+        ''', [json.dumps(self.ids)] + [pattern] * len(columns)).fetchall()
+        haystacks = {row[0]: row[1:] for row in rows}
+        ids = tuple(row_id for row_id in self.ids if row_id in haystacks)
+        size = sum(len(field) for fields in haystacks.values() for field in fields if field is not None)
+        if size > NARROW_MAX_CHARS:
+            haystacks = None
+        return NarrowingState(self.filters, query, ids, self.generation, self.text_columns, haystacks)
+
+
+def _has_wildcards(query):
+    # % и _ в LIKE - шаблоны, а не символы подстроки
+    return '%' in query or '_' in query
+
+
+def _trigram_filter(conn, table, query):
+    """
+    Условие отбора кандидатов по индексу триграмм и его параметр
+    None, если индекс не поможет или его нет в базе
+    """
+    index = TRIGRAM_INDEXES[table]
+    if len(query) < TRIGRAM_MIN_QUERY or _has_wildcards(query) or not database.table_exists(conn, index):
+        return None
+    # Запрос целиком - одна фраза: триграммы должны идти подряд, как в подстроке
+    phrase = '"' + query.replace('"', '""') + '"'
+    return f' AND id IN (SELECT rowid FROM {index} WHERE {index} MATCH ?)', phrase
+
+
+def _completed_column(trigram):
+    # С индексом триграмм выборку ведут его кандидаты: "+" не дает планировщику
+    # перебирать все активные строки по индексу (completed, ...)
+    return '+completed' if trigram else 'completed'
+
+
+# Состояние сужения по видам записей ('notes', 'lists')
+_narrowing = {}
+_narrowing_lock = threading.Lock()
+
+
+def _search_ids(kind, key, query, conn, sql, params, text_columns):
+    """
+    Id результата: из кэша, сужением прошлого результата или запросом к базе
+    """
+    ids = result_cache.get(key)
+    if ids is not None:
+        instrumentation.record('search.cache_hit', 0)
+        return ids
+
+    filters = key[2:]
+    generation = database.write_generation()
+
+    with _narrowing_lock:
+        state = _narrowing.get(kind)
+    if state is not None and state.can_narrow(filters, query):
+        with instrumentation.timed('search.narrow'):
+            state = state.narrow(conn, kind, query)
+        with _narrowing_lock:
+            _narrowing[kind] = state
+        result_cache.put(key, state.ids, generation)
+        return state.ids
+
+    with instrumentation.timed('search.query'):
+        ids = tuple(row[0] for row in conn.execute(sql, params).fetchall())
+    result_cache.put(key, ids, generation)
+
+    # Сужать можно только результат текстового запроса, который продолжит следующая буква
+    state = None
+    if query and not _has_wildcards(query) and len(ids) <= NARROW_MAX_IDS:
+        state = NarrowingState(filters, query, ids, generation, text_columns)
+    with _narrowing_lock:
+        _narrowing[kind] = state
+    return ids
+
+
+def _date_range_filter(date_range, sort):
+    """
+    Условие фильтра по датам и его параметры
+    date_range - (поле из DATE_FIELDS, начало, конец): время Unix, конец не
+    включается, любая граница может быть None
+    """
+    if date_range is None:
+        return '', []
+    field, start, end = date_range
+    column = DATE_FIELDS[field]
+    sql = ''
+    if column != SORT_COLUMNS.get(sort):
+        # Строки читаются из индекса порядка сортировки, а даты проверяются по
+        # строкам: "+" не дает планировщику выбрать индекс дат и сортировать итог
+        column = f'+{column}'
+    elif column == 'reminder_time':
+        # Индекс порядка напоминаний начинается с (reminder_time IS NULL);
+        # для диапазона это выражение постоянно (см. REMINDER_RANGE_SORT)
+        sql += ' AND (reminder_time IS NULL) = 0'
+    params = []
+    if start is not None:
+        sql += f' AND {column} >= ?'
+        params.append(start)
+    if end is not None:
+        sql += f' AND {column} < ?'
+        params.append(end)
+    return sql, params
+
+
+def _note_query(conn, query, priority, color, sort, date_range):
+    """
+    Запрос id активных заметок и его параметры
+    Без текста запроса строки читаются из индекса в нужном порядке; с индексом
+    триграмм порядок получают сортировкой его кандидатов
+    """
+    text_columns = 'title, content'
+    trigram = _trigram_filter(conn, 'notes', query) if query else None
+    sql = f'SELECT id FROM notes WHERE {_completed_column(trigram)} = 0'
+    params = []
+
+    if query:
+        sql += f' AND {_text_condition(text_columns)}'
+        params.extend([f'%{query}%', f'%{query}%'])
+
+        if trigram:
+            sql += trigram[0]
+            params.append(trigram[1])
+
+    if priority is not None:
+        sql += ' AND priority = ?'
+        params.append(priority)
+
+    if color is not None:
+        sql += ' AND color = ?'
+        params.append(color)
+
+    date_sql, date_params = _date_range_filter(date_range, sort)
+    sql += date_sql
+    params.extend(date_params)
+
+    if sort == 'reminder' and date_range is not None and date_range[0] == 'reminder':
+        sql += f' ORDER BY {REMINDER_RANGE_SORT}'
+    elif sort in NOTE_SORTS:
+        sql += f' ORDER BY {NOTE_SORTS[sort]}'
+
+    return sql, params, text_columns
+
+
+def search_notes(conn, query='', priority=None, color=None, sort='created', date_range=None):
+    """
+    Id активных заметок, подходящих под запрос и фильтры
+    """
+    key = ('notes', query, priority, color, sort, date_range)
+    sql, params, text_columns = _note_query(conn, query, priority, color, sort, date_range)
+    return _search_ids('notes', key, query, conn, sql, params, text_columns)
+
+
+def search_notes_fuzzy(conn, query, priority=None, color=None, date_range=None):
+    """
+    Id активных заметок по запросу с возможными опечатками
+    Сначала заметки, где все слова найдены без опечаток, затем с одной
+    и с двумя; внутри уровня - более новые выше
+    """
+    key = ('notes', query, priority, color, 'relevance', date_range)
+    ids = result_cache.get(key)
+    if ids is not None:
+        instrumentation.record('search.cache_hit', 0)
+        return ids
+
+    words = fuzzy.tokenize(query)
+    if not words or not database.table_exists(conn, 'notes_words'):
+        return ()
+
+    generation = database.write_generation()
+    fuzzy.note_terms.ensure(conn)
+    tiers = fuzzy.match_tiers(words, fuzzy.note_terms)
+
+    # Отбор по самому широкому уровню, качество - число более узких уровней,
+    # в которые попала заметка (одинаковые уровни не повторяются)
+    narrower = []
+    for tier in tiers[:-1]:
+        if tier != tiers[-1] and tier not in narrower:
+            narrower.append(tier)
+    quality = ' + '.join(
+        '(id IN (SELECT rowid FROM notes_words WHERE notes_words MATCH ?))' for _ in narrower
+    )
+
+    sql = f'''
+        SELECT id FROM notes
+        WHERE +completed = 0
+        AND id IN (SELECT rowid FROM notes_words WHERE notes_words MATCH ?)
+    '''
+    params = [tiers[-1]]
+
+    if priority is not None:
+        sql += ' AND priority = ?'
+        params.append(priority)
+
+    if color is not None:
+        sql += ' AND color = ?'
+        params.append(color)
+
+    date_sql, date_params = _date_range_filter(date_range, 'relevance')
+    sql += date_sql
+    params.extend(date_params)
+
+    if quality:
+        sql += f' ORDER BY {quality} DESC, created DESC, id DESC'
+    else:
+        sql += ' ORDER BY created DESC, id DESC'
+    params.extend(narrower)
+
+    with instrumentation.timed('search.fuzzy.query'):
+        ids = tuple(row[0] for row in conn.execute(sql, params))
+    result_cache.put(key, ids, generation)
+    return ids
+
+
+def _list_query(conn, query, priority, sort):
+    """
+    Запрос id активных списков и его параметры
+    """
+    text_columns = 'title, description'
+    trigram = _trigram_filter(conn, 'lists', query) if query else None
+    sql = f'SELECT id FROM lists WHERE {_completed_column(trigram)} = 0'
+    params = []
+
+    if query:
+        sql += f' AND {_text_condition(text_columns)}'
+        params.extend([f'%{query}%', f'%{query}%'])
+
+        if trigram:
+            sql += trigram[0]
+            params.append(trigram[1])
+
+    if priority is not None:
+        sql += ' AND priority = ?'
+        params.append(priority)
+
+    if sort in LIST_SORTS:
+        sql += f' ORDER BY {LIST_SORTS[sort]}'
+
+    return sql, params, text_columns
+
+
+def search_lists(conn, query='', priority=None, sort=None):
+    """
+    Id активных списков, подходящих под запрос и фильтр приоритета
+    """
+    key = ('lists', query, priority, None, sort)
+    sql, params, text_columns = _list_query(conn, query, priority, sort)
+    return _search_ids('lists', key, query, conn, sql, params, text_columns)
+
+
+def sort_plan_problems(conn):
+    """
+    Проверка планов сортировки: сочетания порядка и фильтров без текста
+    запроса, план которых сортирует строки во временном B-дереве
+    Возвращает список (описание, план); для базы с индексами он пуст
+    """
+    cases = []
+    for sort in NOTE_SORTS:
+        for priority in (None, 1):
+            for color in (None, 'Темный'):
+                for field in (None, *DATE_FIELDS):
+                    date_range = (field, 0, 1) if field else None
+                    name = f'notes sort={sort} priority={priority} color={color} dates={field}'
+                    cases.append((name, _note_query(conn, '', priority, color, sort, date_range)))
+    for sort in LIST_SORTS:
+        for priority in (None, 1):
+            cases.append((f'lists sort={sort} priority={priority}', _list_query(conn, '', priority, sort)))
+
+    problems = []
+    for name, (sql, params, _) in cases:
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+        if any('TEMP B-TREE' in detail for detail in plan):
+            problems.append((name, plan))
+    return problems
+
+
+def _global_ids(conn, expression):
+    """
+    Строки общего индекса: лучшие по релевантности в каждом типе, по типам
+    Заметки и списки в корзине (и элементы таких списков) пропускаются
+    """
+    kinds = database.SEARCH_KINDS
+    return tuple(row[0] for row in conn.execute(f'''
+        WITH hits AS MATERIALIZED (
+            SELECT rowid AS entry, bm25(search_index, ?, 1.0) AS score
+            FROM search_index WHERE search_index MATCH ?
+        ),
+        ranked AS (
+            SELECT entry, row_number() OVER (PARTITION BY entry % {kinds} ORDER BY score, entry DESC) AS place
+            FROM hits
+            WHERE CASE entry % {kinds}
+                WHEN 0 THEN EXISTS (SELECT 1 FROM notes WHERE notes.id = entry / {kinds} AND completed = 0)
+                WHEN 1 THEN EXISTS (SELECT 1 FROM lists WHERE lists.id = entry / {kinds} AND completed = 0)
+                ELSE EXISTS (
+                    SELECT 1 FROM list_items JOIN lists ON lists.id = list_items.list_id
+                    WHERE list_items.id = entry / {kinds} AND lists.completed = 0
+                )
+            END
+        )
+        SELECT entry FROM ranked WHERE place <= ?
+        ORDER BY entry % {kinds}, place
+    ''', (GLOBAL_TITLE_WEIGHT, expression, GLOBAL_RESULTS_PER_KIND)))
+
+
+def _mark_words(text, pattern):
+    if not text:
+        return text or ''
+    return pattern.sub(lambda match: HIGHLIGHT_START + match.group(0) + HIGHLIGHT_END, text)
+
+
+def _word_window(text, pattern):
+    """
+    Окно текста вокруг первого слова запроса
+    """
+    match = pattern.search(text)
+    start = max(0, match.start() - SNIPPET_BEFORE) if match else 0
+    window = text[start:start + SNIPPET_WINDOW]
+    if start > 0:
+        window = '…' + window
+    if start + SNIPPET_WINDOW < len(text):
+        window += '…'
+    return window
+
+
+def search_all(conn, query):
+    """
+    Глобальный поиск по заметкам, спискам и элементам списков
+    Каждое слово запроса ищется как начало слова; результат - список SearchHit
+    """
+    words = fuzzy.tokenize(query)
+    if not words or not database.table_exists(conn, 'search_index'):
+        return []
+
+    key = ('all', ' '.join(words))
+    generation = database.write_generation()
+    rowids = result_cache.get(key)
+    if rowids is None:
+        expression = ' AND '.join(f'"{word}"*' for word in words)
+        with instrumentation.timed('search.all'):
+            rowids = _global_ids(conn, expression)
+        result_cache.put(key, rowids, generation)
+
+    kinds = database.SEARCH_KINDS
+    by_kind = {}
+    for rowid in rowids:
+        by_kind.setdefault(rowid % kinds, []).append(rowid // kinds)
+
+    rows = {}
+    for row in _rows_by_id(conn, 'notes', 'id, title, content', by_kind.get(0, [])):
+        rows[row[0] * kinds] = ('note', row[0], None, row[1], row[2])
+    for row in _rows_by_id(conn, 'lists', 'id, title, description', by_kind.get(1, [])):
+        rows[row[0] * kinds + 1] = ('list', row[0], row[0], row[1], row[2])
+    items = by_kind.get(2, [])
+    if items:
+        for row in conn.execute('''
+            SELECT list_items.id, list_items.list_id, lists.title, list_items.text
+            FROM list_items JOIN lists ON lists.id = list_items.list_id
+            WHERE list_items.id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(items),)):
+            rows[row[0] * kinds + 2] = ('item', *row)
+
+    # Слова запроса выделяются в начале слов текста, как их находит индекс
+    pattern = re.compile(r'(?<![^\W_])(?:' + '|'.join(map(re.escape, words)) + ')', re.IGNORECASE)
+    hits = []
+    for rowid in rowids:
+        if rowid not in rows:
+            continue
+        kind, row_id, list_id, title, text = rows[rowid]
+        hits.append(SearchHit(kind, row_id, list_id, _mark_words(title, pattern),
+                              _mark_words(_word_window(text or '', pattern), pattern)))
+    return hits
+
+
+def note_snippets(conn, query, ids, fuzzy_mode=False):
+    """
+    Фрагменты вокруг совпадений для первых SNIPPET_ROWS заметок результата
+    Возвращает {id: (заголовок, фрагмент текста)}; найденные места отмечены
+    маркерами HIGHLIGHT_START/HIGHLIGHT_END, фрагмент может быть None
+    """
+    ids = ids[:SNIPPET_ROWS]
+    if not query.strip() or not ids:
+        return {}
+
+    if fuzzy_mode:
+        words = fuzzy.tokenize(query)
+        if not words or not database.table_exists(conn, 'notes_words'):
+            return {}
+        index, expression, tokens = 'notes_words', fuzzy.match_tiers(words, fuzzy.note_terms)[-1], SNIPPET_WORDS
+    else:
+        trigram = _trigram_filter(conn, 'notes', query)
+        if trigram is None:
+            return _window_snippets(conn, query, ids)
+        index, expression, tokens = 'notes_fts', trigram[1], SNIPPET_TRIGRAMS
+
+    with instrumentation.timed('search.snippets'):
+        rows = conn.execute(f'''
+            SELECT rowid,
+                   highlight({index}, 0, ?, ?),
+                   snippet({index}, 1, ?, ?, '…', ?)
+            FROM {index}
+            WHERE {index} MATCH ? AND rowid IN (SELECT value FROM json_each(?))
+        ''', (HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END, tokens,
+              expression, json.dumps(ids))).fetchall()
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _mark(text, query):
+    """
+    Отметка вхождений запроса без учета регистра ASCII, как в lower() LIKE
+    """
+    if not text or not query or _has_wildcards(query):
+        return text
+    folded = text.translate(_ASCII_LOWER)
+    parts = []
+    position = 0
+    while True:
+        found = folded.find(query, position)
+        if found < 0:
+            break
+        parts.append(text[position:found])
+        parts.append(HIGHLIGHT_START + text[found:found + len(query)] + HIGHLIGHT_END)
+        position = found + len(query)
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def _window_snippets(conn, query, ids):
+    """
+    Фрагменты без индекса: окно текста вокруг первого вхождения, вырезанное в SQL
+    """
+    with instrumentation.timed('search.snippets'):
+        rows = conn.execute('''
+            SELECT id, title, substr(content, max(1, pos - ?), ?), max(1, pos - ?), length(content)
+            FROM (
+                SELECT id, title, content, instr(lower(content), ?) AS pos
+                FROM notes WHERE id IN (SELECT value FROM json_each(?))
+            )
+        ''', (SNIPPET_BEFORE, SNIPPET_WINDOW, SNIPPET_BEFORE, query, json.dumps(ids))).fetchall()
+
+    snippets = {}
+    for note_id, title, window, start, length in rows:
+        if window is not None:
+            window = _mark(window, query)
+            if start > 1:
+                window = '…' + window
+            if start - 1 + SNIPPET_WINDOW < (length or 0):
+                window += '…'
+        snippets[note_id] = (_mark(title, query), window)
+    return snippets
+
+
+def _rows_by_id(conn, table, columns, ids):
+    if not ids:
+        return []
+    return conn.execute(
+        f'SELECT {columns} FROM {table} WHERE id IN (SELECT value FROM json_each(?))',
+        (json.dumps(ids),)
+    )
+
+
+def fetch_rows(conn, table, columns, ids):
+    """
+    Строки таблицы по списку id в порядке этого списка
+    Первым столбцом в columns должен быть id
+    """
+    rows = {row[0]: row for row in _rows_by_id(conn, table, columns, ids)}
+    return [rows[row_id] for row_id in ids if row_id in rows]